@@ -0,0 +1,65 @@
+"""
+Measures the memory used per message of long conversations, where every user
+message carries metadata with the selected files, the clipboard content and tool
+output like the server stores it, and the time to access the history.
+
+Usage: python -m benchmarks.bench_conversation_memory
+"""
+
+import datetime
+import timeit
+import tracemalloc
+
+from language_models.memory_manager import MemoryManager
+from language_models.model_conversation import ModelConversation, generate_metadata
+from language_models.model_message import MessageMetadata
+
+TURN_COUNTS = [1_000, 10_000]
+
+SELECTED_FILES = ["C:\\projects\\report\\summary.md", "C:\\projects\\report\\data.csv"]
+CLIPBOARD_CONTENT = "Quarterly revenue grew by 12 percent compared to last year. " * 20
+TOOL_OUTPUT = "The current date is Monday 2024-05-13 and the time is 14:02. " * 5
+
+
+def create_conversation(turn_count: int) -> ModelConversation:
+    conversation = ModelConversation(MemoryManager("knowledge_base"), "model.gguf")
+    conversation.add_system_message("You are a helpful assistant.", generate_metadata())
+
+    for turn in range(turn_count):
+        # Decoded from each request, so equal texts arrive as separate strings
+        metadata = MessageMetadata(
+            datetime.datetime.now(),
+            "|".join(SELECTED_FILES).split("|"),
+            clipboard_content="".join(list(CLIPBOARD_CONTENT)),
+        )
+        metadata.set_tool_output("".join(list(TOOL_OUTPUT)))
+
+        conversation.add_user_message(
+            f"Question number {turn} about the report?", metadata
+        )
+        conversation.add_assistant_message(
+            f"Answer number {turn}, based on the selected files.", generate_metadata()
+        )
+
+    return conversation
+
+
+def main() -> None:
+    for turn_count in TURN_COUNTS:
+        tracemalloc.start()
+        conversation = create_conversation(turn_count)
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        message_count = len(conversation.messages)
+        seconds = timeit.timeit(conversation.get_messages, number=100) / 100
+
+        print(
+            f"{turn_count:>6} turns {message_count:>6} messages "
+            f"{allocated / message_count:>10.0f} bytes/message "
+            f"{seconds * 1_000_000:>8.2f} us per get_messages"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compares the ast based dangerous code analysis with the previous line based
+detection on a corpus of generated code, covering speed on scripts of growing
+size and the verdicts on snippets the line based detection gets wrong.
+
+Usage: python -m benchmarks.bench_dangerous_code_detector
+"""
+
+import timeit
+
+from language_models.helpers.dangerous_code_detector import DangerousCodeDetector
+
+SIZES = [1_000, 10_000, 100_000]
+
+# Typical structure of code generated by the code_interpreter
+GENERATED_FUNCTION = '''
+def solve_{index}(numbers: List[int]) -> Dict[str, float]:
+    """
+    Calculates statistics for the numbers, don't open or exec anything here.
+    """
+    # Sort the numbers before looking for the median
+    ordered = sorted(numbers)
+    counts = collections.Counter(ordered)
+    result = {{
+        "mean": statistics.mean(ordered),
+        "median": statistics.median(ordered),
+        "most_common": counts.most_common(1)[0][0],
+        "root": math.sqrt(sum(x * x for x in ordered)),
+    }}
+    print(f"Result {index}: {{result}}")
+    return result
+
+'''
+
+GENERATED_HEADER = """import collections
+import math
+import statistics
+from typing import Dict, List
+
+"""
+
+# Snippets with the expected verdict
+CORPUS = [
+    ("import math, os\nprint(math.pi)", True),
+    ("from collections.abc import Iterable\nprint(Iterable)", False),
+    ("import math as m\nprint(m.tau)", False),
+    ('print("import os")', False),
+    ("print(().__class__.__base__.__subclasses__())", True),
+    ("eval(\"__import__('os')\")", True),
+    ("text = 'open the door'\nprint(text)", False),
+    ("with open('data.txt') as f:\n    print(f.read())", True),
+    ("from . import secrets", True),
+    ("import statistics\nprint(statistics.mean([1, 2]))", False),
+]
+
+
+def create_generated_code(size: int) -> str:
+    code = GENERATED_HEADER
+    index = 0
+    while len(code) < size:
+        code += GENERATED_FUNCTION.format(index=index)
+        index += 1
+    return code
+
+
+def run_benchmark(name: str, function, argument: str, number: int = 20) -> None:
+    seconds = timeit.timeit(lambda: function(argument), number=number) / number
+    print(f"{name:<24} {len(argument):>10} chars {seconds * 1000:>10.3f} ms")
+
+
+def main() -> None:
+    detector = DangerousCodeDetector()
+
+    for size in SIZES:
+        code = create_generated_code(size)
+
+        run_benchmark(
+            "by_line", detector.detect_potentially_dangerous_code_by_line, code
+        )
+        run_benchmark(
+            "with_ast", detector.detect_potentially_dangerous_code_with_ast, code
+        )
+        run_benchmark("cached", detector.detect_potentially_dangerous_code, code)
+        print()
+
+    by_line_correct = 0
+    with_ast_correct = 0
+    for code, expected in CORPUS:
+        by_line_correct += (
+            detector.detect_potentially_dangerous_code_by_line(code) == expected
+        )
+        with_ast_correct += (
+            detector.detect_potentially_dangerous_code_with_ast(code) == expected
+        )
+
+    print(f"by_line  correct verdicts: {by_line_correct}/{len(CORPUS)}")
+    print(f"with_ast correct verdicts: {with_ast_correct}/{len(CORPUS)}")
+
+
+if __name__ == "__main__":
+    main()
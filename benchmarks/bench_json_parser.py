@@ -0,0 +1,52 @@
+"""
+Measures JSON extraction and repair on large model outputs, such as a tool
+selection response that follows a long code_interpreter output.
+
+Usage: python -m benchmarks.bench_json_parser
+"""
+
+import timeit
+
+from language_models.helpers.json_fixer import fix_json_errors_manually
+from language_models.helpers.json_parser import (
+    extract_json,
+    handle_json,
+    repair_backslashes,
+)
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def create_model_output(size: int) -> str:
+    line = 'Traceback (most recent call last): File "C:\\\\temp\\\\run.py", line 1\n'
+    padding = line * (size // len(line))
+    return padding + '{"tool": "read_file", "arguments": {"FILEINDEX": "1"}}'
+
+
+def create_broken_json(size: int) -> str:
+    value = "x" * size
+    return "{'tool': 'code_interpreter', 'arguments': {'CODE': '" + value + "'}"
+
+
+def run_benchmark(name: str, function, argument: str, number: int = 5) -> None:
+    seconds = timeit.timeit(lambda: function(argument), number=number) / number
+    megabytes = len(argument) / 1_000_000
+    print(
+        f"{name:<28} {len(argument):>10} chars {seconds * 1000:>10.2f} ms {megabytes / seconds:>8.1f} MB/s"
+    )
+
+
+def main() -> None:
+    for size in SIZES:
+        model_output = create_model_output(size)
+        broken_json = create_broken_json(size)
+
+        run_benchmark("handle_json", handle_json, model_output)
+        run_benchmark("extract_json", extract_json, model_output)
+        run_benchmark("repair_backslashes", repair_backslashes, model_output)
+        run_benchmark("fix_json_errors_manually", fix_json_errors_manually, broken_json)
+        print()
+
+
+if __name__ == "__main__":
+    main()
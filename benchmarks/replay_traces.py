@@ -0,0 +1,55 @@
+"""
+Replays traces recorded with SERVER.TRACE_PATH against the server with the mock
+model, and reports latency percentiles per endpoint and stage. The recorded model
+responses and tool outputs are played back after their recorded duration divided
+by the speed-up, so the results show the overhead of the server itself.
+
+Usage: python -m benchmarks.replay_traces traces.jsonl [--concurrency 4] [--speedup 10]
+"""
+
+import argparse
+import os
+
+from language_models.helpers.trace_recorder import TraceRecorder, load_traces
+from language_models.helpers.trace_replayer import TraceReplayer
+from language_models.model_manager import MockModelManager
+from language_models.model_state import ModelState
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("trace_path")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--speedup", type=float, default=1.0)
+    args = parser.parse_args()
+
+    traces = load_traces(args.trace_path)
+
+    # Traces of the replay are kept in memory, next to the recorded ones
+    recorder = TraceRecorder()
+    recorder.load_replay_source(traces, args.speedup)
+    TraceRecorder.set_instance(recorder)
+
+    # Replayed conversations are only kept in memory
+    os.environ["CONVERSATIONS.PATH"] = ""
+
+    import server
+
+    ModelState.initialize(MockModelManager())
+    with ModelState.get_lock():
+        ModelState.get_model_manager().load_model()  # type: ignore
+
+    client = server.app.test_client()
+
+    def post(endpoint, data, headers):
+        return client.post(endpoint, json=data, headers=headers).get_json()
+
+    replayer = TraceReplayer(traces, post, args.concurrency, args.speedup)
+    replayer.replay()
+
+    print(f"Replayed {len(traces)} requests")
+    print(replayer.get_report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Measures the generation throughput of a model with candidate llama.cpp launch
+profiles and stores the fastest one in the profiles file (MODEL.PROFILES_PATH).
+Candidates are read from a TOML file with a table per candidate, or else a grid
+of thread counts, batch sizes and KV cache types is tried. With --mock the mock
+model is measured instead, a dry run that checks the setup without llama.cpp and
+can't be combined with --write.
+
+Usage: python -m benchmarks.tune_launch_profiles model.gguf [--candidates candidates.toml] [--requests 3] [--mock] [--write]
+"""
+
+import argparse
+import os
+import time
+from typing import List
+
+import requests
+from dotenv import load_dotenv
+
+from language_models.api.mock import MockModel
+from language_models.helpers.launch_profiles import (
+    LaunchProfile,
+    get_launch_profile,
+    load_launch_profiles,
+    tune_launch_profiles,
+    write_launch_profile,
+)
+from language_models.helpers.token_counter import estimate_tokens
+from language_models.model_conversation import generate_metadata
+from language_models.model_manager import ModelManager
+from language_models.model_message import ModelMessage, Role
+
+PROMPT = (
+    "Write a short story about a lighthouse keeper who finds a message in a bottle."
+)
+
+TUNING_PORT = 8090
+
+
+def create_candidate_grid(base_profile: LaunchProfile) -> List[LaunchProfile]:
+    cpu_count = os.cpu_count() or 4
+
+    candidates: List[LaunchProfile] = []
+    for threads in sorted({max(cpu_count // 2, 1), cpu_count}):
+        for batch_size in [256, 512]:
+            for cache_type in ["f16", "q8_0"]:
+                candidates.append(
+                    base_profile.merged(
+                        LaunchProfile(
+                            {
+                                "threads": threads,
+                                "batch_size": batch_size,
+                                "cache_type_k": cache_type,
+                                "cache_type_v": cache_type,
+                            }
+                        )
+                    )
+                )
+    return candidates
+
+
+def measure_mock(profile: LaunchProfile, request_count: int, n_predict: int) -> float:
+    model = MockModel()
+    messages = [ModelMessage(Role.USER, PROMPT, generate_metadata())]
+
+    start_time = time.time()
+    token_count = 0
+    for _ in range(request_count):
+        token_count += estimate_tokens(
+            model.generate_text(messages, n_predict).get_text()
+        )
+
+    return token_count / max(time.time() - start_time, 1e-9)
+
+
+def measure_server(
+    model_manager: ModelManager,
+    model_identifier: str,
+    profile: LaunchProfile,
+    request_count: int,
+    n_predict: int,
+) -> float:
+    popen = model_manager.start_server(
+        os.path.join("models", model_identifier),
+        TUNING_PORT,
+        int(profile.get("gpu_layers", os.getenv("MODEL.GPU_LAYERS", 0))),
+        profile=profile,
+    )
+
+    try:
+        throughputs: List[float] = []
+        for _ in range(request_count):
+            response = requests.post(
+                f"http://127.0.0.1:{TUNING_PORT}/completion",
+                json={"prompt": PROMPT, "n_predict": n_predict, "cache_prompt": False},
+                timeout=600,
+            )
+            response.raise_for_status()
+            throughputs.append(response.json()["timings"]["predicted_per_second"])
+
+        return sum(throughputs) / len(throughputs)
+    finally:
+        popen.terminate()
+        popen.wait()
+
+
+def main() -> None:
+    load_dotenv()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model")
+    parser.add_argument("--candidates")
+    parser.add_argument("--requests", type=int, default=3)
+    parser.add_argument("--n-predict", type=int, default=128)
+    parser.add_argument("--mock", action="store_true")
+    parser.add_argument("--write", action="store_true")
+    args = parser.parse_args()
+
+    if args.mock and args.write:
+        parser.error(
+            "--write can't be used with --mock, mock results don't depend on the profile"
+        )
+
+    base_profile = get_launch_profile(args.model)
+
+    if args.candidates:
+        candidates = [
+            base_profile.merged(candidate)
+            for candidate in load_launch_profiles(args.candidates).values()
+        ]
+    else:
+        candidates = create_candidate_grid(base_profile)
+
+    if args.mock:
+        measure = lambda profile: measure_mock(profile, args.requests, args.n_predict)
+    else:
+        llama_cpp_path = os.getenv("LLAMA_CPP_PATH", "bin")
+        binary_name = "server.exe" if os.name == "nt" else "server"
+        model_manager = ModelManager(os.path.join(llama_cpp_path, binary_name), 8000)
+
+        measure = lambda profile: measure_server(
+            model_manager, args.model, profile, args.requests, args.n_predict
+        )
+
+    best_profile, _ = tune_launch_profiles(candidates, measure)
+
+    if not best_profile:
+        print("No candidate could be measured")
+        return
+
+    print(f"Best profile: {best_profile}")
+
+    if args.write:
+        write_launch_profile(args.model, best_profile)
+        print(f"Stored the profile of {args.model}")
+
+
+if __name__ == "__main__":
+    main()
@@ -53,6 +53,7 @@ class Model:
         clipboard_content: str = "",
         allowed_tools: Optional[List[str]] = None,
         response_prefix: str = "",
+        use_suggestions: bool = False,
     ) -> str:
         return generate_response(
             self.conversation_id,
@@ -68,6 +69,7 @@ class Model:
             clipboard_content=clipboard_content,
             allowed_tools=allowed_tools,
             response_prefix=response_prefix,
+            use_suggestions=use_suggestions,
         )
 
     def generate_response_with_suggestions(
@@ -97,6 +99,9 @@ class Model:
             response_prefix=response_prefix,
         )
 
+    def get_suggestions(self, timeout: float = 30) -> Sequence[str]:
+        return get_suggestions(self.conversation_id, timeout=timeout)
+
 
 def execute_code(
     conversation_id: str, code: str, ask_permission_to_run_tools: bool = False
@@ -284,8 +289,11 @@ def generate_response(
     clipboard_content: str = "",
     allowed_tools: Optional[List[str]] = None,
     response_prefix: str = "",
+    use_suggestions: bool = False,
 ) -> str:
-    response = _base_generate_response(
+    """With use_suggestions, the server generates follow up suggestions in the
+    background after the response, which get_suggestions returns."""
+    response, _ = _base_generate_response(
         conversation_id,
         user_message,
         selected_files=selected_files,
@@ -294,7 +302,7 @@ def generate_response(
         single_message_mode=single_message_mode,
         use_tools=use_tools,
         use_reflections=use_reflections,
-        use_suggestions=False,
+        use_suggestions=use_suggestions,
         use_knowledge=use_knowledge,
         ask_permission_to_run_tools=ask_permission_to_run_tools,
         clipboard_content=clipboard_content,
@@ -302,10 +310,7 @@ def generate_response(
         response_prefix=response_prefix,
     )
 
-    if response:
-        return response[0]
-    else:
-        return ""
+    return response
 
 
 def generate_response_with_suggestions(
@@ -324,7 +329,7 @@ def generate_response_with_suggestions(
     response_prefix: str = "",
 ) -> Tuple[str, Sequence[str]]:
 
-    response = _base_generate_response(
+    response, suggestions_turn = _base_generate_response(
         conversation_id,
         user_message,
         selected_files=selected_files,
@@ -341,7 +346,69 @@ def generate_response_with_suggestions(
         response_prefix=response_prefix,
     )
 
-    return response
+    if not response:
+        return "", []
+
+    return response, get_suggestions(conversation_id, suggestions_turn)
+
+
+def get_suggestions(
+    conversation_id: str, turn: Optional[int] = None, timeout: float = 30
+) -> Sequence[str]:
+    """Returns the follow up suggestions of the latest turn of the conversation
+    (or of turn), waiting up to timeout seconds for the server to generate them."""
+    params: Dict[str, Any] = {"conversation_id": conversation_id, "timeout": timeout}
+    if turn is not None:
+        params["turn"] = turn
+
+    response = requests.get(f"{BASE_URL}/get_suggestions", params=params)
+
+    if response.status_code != 200:
+        print(f"Error getting suggestions. status_code={response.status_code}")
+        return []
+
+    data = response.json()
+
+    if data["result"]:
+        return data.get("suggestions", [])
+    else:
+        print(f"Error getting suggestions: {data}")
+        return []
+
+
+def generate_batch(
+    prompts: Sequence[Tuple[str, str]],
+    max_tokens: int = 200,
+    temperature: float = 0.2,
+    model_name: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Generates responses to independent (system message, user message) prompts in
+    one request, the server generates them concurrently.
+
+    Returns:
+        A result per prompt in the same order, with the "response" or the
+        "error_message" of the prompt.
+    """
+    payload = {
+        "prompts": [{"system": system, "user": user} for system, user in prompts],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "model": model_name,
+    }
+
+    response = requests.post(f"{BASE_URL}/generate_batch", json=payload)
+
+    if response.status_code != 200:
+        error_message = f"status_code={response.status_code}"
+    else:
+        data = response.json()
+        if data["result"]:
+            return data["results"]
+        error_message = data.get("error_message", "")
+
+    print(f"Error generating batch: {error_message}")
+    return [{"result": False, "error_message": error_message} for _ in prompts]
 
 
 def transcribe_audio(audio_file_path: str) -> str:
@@ -377,7 +444,9 @@ def _base_generate_response(
     clipboard_content: str = "",
     allowed_tools: Optional[List[str]] = None,
     response_prefix: str = "",
-) -> Tuple[str, Sequence[str]]:
+) -> Tuple[str, Optional[int]]:
+    """Returns the response and the turn of the suggestions when use_suggestions
+    is set, the suggestions are generated after the response."""
     payload = {
         "conversation_id": conversation_id,
         "message": user_message,
@@ -399,18 +468,15 @@ def _base_generate_response(
 
     if response.status_code != 200:
         print(f"Error generating response. status_code={response.status_code}")
-        return "", []
+        return "", None
 
     data = response.json()
 
     if data["result"]:
-        if use_suggestions:
-            return data["response"], data["suggestions"]
-        else:
-            return data["response"], []
+        return data["response"], data.get("suggestions_turn")
     else:
         print(f"Error generating response: {data}")
-        return "", []
+        return "", None
 
 
 if __name__ == "__main__":
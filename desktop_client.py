@@ -772,39 +772,23 @@ class MessageSender(QObject):
         clipboard_content = QGuiApplication.clipboard().text() if use_clipboard else ""
 
         def generate_response_thread():
-            suggestions = []
             response = None
             try:
                 for i in range(2):
-                    if use_suggestions:
-                        response, suggestions = (
-                            client_api.generate_response_with_suggestions(
-                                self._parent.conversation_id,
-                                command,
-                                selected_files=selected_files,
-                                single_message_mode=not chat_mode,
-                                use_tools=use_tools,
-                                use_reflections=use_reflections,
-                                use_knowledge=use_knowledge,
-                                max_tokens=1000,
-                                ask_permission_to_run_tools=use_safety,
-                                clipboard_content=clipboard_content,
-                            )
-                        )
-                    else:
-                        response = client_api.generate_response(
-                            self._parent.conversation_id,
-                            command,
-                            selected_files=selected_files,
-                            single_message_mode=not chat_mode,
-                            use_tools=use_tools,
-                            use_reflections=use_reflections,
-                            use_knowledge=use_knowledge,
-                            max_tokens=1000,
-                            ask_permission_to_run_tools=use_safety,
-                            clipboard_content=clipboard_content,
-                            allowed_tools=None,
-                        )
+                    response = client_api.generate_response(
+                        self._parent.conversation_id,
+                        command,
+                        selected_files=selected_files,
+                        single_message_mode=not chat_mode,
+                        use_tools=use_tools,
+                        use_reflections=use_reflections,
+                        use_knowledge=use_knowledge,
+                        max_tokens=1000,
+                        ask_permission_to_run_tools=use_safety,
+                        clipboard_content=clipboard_content,
+                        allowed_tools=None,
+                        use_suggestions=use_suggestions,
+                    )
 
                     if not response and i == 0:
                         self._parent.conversation_id = client_api.start_conversation()
@@ -815,6 +799,14 @@ class MessageSender(QObject):
                 if response:
                     self.message_received.emit("AC: " + response)
 
+                    if use_suggestions:
+                        # The server generates them after the response
+                        threading.Thread(
+                            target=self.receive_suggestions,
+                            args=(self._parent.conversation_id,),
+                            daemon=True,
+                        ).start()
+
                     if use_tts:
 
                         if self._parent.use_local_tts:
@@ -850,9 +842,6 @@ class MessageSender(QObject):
                                 Qt.QueuedConnection,  # type: ignore
                             )
 
-                    if suggestions:
-                        self.suggestions_received.emit(suggestions)
-
             except Exception as e:
                 traceback.print_exc()
                 print("Error in generate_response_thread:", e)
@@ -860,6 +849,11 @@ class MessageSender(QObject):
         response_thread = threading.Thread(target=generate_response_thread)
         response_thread.start()
 
+    def receive_suggestions(self, conversation_id: str):
+        suggestions = client_api.get_suggestions(conversation_id)
+        if suggestions:
+            self.suggestions_received.emit(suggestions)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
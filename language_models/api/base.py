@@ -1,5 +1,10 @@
-from typing import Sequence
+import os
+import time
+from typing import Any, Callable, Dict, Sequence
 from language_models.formatters.base import PromptFormatter
+from language_models.helpers.generation_cache import GenerationCache
+from language_models.helpers.token_counter import TokenCounter
+from language_models.helpers.trace_recorder import record_event
 from language_models.model_message import ModelMessage
 from language_models.model_response import ModelResponse
 
@@ -9,9 +14,23 @@ class ApiModel:
         self.model_path = model_path
         self.prompt_formatter = prompt_formatter
 
+        # Estimates the counts from the text length, models with a tokenizer
+        # replace it
+        self.token_counter = TokenCounter()
+
     def get_model_path(self) -> str:
         return self.model_path
 
+    def count_tokens(self, text: str) -> int:
+        return self.token_counter.count(text)
+
+    def count_prompt_tokens(
+        self, messages: Sequence[ModelMessage], use_metadata: bool = False
+    ) -> int:
+        return self.token_counter.count_prompt(
+            self.prompt_formatter.generate_prompt(messages, use_metadata)
+        )
+
     def generate_text(
         self,
         messages: Sequence[ModelMessage],
@@ -21,3 +40,46 @@ class ApiModel:
         response_prefix: str = "",
     ) -> ModelResponse:
         return ModelResponse("TEXT", "MODEL_NAME")
+
+    def generate_cached(
+        self, request: Dict[str, Any], generate: Callable[[], ModelResponse]
+    ) -> ModelResponse:
+        """
+        Returns the cached response to the request to the backend, or generates
+        and caches it. The request holds everything that determines the response
+        (the rendered prompt, sampling parameters and grammar), and only requests
+        with a temperature of 0 or a fixed seed are deterministic enough to be
+        cached. Enabled by GENERATION_CACHE.ENABLED.
+        """
+        if not is_deterministic(request) or (
+            os.getenv("GENERATION_CACHE.ENABLED", "false").lower() != "true"
+        ):
+            return generate()
+
+        start_time = time.time()
+
+        cache = GenerationCache.get_instance()
+        key = cache.create_key(self.model_path, request)
+
+        cached = cache.get(key)
+        if cached is not None:
+            record_event(
+                "model",
+                name=self.model_path,
+                text=cached["text"],
+                duration=time.time() - start_time,
+                cached=True,
+            )
+            return ModelResponse(cached["text"], cached["model"])
+
+        response = generate()
+
+        # Failed generations are empty and are tried again
+        if response.get_text():
+            cache.set(key, response.get_text(), response.get_model())
+
+        return response
+
+
+def is_deterministic(request: Dict[str, Any]) -> bool:
+    return request.get("temperature") == 0 or request.get("seed", -1) not in (-1, None)
@@ -1,8 +1,12 @@
-from typing import Sequence
+from typing import Any, Dict, Sequence
 import requests
 import json
+import os
+import time
 from language_models.api.base import ApiModel
 from language_models.formatters.base import PromptFormatter
+from language_models.helpers.token_counter import TokenCounter
+from language_models.helpers.trace_recorder import record_event
 from language_models.model_message import ModelMessage
 from language_models.model_response import ModelResponse
 
@@ -20,6 +24,17 @@ class LlamaCppModel(ApiModel):
         self.host_url = host_url
         self.host_port = host_port
 
+        self.token_counter = TokenCounter(self.tokenize)
+
+    def tokenize(self, text: str) -> int:
+        """Returns the number of tokens of the text with the tokenizer of the model."""
+        url = f"http://{self.host_url}:{self.host_port}/tokenize"
+
+        response = requests.post(url, json={"content": text}, timeout=10)
+        response.raise_for_status()
+
+        return len(response.json()["tokens"])
+
     def generate_text(
         self,
         messages: Sequence[ModelMessage],
@@ -46,11 +61,21 @@ class LlamaCppModel(ApiModel):
             "top_k": 40,
         }
 
+        # A fixed seed makes the generations reproducible (and cacheable)
+        seed = os.getenv("MODEL.SEED")
+        if seed:
+            request["seed"] = int(seed)
+
+        return self.generate_cached(request, lambda: self.complete(request))
+
+    def complete(self, request: Dict[str, Any]) -> ModelResponse:
         with open("_input.txt", "w", encoding="utf8") as file:
-            file.write(str(prompt))
+            file.write(str(request["prompt"]))
 
         url = f"http://{self.host_url}:{self.host_port}/completion"
 
+        start_time = time.time()
+
         response = requests.post(url, json=request)
 
         with open("_output.json", "w") as file:
@@ -61,6 +86,13 @@ class LlamaCppModel(ApiModel):
             content = json_data["content"].strip()
             if "<|eot_id|>" in content:  # Temporary fix for LLama-3
                 content = content.split("<|eot_id|>")[0]
+
+            record_event(
+                "model",
+                name=self.model_path,
+                text=content,
+                duration=time.time() - start_time,
+            )
             return ModelResponse(content, json_data["model"])
 
         return ModelResponse("", "")
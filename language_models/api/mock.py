@@ -0,0 +1,42 @@
+import time
+from typing import Sequence
+from language_models.api.base import ApiModel
+from language_models.formatters.base import PromptFormatter
+from language_models.helpers.trace_recorder import record_event, replay_event
+from language_models.model_message import ModelMessage
+from language_models.model_response import ModelResponse
+
+MOCK_RESPONSE = "This is a mock response."
+
+
+class MockModel(ApiModel):
+    """
+    Model without a backend, used by the server in mock mode. While a recorded
+    trace is replayed it returns the recorded responses in order, otherwise a
+    fixed response.
+    """
+
+    def __init__(self, model_path: str = "mock"):
+        super().__init__(model_path, PromptFormatter())
+
+    def generate_text(
+        self,
+        messages: Sequence[ModelMessage],
+        max_tokens: int = 200,
+        temperature: float = 0.2,
+        use_metadata: bool = False,
+        response_prefix: str = "",
+    ) -> ModelResponse:
+        start_time = time.time()
+
+        event = replay_event("model")
+
+        text = event["text"] if event else MOCK_RESPONSE
+
+        record_event(
+            "model",
+            name=self.model_path,
+            text=text,
+            duration=time.time() - start_time,
+        )
+        return ModelResponse(text, self.model_path)
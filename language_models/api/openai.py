@@ -15,10 +15,12 @@ from openai.types.chat.chat_completion_assistant_message_param import (
 from typing import List, Sequence
 from language_models.api.base import ApiModel
 from language_models.formatters.base import PromptFormatter
+from language_models.helpers.trace_recorder import record_event
 from language_models.model_message import ModelMessage
 from language_models.model_response import ModelResponse
 
 import os
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -74,6 +76,8 @@ class OpenAIModel(ApiModel):
 
         logger.info(openai_messages)
 
+        start_time = time.time()
+
         chat_completion = client.chat.completions.create(
             model=self.model_name,
             messages=openai_messages,
@@ -81,6 +85,13 @@ class OpenAIModel(ApiModel):
 
         result = chat_completion.choices[0].message.content
 
+        record_event(
+            "model",
+            name=self.model_name,
+            text=result or "",
+            duration=time.time() - start_time,
+        )
+
         if result:
             return ModelResponse(result, self.model_name)
         else:
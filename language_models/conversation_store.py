@@ -0,0 +1,328 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from language_models.memory_manager import MemoryManager
+from language_models.model_conversation import ModelConversation
+from language_models.model_message import MessageMetadata, ModelMessage, Role
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    model_path TEXT NOT NULL,
+    knowledge_base_path TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    summarized_count INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    actor_name TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, position)
+);
+"""
+
+
+class ConversationStore:
+    """
+    Keeps conversations in an SQLite database with an LRU of recently used
+    conversations in memory. Changed conversations are written behind by a
+    background thread, conversations that have been idle for idle_seconds or
+    that don't fit into max_in_memory are saved and dropped from memory, and
+    they are loaded again transparently when they are accessed. Used like the
+    dictionary of conversations it replaces.
+
+    Configured through CONVERSATIONS.PATH (empty keeps everything in memory),
+    CONVERSATIONS.MAX_IN_MEMORY, CONVERSATIONS.IDLE_SECONDS and
+    CONVERSATIONS.FLUSH_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_in_memory: Optional[int] = None,
+        idle_seconds: Optional[float] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        if path is None:
+            path = os.getenv("CONVERSATIONS.PATH", "conversations.db")
+        if max_in_memory is None:
+            max_in_memory = int(os.getenv("CONVERSATIONS.MAX_IN_MEMORY", 100))
+        if idle_seconds is None:
+            idle_seconds = float(os.getenv("CONVERSATIONS.IDLE_SECONDS", 1800))
+        if flush_interval is None:
+            flush_interval = float(os.getenv("CONVERSATIONS.FLUSH_INTERVAL", 5))
+
+        self.path = path
+        self.max_in_memory = max_in_memory
+        self.idle_seconds = idle_seconds
+        self.flush_interval = flush_interval
+
+        # Conversation id -> (conversation, time of the last access)
+        self.conversations: OrderedDict[str, Tuple[ModelConversation, float]] = (
+            OrderedDict()
+        )
+
+        # Conversation id -> (saved version, number of saved messages)
+        self.saved: Dict[str, Tuple[int, int]] = {}
+
+        # Conversation id -> number of requests using the conversation, pinned
+        # conversations are never evicted
+        self.pins: Dict[str, int] = {}
+
+        self.lock = threading.RLock()
+        self.connection: Optional[sqlite3.Connection] = None
+        self.flush_thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return self.get(conversation_id) is not None
+
+    def __getitem__(self, conversation_id: str) -> ModelConversation:
+        conversation = self.get(conversation_id)
+        if conversation is None:
+            raise KeyError(conversation_id)
+        return conversation
+
+    def __setitem__(
+        self, conversation_id: str, conversation: ModelConversation
+    ) -> None:
+        with self.lock:
+            self.conversations[conversation_id] = (conversation, time.time())
+            self.conversations.move_to_end(conversation_id)
+            self.saved.pop(conversation_id, None)
+            self._evict_least_recently_used()
+
+        self._start_flush_thread()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.conversations)
+
+    def get(self, conversation_id: str) -> Optional[ModelConversation]:
+        with self.lock:
+            if conversation_id in self.conversations:
+                conversation = self.conversations[conversation_id][0]
+            else:
+                conversation = self._load(conversation_id)
+                if conversation is None:
+                    return None
+
+            self.conversations[conversation_id] = (conversation, time.time())
+            self.conversations.move_to_end(conversation_id)
+            self._evict_least_recently_used()
+
+            return conversation
+
+    def acquire(self, conversation_id: str) -> Optional[ModelConversation]:
+        """Returns the conversation and keeps it in memory until it is released."""
+        with self.lock:
+            conversation = self.get(conversation_id)
+            if conversation is not None:
+                self.pins[conversation_id] = self.pins.get(conversation_id, 0) + 1
+            return conversation
+
+    def release(self, conversation_id: str) -> None:
+        with self.lock:
+            pins = self.pins.get(conversation_id, 0) - 1
+            if pins > 0:
+                self.pins[conversation_id] = pins
+            else:
+                self.pins.pop(conversation_id, None)
+
+    def flush(self) -> None:
+        """Saves every conversation in memory that changed since it was saved."""
+        with self.lock:
+            for conversation_id, (conversation, _) in list(self.conversations.items()):
+                self._save(conversation_id, conversation)
+
+    def evict_idle(self) -> None:
+        with self.lock:
+            now = time.time()
+            for conversation_id, (conversation, last_access) in list(
+                self.conversations.items()
+            ):
+                if now - last_access >= self.idle_seconds:
+                    self._evict(conversation_id, conversation)
+
+    def close(self) -> None:
+        self.stop_event.set()
+        if self.flush_thread:
+            self.flush_thread.join()
+
+        with self.lock:
+            self.flush()
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+
+    def _start_flush_thread(self) -> None:
+        with self.lock:
+            if self.flush_thread or not self.path:
+                return
+
+            self.flush_thread = threading.Thread(
+                target=self._flush_periodically, daemon=True
+            )
+            self.flush_thread.start()
+
+    def _flush_periodically(self) -> None:
+        while not self.stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+                self.evict_idle()
+            except Exception as e:
+                print(f"Failed to save conversations: {e}")
+
+    def _evict_least_recently_used(self) -> None:
+        for conversation_id, (conversation, _) in list(self.conversations.items()):
+            if len(self.conversations) <= self.max_in_memory:
+                break
+            self._evict(conversation_id, conversation)
+
+    def _evict(self, conversation_id: str, conversation: ModelConversation) -> None:
+        # Without a database evicted conversations would be lost, and conversations
+        # in use by a request would keep changing after they were saved
+        if not self.path or self.pins.get(conversation_id):
+            return
+
+        self._save(conversation_id, conversation)
+        del self.conversations[conversation_id]
+        self.saved.pop(conversation_id, None)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.executescript(SCHEMA)
+        return self.connection
+
+    def _save(self, conversation_id: str, conversation: ModelConversation) -> None:
+        if not self.path:
+            return
+
+        saved_version, saved_count = self.saved.get(conversation_id, (-1, 0))
+        if conversation.version == saved_version:
+            return
+
+        connection = self._get_connection()
+
+        # Messages are only appended, but the metadata of the last message is
+        # completed while the response is generated, so it is saved again
+        first_position = max(saved_count - 1, 0)
+
+        with connection:
+            if conversation_id not in self.saved:
+                # New, or replaced a conversation with the same id
+                connection.execute(
+                    "DELETE FROM messages WHERE conversation_id = ?", (conversation_id,)
+                )
+
+            connection.execute(
+                "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    conversation_id,
+                    conversation.get_model_path(),
+                    conversation.memory_manager.knowledge_base_path,
+                    conversation.summary,
+                    conversation.summarized_count,
+                    time.time(),
+                ),
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        conversation_id,
+                        position,
+                        message.role.name,
+                        message.get_content(),
+                        message.get_actor_name(),
+                        serialize_metadata(message.get_metadata()),
+                    )
+                    for position, message in enumerate(
+                        conversation.messages[first_position:], first_position
+                    )
+                ],
+            )
+
+        self.saved[conversation_id] = (
+            conversation.version,
+            len(conversation.messages),
+        )
+
+    def _load(self, conversation_id: str) -> Optional[ModelConversation]:
+        if not self.path or not os.path.exists(self.path):
+            return None
+
+        connection = self._get_connection()
+
+        row = connection.execute(
+            "SELECT model_path, knowledge_base_path, summary, summarized_count FROM conversations WHERE id = ?",
+            (conversation_id,),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        model_path, knowledge_base_path, summary, summarized_count = row
+
+        conversation = ModelConversation(MemoryManager(knowledge_base_path), model_path)
+        conversation.summary = summary
+        conversation.summarized_count = summarized_count
+
+        for role, content, actor_name, metadata in connection.execute(
+            "SELECT role, content, actor_name, metadata FROM messages WHERE conversation_id = ? ORDER BY position",
+            (conversation_id,),
+        ):
+            conversation.messages.append(
+                ModelMessage(
+                    Role[role], content, deserialize_metadata(metadata), actor_name
+                )
+            )
+
+        self.saved[conversation_id] = (conversation.version, len(conversation.messages))
+
+        return conversation
+
+
+def serialize_metadata(metadata: MessageMetadata) -> str:
+    return json.dumps(
+        {
+            "timestamp": metadata.timestamp.isoformat(),
+            "selected_files": list(metadata.selected_files or []),
+            "ask_permission_to_run_tools": metadata.ask_permission_to_run_tools,
+            "clipboard_content": metadata.clipboard_content,
+            "allowed_tools": metadata.allowed_tools,
+            "tool_output": metadata.tool_output,
+            "knowledge_information": metadata.knowledge_information,
+            "reflection_text": metadata.reflection_text,
+            "selected_files_content": metadata.selected_files_content,
+        }
+    )
+
+
+def deserialize_metadata(data: str) -> MessageMetadata:
+    values = json.loads(data)
+
+    metadata = MessageMetadata(
+        datetime.datetime.fromisoformat(values["timestamp"]),
+        values["selected_files"],
+        values["ask_permission_to_run_tools"],
+        values["clipboard_content"],
+        values["allowed_tools"],
+    )
+    metadata.set_tool_output(values["tool_output"])
+    metadata.set_knowledge_information(values["knowledge_information"])
+    metadata.set_reflection_text(values["reflection_text"])
+    metadata.set_selected_files_content(values["selected_files_content"])
+
+    return metadata
@@ -10,16 +10,16 @@ class AlpacaFormatter(PromptFormatter):
     def generate_prompt(
         self, messages: Sequence[ModelMessage], use_metadata: bool = False
     ) -> str:
-        prompt = ""
+        segments = [self.render_message(message, use_metadata) for message in messages]
+        segments.append(f"### Response:\n")
 
-        for message in messages:
-            if message.is_system_message():
-                prompt += f"### Instruction:\n{message.get_message(use_metadata)}\n\n"
-            elif message.is_user_message():
-                prompt += f"### Input:\n{message.get_message(use_metadata)}\n\n"
-            elif message.is_assistant_message():
-                prompt += f"### Response:\n{message.get_message(use_metadata)}\n\n"
+        return "".join(segments)
 
-        prompt += f"### Response:\n"
-
-        return prompt
+    def format_message(self, message: ModelMessage, use_metadata: bool = False) -> str:
+        if message.is_system_message():
+            return f"### Instruction:\n{message.get_message(use_metadata)}\n\n"
+        elif message.is_user_message():
+            return f"### Input:\n{message.get_message(use_metadata)}\n\n"
+        elif message.is_assistant_message():
+            return f"### Response:\n{message.get_message(use_metadata)}\n\n"
+        return ""
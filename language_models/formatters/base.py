@@ -1,4 +1,4 @@
-from typing import List, Sequence, Union
+from typing import Hashable, List, Sequence, Union
 
 from language_models.model_message import ModelMessage
 
@@ -10,9 +10,24 @@ class PromptFormatter:
     def generate_prompt(
         self, messages: Sequence[ModelMessage], use_metadata: bool = False
     ) -> str | List[Union[int, str]]:
-        prompt = ""
-
-        for message in messages:
-            prompt += f"<|im_start|>{message.get_role()}\n{message.get_message(use_metadata)}<|im_end|>\n"
+        prompt = "".join(
+            self.render_message(message, use_metadata) for message in messages
+        )
 
         return prompt.strip() + "<|im_start|>assistant"
+
+    def render_message(self, message: ModelMessage, use_metadata: bool = False) -> str:
+        """Returns the segment of the prompt for the message, which is cached on the
+        message until its content or metadata changes."""
+        return message.get_rendered(
+            self.get_render_key(use_metadata),
+            lambda: self.format_message(message, use_metadata),
+        )
+
+    def get_render_key(self, use_metadata: bool) -> Hashable:
+        """Identifies the segments of this formatter in the caches of the messages,
+        formatters with settings that change the segments must include them."""
+        return (type(self).__name__, use_metadata)
+
+    def format_message(self, message: ModelMessage, use_metadata: bool = False) -> str:
+        return f"<|im_start|>{message.get_role()}\n{message.get_message(use_metadata)}<|im_end|>\n"
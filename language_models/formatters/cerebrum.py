@@ -10,7 +10,7 @@ class CerebrumFormatter(PromptFormatter):
     def generate_prompt(
         self, messages: Sequence[ModelMessage], use_metadata: bool = False
     ) -> str:
-        prompt = "<s>"
+        segments = ["<s>"]
 
         system_message = ""
 
@@ -19,16 +19,21 @@ class CerebrumFormatter(PromptFormatter):
                 system_message = message.get_message(use_metadata)
             elif message.is_user_message():
                 if system_message and self.is_last_message(messages, i):
-                    prompt += f"{system_message}\n"
+                    segments.append(f"{system_message}\n")
                     system_message = ""
 
-                prompt += f"User: {message.get_message(use_metadata)}\n"
+                segments.append(self.render_message(message, use_metadata))
             elif message.is_assistant_message():
-                prompt += f"AI: {message.get_message(use_metadata)}\n"
+                segments.append(self.render_message(message, use_metadata))
 
-        prompt += f"AI:"
+        segments.append(f"AI:")
 
-        return prompt
+        return "".join(segments)
+
+    def format_message(self, message: ModelMessage, use_metadata: bool = False) -> str:
+        if message.is_user_message():
+            return f"User: {message.get_message(use_metadata)}\n"
+        return f"AI: {message.get_message(use_metadata)}\n"
 
     def is_last_message(self, messages: Sequence[ModelMessage], i: int) -> bool:
         return i == len(messages) - 1
@@ -0,0 +1,108 @@
+import datetime
+import hashlib
+import threading
+from typing import Dict, List, Sequence
+
+from jinja2 import Template, TemplateError
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+
+from language_models.formatters.base import PromptFormatter
+from language_models.model_message import ModelMessage
+
+# Hash of a chat template -> compiled template, shared by every model with it
+compiled_templates: Dict[str, Template] = {}
+compiled_templates_lock = threading.Lock()
+
+
+def raise_exception(message: str) -> None:
+    raise TemplateError(message)
+
+
+def compile_chat_template(chat_template: str) -> Template:
+    """Compiles the template once per process. Templates come from model files,
+    so they are rendered in a sandbox."""
+    key = hashlib.sha256(chat_template.encode("utf8")).hexdigest()
+
+    with compiled_templates_lock:
+        template = compiled_templates.get(key)
+
+        if template is None:
+            environment = ImmutableSandboxedEnvironment(
+                trim_blocks=True, lstrip_blocks=True
+            )
+            environment.globals["raise_exception"] = raise_exception
+            environment.globals["strftime_now"] = lambda format: (
+                datetime.datetime.now().strftime(format)
+            )
+            template = environment.from_string(chat_template)
+            compiled_templates[key] = template
+
+        return template
+
+
+class ChatTemplateFormatter(PromptFormatter):
+    """
+    Formats prompts with the Jinja chat template of the model, as stored in its
+    GGUF file. Templates render the whole conversation, so unlike the other
+    formatters the prompt isn't assembled from cached segments, but the
+    messages with metadata are.
+
+    The BOS token is left out, as llama.cpp adds it when tokenizing the prompt.
+    """
+
+    def __init__(self, chat_template: str, eos_token: str = ""):
+        super().__init__("CHAT_TEMPLATE")
+        self.template = compile_chat_template(chat_template)
+        self.eos_token = eos_token
+
+    def generate_prompt(
+        self, messages: Sequence[ModelMessage], use_metadata: bool = False
+    ) -> str:
+        template_messages = [
+            {
+                "role": message.get_role(),
+                "content": self.render_message(message, use_metadata),
+            }
+            for message in messages
+        ]
+
+        try:
+            return self.render(template_messages)
+        except TemplateError:
+            # Many templates only accept alternating user and assistant messages
+            return self.render(merge_system_messages(template_messages))
+
+    def format_message(self, message: ModelMessage, use_metadata: bool = False) -> str:
+        return message.get_message(use_metadata)
+
+    def render(self, template_messages: List[Dict[str, str]]) -> str:
+        return self.template.render(
+            messages=template_messages,
+            add_generation_prompt=True,
+            bos_token="",
+            eos_token=self.eos_token,
+        )
+
+
+def merge_system_messages(
+    template_messages: List[Dict[str, str]],
+) -> List[Dict[str, str]]:
+    """Moves the system messages into the following user message."""
+    merged: List[Dict[str, str]] = []
+    system_content = ""
+
+    for message in template_messages:
+        if message["role"] == "system":
+            system_content += message["content"] + "\n\n"
+        elif message["role"] == "user" and system_content:
+            merged.append(
+                {"role": "user", "content": system_content + message["content"]}
+            )
+            system_content = ""
+        else:
+            merged.append(message)
+
+    if system_content:
+        merged.append({"role": "user", "content": system_content.strip()})
+
+    return merged
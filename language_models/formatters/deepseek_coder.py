@@ -25,12 +25,14 @@ class DeepseekCoderFormatter(PromptFormatter):
         if len(instruction_messages) == 1:
             instruction = instruction_messages[0].get_message(use_metadata)
         else:
-            for message in instruction_messages:
-                if message.is_user_message():
-                    instruction += f"\n### USER:\n{message.get_message(use_metadata)}"
-                else:
-                    instruction += (
-                        f"\n### ASSISTANT:\n{message.get_message(use_metadata)}"
-                    )
+            instruction = "".join(
+                self.render_message(message, use_metadata)
+                for message in instruction_messages
+            )
 
         return f"{system_message}\n### Instruction:\n{instruction}\n### Response:"
+
+    def format_message(self, message: ModelMessage, use_metadata: bool = False) -> str:
+        if message.is_user_message():
+            return f"\n### USER:\n{message.get_message(use_metadata)}"
+        return f"\n### ASSISTANT:\n{message.get_message(use_metadata)}"
@@ -12,7 +12,7 @@ class Llama3Formatter(PromptFormatter):
     def generate_prompt(
         self, messages: Sequence[ModelMessage], use_metadata: bool = False
     ) -> str:
-        prompt: str = "<|begin_of_text|>"
+        segments = ["<|begin_of_text|>"]
 
         system_message = ""
 
@@ -21,18 +21,17 @@ class Llama3Formatter(PromptFormatter):
                 system_message = message.get_message(use_metadata)
 
         if system_message:
-            prompt += self._add_message(system_message, "system")
+            segments.append(self._add_message(system_message, "system"))
 
         for message in messages:
-            if message.is_user_message():
-                prompt += self._add_message(message.get_message(use_metadata), "user")
-            elif message.is_assistant_message():
-                prompt += self._add_message(
-                    message.get_message(use_metadata), "assistant"
-                )
-
-        prompt += "<|start_header_id|>assistant<|end_header_id|>\n\n"
-        return prompt
+            if message.is_user_message() or message.is_assistant_message():
+                segments.append(self.render_message(message, use_metadata))
+
+        segments.append("<|start_header_id|>assistant<|end_header_id|>\n\n")
+        return "".join(segments)
+
+    def format_message(self, message: ModelMessage, use_metadata: bool = False) -> str:
+        return self._add_message(message.get_message(use_metadata), message.get_role())
 
     def _add_message(self, message: str, role: str) -> str:
         return f"<|start_header_id|>{role}<|end_header_id|>\n\n{message}<|eot_id|>"
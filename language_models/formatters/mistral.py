@@ -23,17 +23,21 @@ class MistralFormatter(PromptFormatter):
         for i, message in enumerate(messages):
             if message.is_user_message():
                 if i == len(messages) - 1:
-                    prompt.append(
-                        self._user_message(message, use_metadata, system_message_latest)
-                    )
+                    user_system_message = system_message_latest
                 else:
+                    user_system_message = system_message
+
+                # Only messages without a system message are the same every turn
+                if user_system_message:
                     prompt.append(
-                        self._user_message(message, use_metadata, system_message)
+                        self._user_message(message, use_metadata, user_system_message)
                     )
+                else:
+                    prompt.append(self.render_message(message, use_metadata))
                 system_message = ""
 
             elif message.is_assistant_message():
-                prompt.append(f"{message.get_message(use_metadata)}")
+                prompt.append(self.render_message(message, use_metadata))
                 prompt.append(self.EOS)
             elif message.is_system_message():
                 system_message = message.get_message(use_metadata)
@@ -43,6 +47,11 @@ class MistralFormatter(PromptFormatter):
             prompt.append(self._user_message(None, use_metadata, system_message))
         return prompt
 
+    def format_message(self, message: ModelMessage, use_metadata: bool = False) -> str:
+        if message.is_user_message():
+            return self._user_message(message, use_metadata, "")
+        return message.get_message(use_metadata)
+
     def _user_message(
         self,
         message: Optional[ModelMessage],
@@ -10,16 +10,16 @@ class OrcaHashesFormatter(PromptFormatter):
     def generate_prompt(
         self, messages: Sequence[ModelMessage], use_metadata: bool = False
     ) -> str:
-        prompt = ""
+        segments = [self.render_message(message, use_metadata) for message in messages]
+        segments.append(f"### Assistant:")
 
-        for message in messages:
-            if message.is_user_message():
-                prompt += f"### User:\n{message.get_message(use_metadata)}\n"
-            elif message.is_assistant_message():
-                prompt += f"### Assistant:\n{message.get_message(use_metadata)}\n"
-            elif message.is_system_message():
-                prompt += f"### System:\n{message.get_message(use_metadata)}\n"
+        return "".join(segments)
 
-        prompt += f"### Assistant:"
-
-        return prompt
+    def format_message(self, message: ModelMessage, use_metadata: bool = False) -> str:
+        if message.is_user_message():
+            return f"### User:\n{message.get_message(use_metadata)}\n"
+        elif message.is_assistant_message():
+            return f"### Assistant:\n{message.get_message(use_metadata)}\n"
+        elif message.is_system_message():
+            return f"### System:\n{message.get_message(use_metadata)}\n"
+        return ""
@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+from language_models.api.base import ApiModel
+from language_models.model_conversation import generate_metadata
+from language_models.model_message import ModelMessage, Role
+
+
+def generate_batch(
+    model: ApiModel,
+    prompts: Sequence[Dict[str, Any]],
+    max_tokens: int = 200,
+    temperature: float = 0.2,
+    concurrency: int = 1,
+) -> List[Dict[str, Any]]:
+    """
+    Generates a response for every independent prompt, a dictionary with a "user"
+    message and an optional "system" message. Up to concurrency prompts are
+    generated at the same time, which llama.cpp spreads over its parallel slots.
+
+    Returns:
+        A result per prompt in the order of the prompts, with the "response" or
+        the "error_message" of a prompt that failed.
+    """
+
+    def generate(prompt: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            messages = create_messages(prompt)
+            response = model.generate_text(
+                messages, max_tokens=max_tokens, temperature=temperature
+            )
+            return {"result": True, "response": response.get_text()}
+        except Exception as e:
+            return {"result": False, "error_message": str(e)}
+
+    if not prompts:
+        return []
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(concurrency, len(prompts))),
+        thread_name_prefix="batch",
+    ) as executor:
+        return list(executor.map(generate, prompts))
+
+
+def create_messages(prompt: Dict[str, Any]) -> List[ModelMessage]:
+    if not isinstance(prompt, dict) or not isinstance(prompt.get("user"), str):
+        raise ValueError("Every prompt needs a user message.")
+
+    metadata = generate_metadata()
+
+    messages: List[ModelMessage] = []
+    if prompt.get("system"):
+        messages.append(ModelMessage(Role.SYSTEM, str(prompt["system"]), metadata))
+    messages.append(ModelMessage(Role.USER, prompt["user"], metadata))
+
+    return messages
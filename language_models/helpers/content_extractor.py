@@ -0,0 +1,235 @@
+import math
+import re
+from collections import Counter
+from typing import List, Optional, Sequence
+
+import lxml.html
+from lxml import etree
+
+# Elements that never contain the main content of a page
+BOILERPLATE_TAGS = [
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "svg",
+    "iframe",
+    "button",
+    "nav",
+    "header",
+    "footer",
+    "aside",
+]
+
+BLOCK_TAGS = {
+    "address",
+    "article",
+    "blockquote",
+    "dd",
+    "div",
+    "dl",
+    "dt",
+    "figcaption",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "li",
+    "main",
+    "ol",
+    "p",
+    "pre",
+    "section",
+    "table",
+    "td",
+    "th",
+    "tr",
+    "ul",
+}
+
+WHITESPACE_PATTERN = re.compile(r"[ \t\r\f\v\xa0]+")
+TERM_PATTERN = re.compile(r"\w+")
+
+PASSAGE_SEPARATOR = "\n...\n"
+
+# Rough size of a token, used to turn token budgets into character budgets
+CHARACTERS_PER_TOKEN = 4
+
+
+def extract_main_content(html: str) -> str:
+    """
+    Extracts the readable text of the main content of a page. Scripts, styles,
+    navigation and other boilerplate are dropped, and the text of the <main> or
+    largest <article> element is used if the page has one. Block elements are
+    separated by newlines.
+    """
+    try:
+        document = lxml.html.document_fromstring(html)
+    except (ValueError, etree.ParserError):
+        return ""
+
+    for element in list(document.iter(*BOILERPLATE_TAGS)):
+        element.drop_tree()
+
+    root = document
+    candidates = document.xpath("//main | //article | //*[@role='main']")
+    if candidates:
+        root = max(candidates, key=lambda element: len(element.text_content()))
+
+    title = document.findtext(".//title") or ""
+
+    parts: List[str] = []
+    for event, element in etree.iterwalk(root, events=("start", "end")):
+        is_element = isinstance(element.tag, str)
+
+        if event == "start":
+            if is_element and element.tag in BLOCK_TAGS or element.tag == "br":
+                parts.append("\n")
+            if is_element and element.text:
+                parts.append(element.text)
+        else:
+            if is_element and element.tag in BLOCK_TAGS:
+                parts.append("\n")
+            if element.tail and element is not root:
+                parts.append(element.tail)
+
+    lines = [
+        WHITESPACE_PATTERN.sub(" ", line).strip() for line in "".join(parts).split("\n")
+    ]
+    text = "\n".join(line for line in lines if line)
+
+    title = title.strip()
+    if title and not text.startswith(title):
+        text = f"{title}\n{text}"
+
+    return text
+
+
+def chunk_text(text: str, chunk_size: int = 800) -> List[str]:
+    """Splits the text into chunks of about chunk_size characters on line
+    boundaries. Lines longer than the chunk size are split on spaces."""
+    chunks: List[str] = []
+    current: List[str] = []
+    current_size = 0
+
+    for line in text.split("\n"):
+        if len(line) > chunk_size and current:
+            chunks.append("\n".join(current))
+            current = []
+            current_size = 0
+
+        while len(line) > chunk_size:
+            split_index = line.rfind(" ", 0, chunk_size)
+            if split_index <= 0:
+                split_index = chunk_size
+            chunks.append(line[:split_index])
+            line = line[split_index:].lstrip()
+
+        if current and current_size + len(line) > chunk_size:
+            chunks.append("\n".join(current))
+            current = []
+            current_size = 0
+
+        if line:
+            current.append(line)
+            current_size += len(line) + 1
+
+    if current:
+        chunks.append("\n".join(current))
+
+    return chunks
+
+
+def rank_chunks(chunks: List[str], query: str) -> List[float]:
+    """Scores the chunks against the query with BM25."""
+    query_terms = set(TERM_PATTERN.findall(query.lower()))
+    chunk_terms = [Counter(TERM_PATTERN.findall(chunk.lower())) for chunk in chunks]
+
+    if not chunks or not query_terms:
+        return [0.0] * len(chunks)
+
+    average_length = sum(sum(terms.values()) for terms in chunk_terms) / len(chunks)
+    average_length = max(average_length, 1)
+
+    idfs = {}
+    for term in query_terms:
+        document_frequency = sum(1 for terms in chunk_terms if term in terms)
+        idfs[term] = math.log(
+            1 + (len(chunks) - document_frequency + 0.5) / (document_frequency + 0.5)
+        )
+
+    scores: List[float] = []
+    for terms in chunk_terms:
+        length = sum(terms.values())
+        score = 0.0
+        for term in query_terms:
+            frequency = terms.get(term, 0)
+            if not frequency:
+                continue
+            score += (
+                idfs[term]
+                * frequency
+                * 2.2
+                / (frequency + 1.2 * (0.25 + 0.75 * length / average_length))
+            )
+        scores.append(score)
+
+    return scores
+
+
+def select_relevant_passages(
+    texts: Sequence[str], query: str, max_characters: int = 4000
+) -> List[List[str]]:
+    """
+    Chunks the texts and selects the chunks that are most relevant to the query
+    across all texts, within max_characters in total. Returns the selected chunks
+    of every text in their original order.
+    """
+    # Small enough that several chunks fit in the budget
+    chunk_size = max(100, min(800, max_characters // 4))
+
+    chunks = [
+        (i, chunk)
+        for i, text in enumerate(texts)
+        for chunk in chunk_text(text, chunk_size)
+    ]
+    scores = rank_chunks([chunk for _, chunk in chunks], query)
+
+    ranked = sorted(range(len(chunks)), key=lambda j: scores[j], reverse=True)
+
+    selected: List[int] = []
+    size = 0
+    for j in ranked:
+        if scores[j] <= 0:
+            break
+        if size + len(chunks[j][1]) > max_characters:
+            continue
+        selected.append(j)
+        size += len(chunks[j][1]) + len(PASSAGE_SEPARATOR)
+
+    passages: List[List[str]] = [[] for _ in texts]
+    for j in sorted(selected):
+        passages[chunks[j][0]].append(chunks[j][1])
+
+    return passages
+
+
+def select_relevant_content(
+    text: str, query: Optional[str], max_characters: int = 4000
+) -> str:
+    """
+    Returns the parts of the text that are most relevant to the query within
+    max_characters, in their original order. Without a query, or if nothing
+    matches, the start of the text is returned.
+    """
+    if len(text) <= max_characters:
+        return text
+
+    passages = select_relevant_passages([text], query or "", max_characters)[0]
+
+    if not passages:
+        return text[:max_characters]
+
+    return PASSAGE_SEPARATOR.join(passages)
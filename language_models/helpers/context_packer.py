@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+from language_models.helpers.content_extractor import (
+    PASSAGE_SEPARATOR,
+    select_relevant_passages,
+)
+from language_models.helpers.file_reader import read_file_excerpt
+
+# Shared by all packings, the selected files are read concurrently
+READ_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="read")
+
+
+def read_selected_files(
+    paths: Sequence[str], max_file_characters: int
+) -> List[Optional[str]]:
+    """Reads the files concurrently, files that are missing, binary or fail to be
+    read are None."""
+
+    def read_or_none(path: str) -> Optional[str]:
+        try:
+            if not os.path.isfile(path):
+                return None
+
+            excerpt = read_file_excerpt(path, max_file_characters)
+            return None if excerpt.binary else excerpt.text
+        except Exception as e:
+            print(f"Failed to read {path}: {e}")
+            return None
+
+    return list(READ_EXECUTOR.map(read_or_none, paths))
+
+
+def pack_selected_files(
+    paths: Sequence[str],
+    query: str,
+    max_characters: int,
+    max_file_characters: int = 200_000,
+) -> str:
+    """
+    Reads all selected files and packs the chunks that are most relevant to the
+    query into max_characters, grouped by file in their original order. Files
+    that fit the budget together are included completely, and if nothing
+    matches the query the budget is split evenly between the starts of the files.
+    """
+    if not paths or max_characters <= 0:
+        return ""
+
+    contents = read_selected_files(paths, max_file_characters)
+    files = [(path, text) for path, text in zip(paths, contents) if text]
+
+    if not files:
+        return ""
+
+    # Room for the <FILE> tags around every file and the newlines between them
+    overhead = sum(len(format_file(path, "")) + 1 for path, _ in files)
+    budget = max_characters - overhead
+
+    if budget <= 0:
+        return ""
+
+    if sum(len(text) for _, text in files) <= budget:
+        packed = [text for _, text in files]
+    else:
+        passages = select_relevant_passages([text for _, text in files], query, budget)
+        packed = [PASSAGE_SEPARATOR.join(file_passages) for file_passages in passages]
+
+        if not any(packed):
+            share = budget // len(files)
+            packed = [text[:share] for _, text in files]
+
+    return "\n".join(
+        format_file(path, text) for (path, _), text in zip(files, packed) if text
+    )
+
+
+def format_file(path: str, text: str) -> str:
+    return f'<FILE path="{path}">\n{text}\n</FILE>'
@@ -1,10 +1,89 @@
 # Support detection of __import__, importlib, breakpoint, compile, exec, eval, input, open,
 
-from typing import List
+import ast
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Set
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Attributes that allow escaping to builtins, modules or code objects
+DANGEROUS_ATTRIBUTES = {
+    "__base__",
+    "__bases__",
+    "__builtins__",
+    "__code__",
+    "__globals__",
+    "__loader__",
+    "__mro__",
+    "__subclasses__",
+}
+
+
+class DangerousCodeVisitor(ast.NodeVisitor):
+    """Visits the syntax tree of code once and stops at the first call, name,
+    attribute or import that is considered potentially dangerous."""
+
+    def __init__(
+        self, potentially_harmful_functions: Set[str], approved_imports: Set[str]
+    ):
+        self.potentially_harmful_functions = potentially_harmful_functions
+        self.approved_imports = approved_imports
+        self.dangerous = False
+
+    def visit(self, node: ast.AST) -> None:
+        if not self.dangerous:
+            super().visit(node)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if (
+            node.id in self.potentially_harmful_functions
+            or node.id in DANGEROUS_ATTRIBUTES
+        ):
+            self.dangerous = True
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if (
+            node.attr in self.potentially_harmful_functions
+            or node.attr in DANGEROUS_ATTRIBUTES
+        ):
+            self.dangerous = True
+            return
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        # eval is allowed, but code passed to it as a literal is checked as well
+        if (
+            isinstance(node.func, ast.Name)
+            and node.func.id == "eval"
+            and node.args
+            and isinstance(node.args[0], ast.Constant)
+            and isinstance(node.args[0].value, str)
+        ):
+            try:
+                self.visit(ast.parse(node.args[0].value, mode="eval"))
+            except SyntaxError:
+                pass
+        self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if not self._is_approved_module(alias.name):
+                self.dangerous = True
+                return
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        if node.level > 0 or not self._is_approved_module(node.module or ""):
+            self.dangerous = True
+
+    def _is_approved_module(self, module_name: str) -> bool:
+        return module_name.split(".")[0] in self.approved_imports
 
 
 class DangerousCodeDetector:
-    def __init__(self) -> None:
+    def __init__(self, cache_size: int = 1024) -> None:
         self.potentially_harmful_functions = [
             "__import__",
             "breakpoint",
@@ -35,7 +114,63 @@ class DangerousCodeDetector:
             "typing",
         ]
 
+        # Verdicts by hash of the code, generated code is often checked repeatedly
+        self.cache_size = cache_size
+        self.verdict_cache: OrderedDict[str, bool] = OrderedDict()
+        self.lock = threading.Lock()
+
     def detect_potentially_dangerous_code(self, code: str) -> bool:
+        """
+        Detects calls of potentially harmful functions, escapes through dunder
+        attributes and imports of modules that are not approved. The code is
+        parsed once with ast; text that isn't valid Python is checked line by line.
+        """
+        cache_key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+        with self.lock:
+            if cache_key in self.verdict_cache:
+                self.verdict_cache.move_to_end(cache_key)
+                return self.verdict_cache[cache_key]
+
+        try:
+            dangerous = self.has_candidate_words(
+                code
+            ) and self.detect_potentially_dangerous_code_with_ast(code)
+        except (SyntaxError, ValueError):
+            dangerous = self.detect_potentially_dangerous_code_by_line(code)
+
+        with self.lock:
+            self.verdict_cache[cache_key] = dangerous
+            if len(self.verdict_cache) > self.cache_size:
+                self.verdict_cache.popitem(last=False)
+
+        return dangerous
+
+    def has_candidate_words(self, code: str) -> bool:
+        """Returns False if the code contains none of the words the analysis looks
+        for, in which case it doesn't need to be parsed. Non ASCII code is always
+        parsed, since Python normalizes unicode identifiers."""
+        if not code.isascii():
+            return True
+
+        candidate_words = {"import", "eval"}
+        candidate_words.update(self.potentially_harmful_functions)
+        candidate_words.update(DANGEROUS_ATTRIBUTES)
+
+        return any(word in candidate_words for word in WORD_PATTERN.findall(code))
+
+    def detect_potentially_dangerous_code_with_ast(self, code: str) -> bool:
+        """
+        Raises:
+            SyntaxError: If the code can't be parsed.
+        """
+        visitor = DangerousCodeVisitor(
+            set(self.potentially_harmful_functions), set(self.approved_imports)
+        )
+        visitor.visit(ast.parse(code))
+        return visitor.dangerous
+
+    def detect_potentially_dangerous_code_by_line(self, code: str) -> bool:
         code = self._remove_comments(code)
 
         for line in code.lower().split("\n"):
@@ -124,20 +259,7 @@ class DangerousCodeDetector:
         return False
 
     def _parse_line(self, line: str) -> List[str]:
-        parsed_parts: List[str] = []
-        buffer = ""
-        for c in line:
-            if not c.isalnum() and c != "_":
-                if buffer:
-                    parsed_parts.append(buffer)
-                    buffer = ""
-            else:
-                buffer += c
-
-        if buffer:
-            parsed_parts.append(buffer)
-
-        return parsed_parts
+        return WORD_PATTERN.findall(line)
 
     def _detect_potentially_dangerous_imports(
         self, parsed_parts: List[str], line: str
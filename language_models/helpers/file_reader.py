@@ -0,0 +1,142 @@
+import mmap
+import os
+from typing import Optional
+
+# Bytes inspected to decide whether a file is binary
+BINARY_SAMPLE_SIZE = 8192
+
+# Text control characters, other bytes below 32 indicate a binary file
+TEXT_CONTROL_BYTES = {7, 8, 9, 10, 12, 13, 27}
+
+COUNT_CHUNK_SIZE = 1 << 20
+
+
+class FileExcerpt:
+    def __init__(
+        self,
+        text: str,
+        first_line: int = 0,
+        last_line: int = 0,
+        total_lines: int = 0,
+        truncated: bool = False,
+        binary: bool = False,
+    ):
+        self.text = text
+        self.first_line = first_line
+        self.last_line = last_line
+        self.total_lines = total_lines
+        self.truncated = truncated
+        self.binary = binary
+
+
+def is_binary(sample: bytes) -> bool:
+    if b"\x00" in sample:
+        return True
+
+    if not sample:
+        return False
+
+    control_count = sum(
+        1 for byte in sample if byte < 32 and byte not in TEXT_CONTROL_BYTES
+    )
+    return control_count / len(sample) > 0.1
+
+
+def read_file_excerpt(
+    path: str,
+    max_characters: int,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+) -> FileExcerpt:
+    """
+    Reads at most about max_characters of a text file through a memory map, so
+    only the parts that are returned are loaded. With a line range (1-based,
+    inclusive) only those lines are read. A file or range that doesn't fit is
+    shortened to its head and tail, and binary files are not read at all.
+    """
+    size = os.path.getsize(path)
+
+    if size == 0:
+        return FileExcerpt("")
+
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as memory_map:
+            if is_binary(memory_map[:BINARY_SAMPLE_SIZE]):
+                return FileExcerpt(f"[Binary file, {size} bytes]", binary=True)
+
+            total_lines = count_lines(memory_map)
+
+            first_line = max(1, start_line or 1)
+            last_line = min(total_lines, end_line or total_lines)
+
+            if first_line > last_line:
+                return FileExcerpt("", first_line, last_line, total_lines)
+
+            start = find_line_start(memory_map, first_line)
+            end = find_line_start(memory_map, last_line + 1)
+
+            if end - start <= max_characters:
+                return FileExcerpt(
+                    decode(memory_map[start:end]), first_line, last_line, total_lines
+                )
+
+            # Bytes are at least as many as characters, so the head and tail never
+            # hold more than max_characters in total. Both end at line breaks unless
+            # the lines are longer than half the budget.
+            half = max_characters // 2
+            head_end = memory_map.rfind(b"\n", start, start + half) + 1 or start + half
+            tail_start = memory_map.find(b"\n", end - half, end - 1) + 1 or end - half
+
+            head_last_line = first_line + memory_map[start:head_end].count(b"\n") - 1
+            tail_first_line = last_line - memory_map[tail_start:end].count(b"\n") + 1
+            if memory_map[end - 1 : end] != b"\n":
+                tail_first_line -= 1
+
+            # Lines that are cut in the middle count as omitted
+            head_cut = memory_map[head_end - 1 : head_end] != b"\n"
+            tail_cut = memory_map[tail_start - 1 : tail_start] != b"\n"
+
+            first_omitted = head_last_line + 1
+            last_omitted = tail_first_line if tail_cut else tail_first_line - 1
+            omitted_bytes = tail_start - head_end
+
+            if first_omitted == last_omitted and (head_cut or tail_cut):
+                marker = f"[... line {first_omitted} shortened, {omitted_bytes} bytes omitted ...]"
+            elif first_omitted == last_omitted:
+                marker = f"[... line {first_omitted} omitted ({omitted_bytes} bytes), use START_LINE and END_LINE to read it ...]"
+            else:
+                marker = f"[... lines {first_omitted}-{last_omitted} omitted ({omitted_bytes} bytes), use START_LINE and END_LINE to read them ...]"
+
+            text = (
+                decode(memory_map[start:head_end])
+                + f"\n{marker}\n"
+                + decode(memory_map[tail_start:end])
+            )
+
+            return FileExcerpt(text, first_line, last_line, total_lines, True)
+
+
+def count_lines(memory_map: mmap.mmap) -> int:
+    newline_count = 0
+    for position in range(0, len(memory_map), COUNT_CHUNK_SIZE):
+        newline_count += memory_map[position : position + COUNT_CHUNK_SIZE].count(b"\n")
+
+    if memory_map[len(memory_map) - 1 :] != b"\n":
+        newline_count += 1  # The last line has no line break
+
+    return newline_count
+
+
+def find_line_start(memory_map: mmap.mmap, line: int) -> int:
+    """Returns the offset of the 1-based line, or the file size after the last
+    line."""
+    position = 0
+    for _ in range(line - 1):
+        position = memory_map.find(b"\n", position) + 1
+        if position == 0:
+            return len(memory_map)
+    return position
+
+
+def decode(data: bytes) -> str:
+    return data.decode("utf8", errors="replace")
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from language_models.helpers.tool_result_cache import ToolResultCache
+
+
+class GenerationCache:
+    """
+    Caches the responses of deterministic generations, in an LRU in memory in
+    front of an LRU of JSON files on disk. Both are bounded by a size budget: the
+    memory by the number of cached characters, the disk by the number of bytes of
+    the files, of which the least recently used are deleted first.
+
+    Configured through GENERATION_CACHE.PATH (empty keeps the cache in memory),
+    GENERATION_CACHE.MAX_MEMORY_CHARACTERS and GENERATION_CACHE.MAX_DISK_BYTES.
+    """
+
+    _instance: Optional["GenerationCache"] = None
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        max_memory_characters: Optional[int] = None,
+        max_disk_bytes: Optional[int] = None,
+    ):
+        if cache_path is None:
+            cache_path = os.getenv("GENERATION_CACHE.PATH", "cache/generations")
+        if max_memory_characters is None:
+            max_memory_characters = int(
+                os.getenv("GENERATION_CACHE.MAX_MEMORY_CHARACTERS", 4_000_000)
+            )
+        if max_disk_bytes is None:
+            max_disk_bytes = int(
+                os.getenv("GENERATION_CACHE.MAX_DISK_BYTES", 100_000_000)
+            )
+
+        self.cache_path = cache_path
+        self.max_disk_bytes = max_disk_bytes
+
+        self.memory = ToolResultCache(
+            max_entries=100_000, max_characters=max_memory_characters
+        )
+
+        # Key -> size of the file, the least recently used first. Loaded from the
+        # cache directory on first use
+        self.disk_entries: Optional[OrderedDict[str, int]] = None
+        self.disk_size = 0
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.disk_evictions = 0
+
+    @classmethod
+    def get_instance(cls) -> "GenerationCache":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @staticmethod
+    def create_key(model_path: str, request: Dict[str, Any]) -> str:
+        """Hashes everything that determines the response: the model and the
+        request to it with the rendered prompt, sampling parameters and grammar."""
+        return hashlib.sha256(
+            json.dumps(
+                {"model_path": model_path, "request": request}, sort_keys=True
+            ).encode("utf8")
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """Returns the cached response with its "text" and "model", or None."""
+        value = self.memory.get(key)
+        if value is not None:
+            with self.lock:
+                self.memory_hits += 1
+            return json.loads(value)
+
+        entry = self._read_disk(key)
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+
+        self.memory.set(key, json.dumps(entry))
+        return entry
+
+    def set(self, key: str, text: str, model: str) -> None:
+        value = json.dumps({"text": text, "model": model})
+
+        self.memory.set(key, value)
+        self._write_disk(key, value)
+
+        with self.lock:
+            self.stores += 1
+
+    def get_stats(self) -> Dict[str, float]:
+        memory_stats = self.memory.get_stats()
+
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": memory_stats["entries"],
+                "memory_characters": memory_stats["characters"],
+                "disk_entries": len(self.disk_entries or {}),
+                "disk_bytes": self.disk_size,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "memory_evictions": memory_stats["evictions"],
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": (
+                    (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+                ),
+            }
+
+    def _get_cache_file(self, key: str) -> str:
+        return os.path.join(self.cache_path, key + ".json")
+
+    def _load_disk_entries(self) -> "OrderedDict[str, int]":
+        """Returns the files in the cache directory, called with the lock held."""
+        if self.disk_entries is None:
+            files = []
+            if os.path.isdir(self.cache_path):
+                for entry in os.scandir(self.cache_path):
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+
+            self.disk_entries = OrderedDict(
+                (key, size) for _, key, size in sorted(files)
+            )
+            self.disk_size = sum(self.disk_entries.values())
+
+        return self.disk_entries
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, str]]:
+        if not self.cache_path:
+            return None
+
+        with self.lock:
+            disk_entries = self._load_disk_entries()
+            if key not in disk_entries:
+                return None
+            disk_entries.move_to_end(key)
+
+        cache_file = self._get_cache_file(key)
+        try:
+            with open(cache_file, "r", encoding="utf8") as file:
+                entry = json.load(file)
+
+            # Keeps the order of the least recently used files across restarts
+            os.utime(cache_file)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, value: str) -> None:
+        if not self.cache_path:
+            return
+
+        data = value.encode("utf8")
+        if len(data) > self.max_disk_bytes:
+            return
+
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+
+            # Written to a temporary file first, so concurrent readers never see
+            # a partial entry
+            cache_file = self._get_cache_file(key)
+            temporary_file = f"{cache_file}.{threading.get_ident()}.tmp"
+            with open(temporary_file, "wb") as file:
+                file.write(data)
+            os.replace(temporary_file, cache_file)
+        except OSError as e:
+            print(f"Failed to write the generation cache: {e}")
+            return
+
+        with self.lock:
+            disk_entries = self._load_disk_entries()
+
+            self.disk_size += len(data) - disk_entries.pop(key, 0)
+            disk_entries[key] = len(data)
+
+            while self.disk_size > self.max_disk_bytes:
+                oldest_key, size = disk_entries.popitem(last=False)
+                self.disk_size -= size
+                self.disk_evictions += 1
+
+                try:
+                    os.remove(self._get_cache_file(oldest_key))
+                except OSError:
+                    pass
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# Metadata of a model file: chat_template, bos_token and eos_token
+GGUFMetadata = Dict[str, str]
+
+# Model path -> (size, modification time, metadata)
+metadata_cache: Dict[str, Tuple[int, int, GGUFMetadata]] = {}
+metadata_cache_lock = threading.Lock()
+
+
+def get_metadata_cache_path() -> str:
+    return os.getenv(
+        "MODEL.METADATA_CACHE_PATH", os.path.join("models", "metadata_cache.json")
+    )
+
+
+def read_gguf_metadata(model_path: str) -> GGUFMetadata:
+    """
+    Returns the chat template and the BOS and EOS tokens of a GGUF file. Reading
+    the file maps all of its metadata (including the vocabulary), so the result is
+    cached in memory and in MODEL.METADATA_CACHE_PATH until the file changes.
+    Missing values are empty strings.
+    """
+    stat = os.stat(model_path)
+    key = os.path.abspath(model_path)
+
+    with metadata_cache_lock:
+        cached = metadata_cache.get(key)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+
+        disk_cache = load_disk_cache()
+        entry = disk_cache.get(key)
+        if entry and (entry["size"], entry["mtime_ns"]) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        ):
+            metadata = entry["metadata"]
+        else:
+            metadata = read_gguf_fields(model_path)
+            disk_cache[key] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "metadata": metadata,
+            }
+            save_disk_cache(disk_cache)
+
+        metadata_cache[key] = (stat.st_size, stat.st_mtime_ns, metadata)
+        return metadata
+
+
+def read_gguf_fields(model_path: str) -> GGUFMetadata:
+    from gguf import GGUFReader
+
+    # Read-only, the file is only mapped and never written
+    reader = GGUFReader(model_path, "r")
+
+    def read_string(name: str) -> str:
+        field = reader.fields.get(name)
+        if not field or not field.data:
+            return ""
+        return bytes(field.parts[field.data[0]]).decode("utf8", errors="replace")
+
+    def read_token(name: str) -> str:
+        id_field = reader.fields.get(name)
+        tokens = reader.fields.get("tokenizer.ggml.tokens")
+        if not id_field or not tokens:
+            return ""
+
+        token_id = int(id_field.parts[id_field.data[0]][0])
+        if not 0 <= token_id < len(tokens.data):
+            return ""
+        return bytes(tokens.parts[tokens.data[token_id]]).decode(
+            "utf8", errors="replace"
+        )
+
+    return {
+        "chat_template": read_string("tokenizer.chat_template"),
+        "bos_token": read_token("tokenizer.ggml.bos_token_id"),
+        "eos_token": read_token("tokenizer.ggml.eos_token_id"),
+    }
+
+
+def load_disk_cache() -> Dict[str, Any]:
+    path = get_metadata_cache_path()
+
+    if not os.path.isfile(path):
+        return {}
+
+    try:
+        with open(path, "r", encoding="utf8") as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Failed to read the model metadata cache: {e}")
+        return {}
+
+
+def save_disk_cache(cache: Dict[str, Any]) -> None:
+    path = get_metadata_cache_path()
+
+    try:
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w", encoding="utf8") as file:
+            json.dump(cache, file)
+        os.replace(temporary_path, path)
+    except OSError as e:
+        print(f"Failed to write the model metadata cache: {e}")
+
+
+def read_chat_template(model_path: str) -> Optional[GGUFMetadata]:
+    """Returns the metadata of the model if it has a chat template."""
+    try:
+        metadata = read_gguf_metadata(model_path)
+    except Exception as e:
+        print(f"Failed to read the metadata of {model_path}: {e}")
+        return None
+
+    return metadata if metadata["chat_template"] else None
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from language_models.api.base import ApiModel
 from language_models.helpers.json_parser import parse_json
 from language_models.model_message import ModelMessage, Role, MessageMetadata
@@ -22,7 +22,9 @@ def fix_json_errors_manually(broken_json: str) -> str:
     return result
 
 
-def fix_json_errors_manually_helper(broken_json: str, start_index: int) -> str:
+def fix_json_errors_manually_helper(
+    broken_json: str, start_index: int
+) -> Tuple[str, int]:
     parsed_arguments: List[str] = []
 
     in_argument_name = False
@@ -33,6 +35,10 @@ def fix_json_errors_manually_helper(broken_json: str, start_index: int) -> str:
     argument_name = ""
     argument_value = ""
 
+    # Names and values are contiguous runs of characters, so they are sliced out
+    # of the text when they end instead of being built one character at a time
+    segment_start = 0
+
     i: int = start_index
     while i < len(broken_json):
         c = broken_json[i]
@@ -42,10 +48,12 @@ def fix_json_errors_manually_helper(broken_json: str, start_index: int) -> str:
             ):
                 if in_argument_name:
                     in_argument_name = False
+                    argument_name += broken_json[segment_start:i]
                     if not argument_name:
                         argument_name = "NONE"
                 elif in_argument_value:
                     in_argument_value = False
+                    argument_value += broken_json[segment_start:i]
                     parsed_arguments.append(f'"{argument_name}": "{argument_value}"')
                     argument_name = ""
                     argument_value = ""
@@ -53,22 +61,18 @@ def fix_json_errors_manually_helper(broken_json: str, start_index: int) -> str:
                 using_nonstring = False
                 if in_argument_name:
                     in_argument_name = False
+                    argument_name += broken_json[segment_start:i]
                     if not argument_name:
                         argument_name = "NONE"
                 else:
                     in_argument_value = False
+                    argument_value += broken_json[segment_start:i]
                     parsed_arguments.append(f'"{argument_name}": {argument_value}')
                     argument_name = ""
                     argument_value = ""
 
                     if c == "}":
                         break
-
-            else:
-                if in_argument_name:
-                    argument_name += c
-                elif in_argument_value:
-                    argument_value += c
         else:
             if (
                 c == "{" and argument_name
@@ -83,19 +87,25 @@ def fix_json_errors_manually_helper(broken_json: str, start_index: int) -> str:
                     in_argument_name = True
                 else:
                     in_argument_value = True
+                segment_start = i + 1
 
                 if c == "'":
                     using_single_quotes = True
             elif c in "0123456789nft" and argument_name:  # number, null, true, false
                 using_nonstring = True
                 in_argument_value = True
-                argument_value += c
+                segment_start = i
             elif c.isalpha():
                 using_nonstring = True
                 in_argument_name = True
-                argument_name += c
+                segment_start = i
         i += 1
 
+    if in_argument_name:
+        argument_name += broken_json[segment_start:i]
+    elif in_argument_value:
+        argument_value += broken_json[segment_start:i]
+
     if argument_name and argument_value:
         if using_nonstring:
             parsed_arguments.append(f'"{argument_name}": {argument_value}')
@@ -137,7 +147,10 @@ def fix_json_errors_with_model(
             content=f"The following json: {current_broken_json} failed to parse with the following error: {current_parsing_error}. Please fix the JSON and send it back to me.",
             metadata=metadata,
         )
-        response = model.generate_text([system_message, user_message]).get_text()
+        # Every try fixes a different JSON, so the fix can be deterministic
+        response = model.generate_text(
+            [system_message, user_message], temperature=0
+        ).get_text()
 
         try:
             print(f"Solution attempt: {response}")
@@ -1,25 +1,103 @@
 import json
-from typing import Any, Dict
+import re
+from typing import Any, Dict, Tuple
 
+# Characters that can change the nesting level or the string state
+JSON_TOKEN_PATTERN = re.compile(r'[{}"\\]')
+BRACE_PATTERN = re.compile(r"[{}]")
+BACKSLASH_PATTERN = re.compile(r"\\+(_?)")
+
+
+def find_json_span(raw_text: str) -> Tuple[int, int]:
+    """
+    Finds the first top level JSON object in the text in a single pass, jumping
+    between the characters that matter instead of visiting every character.
+    Braces inside strings are ignored. If the object is never closed, the span
+    ends at the end of the text.
+
+    Returns:
+        Tuple[int, int]: The start and end index of the object, (-1, -1) if the
+        text contains no object.
+    """
+    start_index = raw_text.find("{")
+
+    if start_index == -1:
+        return -1, -1
 
-def handle_json(raw_text: str) -> str:
     level_count = 0
-    start_index = -1
-    end_index = -1
-    for i, char in enumerate(raw_text):
-        if char == "{":
-            if start_index == -1:
-                start_index = i
+    in_string = False
+    escaped_index = -1
+
+    for match in JSON_TOKEN_PATTERN.finditer(raw_text, start_index):
+        char = match.group()
+        i = match.start()
+
+        if i == escaped_index:
+            continue
+
+        if char == "\\":
+            escaped_index = i + 1
+        elif char == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif char == "{":
             level_count += 1
-        elif char == "}":
+        else:
             level_count -= 1
             if level_count == 0:
-                end_index = i + 1
-                break
+                return start_index, i + 1
+
+    if in_string:
+        # Unbalanced quotes, fall back to only counting braces
+        level_count = 0
+        for match in BRACE_PATTERN.finditer(raw_text, start_index):
+            level_count += 1 if match.group() == "{" else -1
+            if level_count == 0:
+                return start_index, match.end()
+
+    return start_index, len(raw_text)
 
+
+def handle_json(raw_text: str) -> str:
+    start_index, end_index = find_json_span(raw_text)
     return raw_text[start_index:end_index]
 
 
+def extract_json(raw_text: str) -> Tuple[Dict[str, Any], Tuple[int, int]]:
+    """
+    Extracts and parses the first JSON object in the text.
+
+    Returns:
+        Dict[str, Any]: The parsed object.
+        Tuple[int, int]: The span of the object in the text.
+    """
+    span = find_json_span(raw_text)
+    return json.loads(raw_text[span[0] : span[1]]), span
+
+
+def repair_backslashes(json_text: str) -> str:
+    """
+    Repairs the backslashes of model generated JSON in one pass. A backslash
+    before an underscore is removed and the remaining backslash runs are padded
+    to escaped groups of four, since json.loads requires 4 backslashes to indicate
+    paths and the llm usually only outputs one or two.
+    """
+
+    def replace(match: re.Match[str]) -> str:
+        underscore = match.group(1)
+        count = match.end() - match.start() - len(underscore)
+
+        if underscore:
+            count -= 1
+            if count == 0:
+                return underscore
+
+        return "\\" * (4 * ((count + 5) // 4)) + underscore
+
+    return BACKSLASH_PATTERN.sub(replace, json_text)
+
+
 def parse_json(raw_text: str) -> Dict[str, Any]:
-    json_text = handle_json(raw_text)
-    return json.loads(json_text)
+    json_object, _ = extract_json(raw_text)
+    return json_object
@@ -0,0 +1,166 @@
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+DEFAULT_PROFILE = "default"
+
+# Settings of a profile with their llama.cpp flags
+PROFILE_FLAGS = {
+    "gpu_layers": "--n-gpu-layers",
+    "threads": "--threads",
+    "batch_size": "--batch-size",
+    "ubatch_size": "--ubatch-size",
+    "cache_type_k": "--cache-type-k",
+    "cache_type_v": "--cache-type-v",
+    "rope_freq_base": "--rope-freq-base",
+    "rope_freq_scale": "--rope-freq-scale",
+    "mlock": "--mlock",
+    "no_mmap": "--no-mmap",
+    "flash_attn": "--flash-attn",
+}
+
+
+class LaunchProfile:
+    """
+    Settings llama.cpp is started with for a model. ctx_size is the context
+    window of each parallel slot, so llama.cpp gets ctx_size * parallel. Settings
+    that are None are left to the defaults of llama.cpp.
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings: Dict[str, Any] = dict(settings or {})
+
+        unknown = set(self.settings) - set(PROFILE_FLAGS) - {"ctx_size", "parallel"}
+        if unknown:
+            raise ValueError(f"Unknown launch profile settings: {sorted(unknown)}")
+
+    def get(self, name: str, default: Any = None) -> Any:
+        value = self.settings.get(name)
+        return default if value is None else value
+
+    def merged(self, other: "LaunchProfile") -> "LaunchProfile":
+        """Returns a profile with the settings of other overriding these."""
+        return LaunchProfile({**self.settings, **other.settings})
+
+    def get_context_window(self) -> int:
+        return int(self.get("ctx_size", 2048))
+
+    def get_parallel_slots(self) -> int:
+        return int(self.get("parallel", os.getenv("MODEL.PARALLEL_SLOTS", 1)))
+
+    def to_arguments(self) -> List[str]:
+        parallel_slots = self.get_parallel_slots()
+
+        arguments = [
+            "--ctx-size",
+            str(self.get_context_window() * parallel_slots),
+        ]
+
+        if parallel_slots > 1:
+            arguments += ["--parallel", str(parallel_slots), "--cont-batching"]
+
+        for name, flag in PROFILE_FLAGS.items():
+            value = self.get(name)
+            if isinstance(value, bool):
+                if value:
+                    arguments.append(flag)
+            elif value is not None:
+                arguments += [flag, str(value)]
+
+        return arguments
+
+    def __repr__(self) -> str:
+        return f"LaunchProfile({self.settings})"
+
+
+def get_profiles_path() -> str:
+    return os.getenv("MODEL.PROFILES_PATH", os.path.join("models", "profiles.toml"))
+
+
+def load_launch_profiles(path: Optional[str] = None) -> Dict[str, LaunchProfile]:
+    """Reads the profiles of a TOML file with a table per model file name and an
+    optional [default] table."""
+    path = path or get_profiles_path()
+
+    if not os.path.isfile(path):
+        return {}
+
+    with open(path, "rb") as file:
+        tables = tomllib.load(file)
+
+    return {name: LaunchProfile(settings) for name, settings in tables.items()}
+
+
+def get_launch_profile(
+    model_identifier: str, path: Optional[str] = None
+) -> LaunchProfile:
+    """Returns the profile of the model merged over the default profile."""
+    profiles = load_launch_profiles(path)
+
+    return profiles.get(DEFAULT_PROFILE, LaunchProfile()).merged(
+        profiles.get(model_identifier, LaunchProfile())
+    )
+
+
+def write_launch_profile(
+    model_identifier: str, profile: LaunchProfile, path: Optional[str] = None
+) -> None:
+    """Stores the profile of the model, keeping the profiles of other models."""
+    path = path or get_profiles_path()
+
+    profiles = load_launch_profiles(path)
+    profiles[model_identifier] = profile
+
+    lines: List[str] = []
+    for name, stored_profile in profiles.items():
+        lines.append(f"[{format_toml_value(name)}]")
+        for key, value in stored_profile.settings.items():
+            if value is not None:
+                lines.append(f"{key} = {format_toml_value(value)}")
+        lines.append("")
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf8") as file:
+        file.write("\n".join(lines))
+    os.replace(temporary_path, path)
+
+
+def format_toml_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def tune_launch_profiles(
+    candidates: Sequence[LaunchProfile],
+    measure: Callable[[LaunchProfile], float],
+) -> Tuple[Optional[LaunchProfile], List[Tuple[LaunchProfile, float]]]:
+    """
+    Measures the throughput (tokens per second) of every candidate and returns
+    the fastest one with all results. Candidates that fail to start or run are
+    reported with a throughput of 0.
+    """
+    results: List[Tuple[LaunchProfile, float]] = []
+
+    for candidate in candidates:
+        try:
+            throughput = measure(candidate)
+        except Exception as e:
+            print(f"Failed to measure {candidate}: {e}")
+            throughput = 0.0
+
+        print(f"{candidate}: {throughput:.2f} tokens/s")
+        results.append((candidate, throughput))
+
+    measured = [result for result in results if result[1] > 0]
+    if not measured:
+        return None, results
+
+    return max(measured, key=lambda result: result[1])[0], results
@@ -0,0 +1,92 @@
+import codecs
+import threading
+from typing import BinaryIO, Callable, List, Optional
+
+# Called with the stream name ("stdout" or "stderr") and a chunk of output
+OutputCallback = Callable[[str, str], None]
+
+
+class OutputCapture:
+    """
+    Reads a binary stream of a process incrementally on a background thread,
+    keeping at most max_bytes bytes and passing every decoded chunk to
+    output_callback. on_limit is called once when the cap is hit, so the
+    process can be stopped early instead of buffering unbounded output.
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        stream_name: str,
+        max_bytes: int,
+        output_callback: Optional[OutputCallback] = None,
+        on_limit: Optional[Callable[[], None]] = None,
+        chunk_size: int = 4096,
+    ):
+        self.stream = stream
+        self.stream_name = stream_name
+        self.max_bytes = max_bytes
+        self.output_callback = output_callback
+        self.on_limit = on_limit
+        self.chunk_size = chunk_size
+
+        self.parts: List[str] = []
+        self.byte_count = 0
+        self.truncated = False
+
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self) -> None:
+        decoder = codecs.getincrementaldecoder("utf8")(errors="replace")
+
+        while True:
+            try:
+                data = self.stream.read1(self.chunk_size)  # type: ignore
+            except (OSError, ValueError):
+                break
+
+            if not data:
+                break
+
+            if self.byte_count + len(data) > self.max_bytes:
+                data = data[: self.max_bytes - self.byte_count]
+                self.truncated = True
+
+            self.byte_count += len(data)
+            text = decoder.decode(data, final=self.truncated)
+
+            if text:
+                self.parts.append(text)
+                if self.output_callback:
+                    self.output_callback(self.stream_name, text)
+
+            if self.truncated:
+                if self.on_limit:
+                    self.on_limit()
+                break
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self.thread.join(timeout)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+def summarize_output(output: str, max_characters: int) -> str:
+    """
+    Shortens output that doesn't fit in max_characters by keeping its head and
+    tail, since the end of the output usually holds the result or the error.
+    """
+    if len(output) <= max_characters:
+        return output
+
+    head_length = max_characters * 2 // 3
+    tail_length = max_characters - head_length
+    omitted = len(output) - head_length - tail_length
+
+    return (
+        output[:head_length]
+        + f"\n[... {omitted} characters omitted ...]\n"
+        + output[len(output) - tail_length :]
+    )
@@ -0,0 +1,273 @@
+"""
+Worker process of the PythonWorkerPool. Receives code to execute as JSON lines on
+stdin and answers on stdout with output chunks while the code runs, followed by
+one result line per run. The original stdin and stdout are moved to private file
+descriptors, so the executed code can't read or corrupt the protocol stream.
+
+On POSIX every run is executed in a process forked from the worker, which has the
+modules preloaded, so nothing a run changes (modules, builtins, the working
+directory, threads) is seen by later runs. Elsewhere the code runs in the worker
+itself with its own builtins, and the working directory and pyplot figures are
+reset after each run. The pool replaces such a worker after a run that imported
+new modules.
+
+Usage: python python_worker.py [comma separated modules to preload]
+"""
+
+import builtins
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Tuple
+
+# Builtins of the worker before any code ran, every run gets its own copy
+ORIGINAL_BUILTINS = dict(builtins.__dict__)
+
+# Output is sent to the pool in chunks of this size, or at the end of a line once
+# this many seconds have passed since the last chunk
+CHUNK_SIZE = 4096
+CHUNK_INTERVAL = 0.1
+
+
+class OutputLimitExceeded(BaseException):
+    """Raised in the executed code when it writes more than the output cap. Derives
+    from BaseException so that `except Exception` in the code doesn't swallow it."""
+
+
+class StreamingCapture(io.TextIOBase):
+    """
+    Captures the output of a stream up to max_bytes bytes, forwarding it to the
+    pool in chunks. Writing past the cap stops the executed code.
+    """
+
+    def __init__(
+        self,
+        stream_name: str,
+        max_bytes: int,
+        send: Callable[[Dict[str, Any]], None],
+    ):
+        super().__init__()
+        self.stream_name = stream_name
+        self.max_bytes = max_bytes
+        self.send = send
+        self.byte_count = 0
+        self.truncated = False
+        self.parts: List[str] = []
+        self.pending: List[str] = []
+        self.pending_size = 0
+        self.last_flush = time.monotonic()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if self.truncated:
+            raise OutputLimitExceeded()
+
+        size = len(text.encode("utf8", errors="replace"))
+
+        if self.byte_count + size > self.max_bytes:
+            remaining = self.max_bytes - self.byte_count
+            text = text.encode("utf8", errors="replace")[:remaining].decode(
+                "utf8", errors="ignore"
+            )
+            self.truncated = True
+
+        self.byte_count += size
+        self.parts.append(text)
+        self.pending.append(text)
+        self.pending_size += len(text)
+
+        if (
+            self.truncated
+            or self.pending_size >= CHUNK_SIZE
+            or ("\n" in text and time.monotonic() - self.last_flush >= CHUNK_INTERVAL)
+        ):
+            self.flush()
+
+        if self.truncated:
+            raise OutputLimitExceeded()
+
+        return len(text)
+
+    def flush(self) -> None:
+        if self.pending:
+            self.send(
+                {
+                    "type": "output",
+                    "stream": self.stream_name,
+                    "text": "".join(self.pending),
+                }
+            )
+            self.pending = []
+            self.pending_size = 0
+        self.last_flush = time.monotonic()
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+def preload_modules(module_names: str) -> None:
+    for module_name in module_names.split(","):
+        if module_name:
+            try:
+                __import__(module_name)
+            except Exception:
+                pass
+
+
+def reset_state(working_directory: str) -> None:
+    """Undoes the changes of a run that the next run would otherwise see."""
+    os.chdir(working_directory)
+
+    if "matplotlib.pyplot" in sys.modules:
+        try:
+            sys.modules["matplotlib.pyplot"].close("all")
+        except Exception:
+            pass
+
+
+def run_code(
+    code: str, max_output_bytes: int, send: Callable[[Dict[str, Any]], None]
+) -> Tuple[str, str, int]:
+    stdout = StreamingCapture("stdout", max_output_bytes, send)
+    stderr = StreamingCapture("stderr", max_output_bytes, send)
+
+    original_stdout, original_stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout, stderr
+
+    return_code = 0
+    error_text = ""
+
+    try:
+        code_globals: Dict[str, Any] = {
+            "__name__": "__main__",
+            "__builtins__": dict(ORIGINAL_BUILTINS),
+        }
+        exec(compile(code, "<code>", "exec"), code_globals)
+    except OutputLimitExceeded:
+        error_text = f"OutputLimitExceeded: The code was stopped after writing more than {max_output_bytes} bytes of output.\n"
+        return_code = 1
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            return_code = e.code
+        elif e.code is not None:
+            error_text = str(e.code) + "\n"
+            return_code = 1
+    except BaseException as e:
+        # Skip the frame of run_code so the traceback starts in the executed code
+        exception_traceback = e.__traceback__.tb_next if e.__traceback__ else None
+        error_text = "".join(
+            traceback.format_exception(type(e), e, exception_traceback)
+        )
+        return_code = 1
+    finally:
+        sys.stdout, sys.stderr = original_stdout, original_stderr
+
+    stdout.flush()
+    stderr.flush()
+
+    # The error is added after the capture so that it is never cut off by the cap
+    return stdout.getvalue(), stderr.getvalue() + error_text, return_code
+
+
+def run_in_child(
+    request: Dict[str, Any], send: Callable[[Dict[str, Any]], None]
+) -> Dict[str, Any]:
+    """Runs the code in a forked process, which sends its output chunks itself
+    and passes the result back through a pipe."""
+    read_fd, write_fd = os.pipe()
+
+    pid = os.fork()
+
+    if pid == 0:
+        exit_code = 0
+        try:
+            os.close(read_fd)
+            stdout, stderr, return_code = run_code(
+                request["code"], request["max_output_bytes"], send
+            )
+            with os.fdopen(write_fd, "w", encoding="utf8") as result_pipe:
+                json.dump(
+                    {
+                        "type": "result",
+                        "stdout": stdout,
+                        "stderr": stderr,
+                        "return_code": return_code,
+                    },
+                    result_pipe,
+                )
+        except BaseException:
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, "r", encoding="utf8") as result_pipe:
+        result_text = result_pipe.read()
+    _, status = os.waitpid(pid, 0)
+
+    if result_text:
+        return json.loads(result_text)
+
+    return {
+        "type": "result",
+        "stdout": "",
+        "stderr": f"The code exited unexpectedly (exit status {status}).\n",
+        "return_code": -1,
+    }
+
+
+def run_in_worker(
+    request: Dict[str, Any], send: Callable[[Dict[str, Any]], None]
+) -> Dict[str, Any]:
+    working_directory = os.getcwd()
+    module_names = set(sys.modules)
+
+    stdout, stderr, return_code = run_code(
+        request["code"], request["max_output_bytes"], send
+    )
+
+    reset_state(working_directory)
+
+    # Imported modules may keep state, so the pool replaces the worker
+    return {
+        "type": "result",
+        "stdout": stdout,
+        "stderr": stderr,
+        "return_code": return_code,
+        "recycle": not set(sys.modules) <= module_names,
+    }
+
+
+def main() -> None:
+    protocol_in = os.fdopen(os.dup(0), "r", encoding="utf8")
+    protocol_out = os.fdopen(os.dup(1), "w", encoding="utf8")
+
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    def send(message: Dict[str, Any]) -> None:
+        protocol_out.write(json.dumps(message) + "\n")
+        protocol_out.flush()
+
+    if len(sys.argv) > 1:
+        preload_modules(sys.argv[1])
+
+    send({"type": "ready"})
+
+    for line in protocol_in:
+        request = json.loads(line)
+
+        if hasattr(os, "fork"):
+            send(run_in_child(request, send))
+        else:
+            send(run_in_worker(request, send))
+
+
+if __name__ == "__main__":
+    main()
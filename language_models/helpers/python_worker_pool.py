@@ -0,0 +1,289 @@
+import json
+import os
+import queue
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from language_models.helpers.output_capture import OutputCallback
+
+WORKER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "python_worker.py"
+)
+
+# Imported by every worker before it starts accepting code, missing modules are skipped
+DEFAULT_PRELOADED_MODULES = [
+    "collections",
+    "datetime",
+    "fractions",
+    "itertools",
+    "json",
+    "math",
+    "random",
+    "re",
+    "statistics",
+    "matplotlib.pyplot",
+    "numpy",
+    "pandas",
+]
+
+
+# Environment variables that are not passed to executed code. Settings of the
+# assistant (e.g. OPENAI.API_KEY) contain a dot, which shells can't even export.
+SECRET_ENVIRONMENT_PATTERN = re.compile(
+    r"\.|KEY|TOKEN|SECRET|PASSWORD|CREDENTIAL|AUTH", re.IGNORECASE
+)
+
+
+def get_code_environment() -> Dict[str, str]:
+    """Returns the environment of the assistant without secrets, for executed code."""
+    environment = {
+        name: value
+        for name, value in os.environ.items()
+        if not SECRET_ENVIRONMENT_PATTERN.search(name)
+    }
+    environment["PYTHONIOENCODING"] = "utf8"
+    return environment
+
+
+class PythonWorker:
+    """A Python process that executes code sent over a pipe, see python_worker.py."""
+
+    def __init__(self, preloaded_modules: Sequence[str], working_directory: str):
+        environment = get_code_environment()
+        environment["MPLBACKEND"] = "Agg"
+
+        self.popen = subprocess.Popen(
+            [sys.executable, WORKER_PATH, ",".join(preloaded_modules)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf8",
+            bufsize=1,
+            cwd=working_directory,
+            env=environment,
+            start_new_session=True,
+        )
+        self.run_count = 0
+        # Set when a run changed the worker in a way later runs would see
+        self.needs_recycle = False
+        self.responses: queue.Queue[Optional[Dict[str, Any]]] = queue.Queue()
+        self.reader = threading.Thread(target=self._read_responses, daemon=True)
+        self.reader.start()
+        self.ready = False
+
+    def _read_responses(self) -> None:
+        try:
+            if self.popen.stdout:
+                for line in self.popen.stdout:
+                    self.responses.put(json.loads(line))
+        except Exception:
+            pass
+        finally:
+            self.responses.put(None)  # The worker exited
+
+    def wait_until_ready(self, timeout: float) -> bool:
+        if not self.ready:
+            try:
+                response = self.responses.get(timeout=timeout)
+            except queue.Empty:
+                return False
+            self.ready = response is not None and response["type"] == "ready"
+        return self.ready
+
+    def run(
+        self,
+        code: str,
+        timeout: float,
+        max_output_bytes: int,
+        output_callback: Optional[OutputCallback] = None,
+    ) -> Tuple[str, str, int]:
+        """
+        Executes the code in the worker, passing the output to output_callback as
+        it is produced.
+
+        Raises:
+            TimeoutError: The code did not finish in time, the worker must be killed.
+            RuntimeError: The worker exited while executing the code.
+        """
+        self.run_count += 1
+
+        if not self.popen.stdin:
+            raise RuntimeError("The worker has no input pipe.")
+
+        request = {"code": code, "max_output_bytes": max_output_bytes}
+        try:
+            self.popen.stdin.write(json.dumps(request) + "\n")
+            self.popen.stdin.flush()
+        except OSError:
+            raise RuntimeError("The worker exited unexpectedly.")
+
+        deadline = time.monotonic() + timeout
+
+        while True:
+            try:
+                response = self.responses.get(
+                    timeout=max(0, deadline - time.monotonic())
+                )
+            except queue.Empty:
+                raise TimeoutError(f"Execution time exceeded {timeout} seconds.")
+
+            if response is None:
+                raise RuntimeError("The worker exited unexpectedly.")
+
+            if response["type"] == "output":
+                if output_callback:
+                    output_callback(response["stream"], response["text"])
+                continue
+
+            self.needs_recycle = response.get("recycle", False)
+            return response["stdout"], response["stderr"], response["return_code"]
+
+    def is_alive(self) -> bool:
+        return self.popen.poll() is None
+
+    def kill(self) -> None:
+        try:
+            # The worker leads its own process group, which includes the process
+            # running the code and anything the code started
+            if hasattr(os, "killpg"):
+                os.killpg(self.popen.pid, signal.SIGKILL)
+            else:
+                self.popen.kill()
+            self.popen.wait(timeout=5)
+        except Exception:
+            pass
+
+
+class PythonWorkerPool:
+    """
+    Pool of pre-started Python worker processes with common modules preloaded, used
+    to avoid paying interpreter startup and imports for every code execution. Each
+    run gets fresh globals and builtins, and changes to modules, the working
+    directory or pyplot figures don't carry over to later runs (see
+    python_worker.py). A worker is replaced after max_runs_per_worker runs, on
+    timeout or when it crashes. The workers run in their own temporary directory,
+    which is removed on shutdown, without the secrets in the environment.
+
+    This isolates runs from each other, it is not a sandbox: the code can do
+    anything the user running the assistant can.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_runs_per_worker: int = 20,
+        preloaded_modules: Sequence[str] = DEFAULT_PRELOADED_MODULES,
+        startup_timeout: float = 30,
+    ):
+        self.size = size
+        self.max_runs_per_worker = max_runs_per_worker
+        self.preloaded_modules = list(preloaded_modules)
+        self.startup_timeout = startup_timeout
+        self.working_directory = tempfile.mkdtemp(prefix="ac_python_workers_")
+
+        self.idle_workers: queue.Queue[PythonWorker] = queue.Queue()
+        self.workers: List[PythonWorker] = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+        for _ in range(size):
+            self._start_worker()
+
+    def execute(
+        self,
+        code: str,
+        timeout: float = 20,
+        max_output_bytes: int = 100_000,
+        output_callback: Optional[OutputCallback] = None,
+    ) -> Tuple[str, str, int]:
+        """
+        Executes the code in an idle worker. The code is stopped when it writes
+        more than max_output_bytes to stdout or stderr. The output is passed to
+        output_callback(stream, text) in chunks while the code runs.
+
+        Returns:
+            str: The captured stdout.
+            str: The captured stderr.
+            int: The exit code of the code, 0 for success.
+
+        Raises:
+            TimeoutError: If the execution takes longer than the timeout.
+        """
+        worker = self._acquire_worker()
+
+        try:
+            result = worker.run(code, timeout, max_output_bytes, output_callback)
+        except TimeoutError:
+            self._discard_worker(worker)
+            raise
+        except RuntimeError as e:
+            self._discard_worker(worker)
+            return "", str(e), -1
+        except Exception:
+            # The worker may still be sending output of this run
+            self._discard_worker(worker)
+            raise
+
+        self._release_worker(worker)
+        return result
+
+    def shutdown(self) -> None:
+        with self.lock:
+            self.closed = True
+            workers = self.workers
+            self.workers = []
+
+        for worker in workers:
+            worker.kill()
+
+        shutil.rmtree(self.working_directory, ignore_errors=True)
+
+    def _start_worker(self) -> PythonWorker:
+        worker = PythonWorker(self.preloaded_modules, self.working_directory)
+
+        with self.lock:
+            self.workers.append(worker)
+
+        self.idle_workers.put(worker)
+        return worker
+
+    def _acquire_worker(self) -> PythonWorker:
+        while True:
+            try:
+                worker = self.idle_workers.get(timeout=self.startup_timeout)
+            except queue.Empty:
+                raise RuntimeError("No Python worker became available.")
+
+            if worker.wait_until_ready(self.startup_timeout) and worker.is_alive():
+                return worker
+
+            self._discard_worker(worker)
+
+    def _release_worker(self, worker: PythonWorker) -> None:
+        if (
+            worker.is_alive()
+            and not worker.needs_recycle
+            and worker.run_count < self.max_runs_per_worker
+        ):
+            self.idle_workers.put(worker)
+        else:
+            self._discard_worker(worker)
+
+    def _discard_worker(self, worker: PythonWorker) -> None:
+        worker.kill()
+
+        with self.lock:
+            if worker in self.workers:
+                self.workers.remove(worker)
+            closed = self.closed
+
+        if not closed:
+            # Start the replacement in the background so the next run doesn't wait
+            threading.Thread(target=self._start_worker, daemon=True).start()
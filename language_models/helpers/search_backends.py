@@ -0,0 +1,71 @@
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Sequence
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+class SearchResult:
+    def __init__(self, title: str, url: str, snippet: str):
+        self.title = title
+        self.url = url
+        self.snippet = snippet
+
+
+class SearchBackend:
+    def search(self, query: str, max_results: int = 5) -> List[SearchResult]:
+        raise NotImplementedError("Subclasses must implement this method")
+
+
+class DuckDuckGoSearchBackend(SearchBackend):
+    """Searches through DuckDuckGo, reusing one session for all searches."""
+
+    def __init__(self):
+        from duckduckgo_search import DDGS  # type: ignore
+
+        self.search_engine = DDGS()
+        self.lock = threading.Lock()
+
+    def search(self, query: str, max_results: int = 5) -> List[SearchResult]:
+        with self.lock:
+            results = self.search_engine.text(query, max_results=max_results)  # type: ignore
+
+        return [
+            SearchResult(result["title"], result["href"], result["body"])
+            for result in results or []
+        ]
+
+
+class StubSearchBackend(SearchBackend):
+    """Returns fixed results for normalized queries, used for tests and to run
+    without network access."""
+
+    def __init__(self, results: Optional[Dict[str, Sequence[SearchResult]]] = None):
+        self.results = {
+            normalize_query(query): list(query_results)
+            for query, query_results in (results or {}).items()
+        }
+        self.queries: List[str] = []
+
+    def search(self, query: str, max_results: int = 5) -> List[SearchResult]:
+        self.queries.append(query)
+        return self.results.get(normalize_query(query), [])[:max_results]
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes case and whitespace, so that trivially different queries share
+    cached results."""
+    return WHITESPACE_PATTERN.sub(" ", query).strip().lower()
+
+
+def create_search_backend() -> SearchBackend:
+    """Creates the backend configured through SEARCH.BACKEND (duckduckgo or stub)."""
+    backend_name = os.getenv("SEARCH.BACKEND", "duckduckgo").lower()
+
+    if backend_name == "stub":
+        return StubSearchBackend()
+    if backend_name == "duckduckgo":
+        return DuckDuckGoSearchBackend()
+
+    raise ValueError(f"Unknown search backend {backend_name}.")
@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+# Suggestions have a low priority, so they are generated one at a time
+suggestion_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="suggest")
+
+
+class SuggestionQueue:
+    """
+    Generates follow up suggestions in the background after the response has
+    been returned, cached per conversation turn. Only the suggestions of the
+    latest turn of a conversation are kept, suggestions of older turns that
+    haven't started yet are cancelled.
+    """
+
+    def __init__(self, max_conversations: int = 1000):
+        self.max_conversations = max_conversations
+
+        # Conversation id -> (turn, suggestions)
+        self.suggestions: OrderedDict[str, Tuple[int, Future[List[str]]]] = (
+            OrderedDict()
+        )
+        self.lock = threading.Lock()
+
+    def submit(
+        self, conversation_id: str, turn: int, generate: Callable[[], List[str]]
+    ) -> None:
+        with self.lock:
+            previous = self.suggestions.pop(conversation_id, None)
+            if previous:
+                previous[1].cancel()
+
+            self.suggestions[conversation_id] = (
+                turn,
+                suggestion_executor.submit(generate_safely, generate),
+            )
+
+            while len(self.suggestions) > self.max_conversations:
+                _, (_, evicted) = self.suggestions.popitem(last=False)
+                evicted.cancel()
+
+    def get(
+        self, conversation_id: str, turn: Optional[int] = None
+    ) -> Optional[Tuple[int, Future[List[str]]]]:
+        """Returns the turn and the suggestions of the latest turn of the
+        conversation, or None if there are none for the requested turn."""
+        with self.lock:
+            entry = self.suggestions.get(conversation_id)
+
+        if entry is None or (turn is not None and entry[0] != turn):
+            return None
+        return entry
+
+
+def generate_safely(generate: Callable[[], List[str]]) -> List[str]:
+    try:
+        return generate()
+    except Exception as e:
+        print(f"Failed to generate suggestions: {e}")
+        return []
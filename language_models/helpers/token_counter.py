@@ -0,0 +1,64 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Union
+
+from language_models.helpers.content_extractor import CHARACTERS_PER_TOKEN
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARACTERS_PER_TOKEN)
+
+
+class TokenCounter:
+    """
+    Counts tokens through a tokenize function (e.g. the /tokenize endpoint of
+    llama.cpp), caching the counts by the hash of the text, so the unchanged
+    messages of a conversation are only tokenized once. If tokenizing fails the
+    count is estimated from the length of the text and not cached.
+    """
+
+    def __init__(
+        self,
+        tokenize: Optional[Callable[[str], int]] = None,
+        cache_size: int = 4096,
+    ):
+        self.tokenize = tokenize
+        self.cache_size = cache_size
+        self.cache: OrderedDict[str, int] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+
+        if not self.tokenize:
+            return estimate_tokens(text)
+
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        try:
+            token_count = self.tokenize(text)
+        except Exception as e:
+            print(f"Failed to count tokens: {e}")
+            return estimate_tokens(text)
+
+        with self.lock:
+            self.cache[key] = token_count
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return token_count
+
+    def count_prompt(self, prompt: Union[str, List[Union[int, str]]]) -> int:
+        """Counts a formatted prompt, where ints are single special tokens."""
+        if isinstance(prompt, str):
+            return self.count(prompt)
+
+        return sum(1 if isinstance(part, int) else self.count(part) for part in prompt)
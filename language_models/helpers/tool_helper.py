@@ -1,26 +1,86 @@
-import os
+import importlib
+import pkgutil
+import threading
+from importlib.metadata import entry_points
 from typing import List, Optional
 
 from language_models.tools.base_tool import BaseTool
 
+# Tools from other installed packages can register themselves under this group
+TOOL_ENTRY_POINT_GROUP = "assistant_coder.tools"
 
-def load_available_tools(parent_tool_name: Optional[str] = None) -> List[BaseTool]:
-    tools: List[BaseTool] = []
-
-    # Dynamically load tools from the tools directory
-    for file in os.listdir("language_models/tools"):
-        if file.endswith(".py") and not file.startswith("__"):
-            tool_name = file.split(".")[0]
-            tool_module = __import__(
-                f"language_models.tools.{tool_name}", fromlist=[tool_name]
+
+class ToolRegistry:
+    """Process-wide registry of tools. The tools package is scanned once and the
+    tool instances are shared between all tool managers."""
+
+    _tools: Optional[List[BaseTool]] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_tools(cls) -> List[BaseTool]:
+        if cls._tools is None:
+            with cls._lock:
+                if cls._tools is None:
+                    cls._tools = cls._discover_tools()
+        return list(cls._tools)
+
+    @classmethod
+    def get_tool(cls, name: str) -> Optional[BaseTool]:
+        for tool in cls.get_tools():
+            if tool.name == name:
+                return tool
+        return None
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._lock:
+            cls._tools = None
+
+    @classmethod
+    def _discover_tools(cls) -> List[BaseTool]:
+        tools: List[BaseTool] = []
+        tool_classes: List[type] = []
+
+        tools_package = importlib.import_module("language_models.tools")
+
+        for module_info in pkgutil.iter_modules(tools_package.__path__):
+            if module_info.name.startswith("__"):
+                continue
+
+            tool_module = importlib.import_module(
+                f"{tools_package.__name__}.{module_info.name}"
             )
-            # Get the class from the module if it has BaseTool as parent
-            for name, obj in tool_module.__dict__.items():
+
+            # Get the classes defined in the module that have BaseTool as parent
+            for obj in tool_module.__dict__.values():
                 if (
-                    name != "BaseTool"
-                    and name != parent_tool_name
-                    and isinstance(obj, type)
+                    isinstance(obj, type)
                     and issubclass(obj, BaseTool)
+                    and obj is not BaseTool
+                    and obj.__module__ == tool_module.__name__
                 ):
-                    tools.append(obj())
-    return tools
+                    tool_classes.append(obj)
+
+        for entry_point in entry_points(group=TOOL_ENTRY_POINT_GROUP):
+            try:
+                tool_class = entry_point.load()
+            except Exception as e:
+                print(f"Failed to load tool {entry_point.name}: {e}")
+                continue
+
+            if tool_class not in tool_classes:
+                tool_classes.append(tool_class)
+
+        for tool_class in tool_classes:
+            tools.append(tool_class())
+
+        return tools
+
+
+def load_available_tools(parent_tool_name: Optional[str] = None) -> List[BaseTool]:
+    return [
+        tool
+        for tool in ToolRegistry.get_tools()
+        if tool.__class__.__name__ != parent_tool_name
+    ]
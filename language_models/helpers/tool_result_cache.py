@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class ToolResultCache:
+    """Thread-safe LRU cache for tool outputs, bounded both by the number of entries
+    and by the total number of cached characters. Entries may have a time to live."""
+
+    def __init__(self, max_entries: int = 256, max_characters: int = 4_000_000):
+        self.max_entries = max_entries
+        self.max_characters = max_characters
+        self.entries: OrderedDict[str, Tuple[str, Optional[float]]] = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        if len(value) > self.max_characters:
+            return
+
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+            self.entries[key] = (value, expires_at)
+            self.size += len(value)
+
+            while (
+                len(self.entries) > self.max_entries or self.size > self.max_characters
+            ):
+                oldest_key = next(iter(self.entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def get_stats(self) -> Dict[str, float]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "characters": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key: str) -> None:
+        value, _ = self.entries.pop(key)
+        self.size -= len(value)
@@ -0,0 +1,178 @@
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Sent by the replayer with every request, identifies the recorded trace whose model
+# responses and tool outputs are played back while the request is handled
+REPLAY_HEADER = "X-Replay-Trace-Id"
+
+
+class TraceRecorder:
+    """
+    Records every /generate_response request together with the model responses,
+    tool outputs and stage durations it triggered, as one JSON line per request.
+    Enabled by setting SERVER.TRACE_PATH, paths ending in .gz are compressed.
+    Without a path the traces are kept in memory.
+
+    Generation is serialized by the ModelState lock, so there is at most one
+    active trace and events from tool and pipeline threads are added to it.
+
+    The recorder can also play back recorded traces (see load_replay_source), in
+    which case the mock model and the tools return the recorded results after the
+    recorded duration, divided by the speed-up.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.traces: List[Dict[str, Any]] = []
+        self.active_trace: Optional[Dict[str, Any]] = None
+        self.trace_lock = threading.Lock()
+
+        self.replay_source: Dict[str, Dict[str, Any]] = {}
+        self.replay_speedup = 1.0
+
+    @classmethod
+    def get_instance(cls) -> Optional["TraceRecorder"]:
+        """Returns the recorder, or None if recording is disabled."""
+        with cls._lock:
+            if cls._instance is None:
+                path = os.getenv("SERVER.TRACE_PATH", "")
+                if path:
+                    cls._instance = cls(path)
+            return cls._instance
+
+    @classmethod
+    def set_instance(cls, recorder: Optional["TraceRecorder"]) -> None:
+        with cls._lock:
+            cls._instance = recorder
+
+    def start_trace(
+        self,
+        endpoint: str,
+        request_data: Dict[str, Any],
+        replay_of: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        trace = {
+            "id": str(uuid.uuid4()),
+            "endpoint": endpoint,
+            "timestamp": time.time(),
+            "request": request_data,
+            "events": [],
+        }
+
+        if replay_of:
+            trace["replay_of"] = replay_of
+
+        with self.trace_lock:
+            self.active_trace = trace
+
+        return trace
+
+    def finish_trace(
+        self, trace: Dict[str, Any], response_data: Dict[str, Any]
+    ) -> None:
+        with self.trace_lock:
+            if self.active_trace is trace:
+                self.active_trace = None
+
+            trace["duration"] = time.time() - trace["timestamp"]
+            trace["response"] = response_data
+
+            if self.path:
+                self.write_trace(trace)
+            else:
+                self.traces.append(trace)
+
+    def write_trace(self, trace: Dict[str, Any]) -> None:
+        line = json.dumps(trace, separators=(",", ":")) + "\n"
+
+        if self.path and self.path.endswith(".gz"):
+            with gzip.open(self.path, "at", encoding="utf8") as file:
+                file.write(line)
+        elif self.path:
+            with open(self.path, "a", encoding="utf8") as file:
+                file.write(line)
+
+    def add_event(self, event_type: str, fields: Dict[str, Any]) -> None:
+        with self.trace_lock:
+            if self.active_trace is not None:
+                self.active_trace["events"].append({"type": event_type, **fields})
+
+    def load_replay_source(
+        self, traces: List[Dict[str, Any]], speedup: float = 1.0
+    ) -> None:
+        self.replay_source = {
+            trace["id"]: {"events": list(trace["events"])} for trace in traces
+        }
+        self.replay_speedup = speedup
+
+    def next_replay_event(
+        self, event_type: str, name: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Removes and returns the next recorded event of the type (and name) for
+        the trace that is currently replayed."""
+        with self.trace_lock:
+            if not self.active_trace or "replay_of" not in self.active_trace:
+                return None
+
+            source = self.replay_source.get(self.active_trace["replay_of"])
+            if not source:
+                return None
+
+            for i, event in enumerate(source["events"]):
+                if event["type"] == event_type and (
+                    name is None or event.get("name") == name
+                ):
+                    return source["events"].pop(i)
+
+        return None
+
+
+def record_event(event_type: str, **fields: Any) -> None:
+    """Adds an event to the active trace, does nothing if recording is disabled."""
+    recorder = TraceRecorder.get_instance()
+    if recorder:
+        recorder.add_event(event_type, fields)
+
+
+@contextmanager
+def record_stage(name: str) -> Iterator[None]:
+    start_time = time.time()
+    try:
+        yield
+    finally:
+        record_event("stage", name=name, duration=time.time() - start_time)
+
+
+def replay_event(
+    event_type: str, name: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Returns the recorded event to play back in place of a model call or tool run,
+    after waiting for its recorded duration divided by the speed-up. Returns None
+    when no trace is being replayed.
+    """
+    recorder = TraceRecorder.get_instance()
+    if not recorder:
+        return None
+
+    event = recorder.next_replay_event(event_type, name)
+    if event:
+        time.sleep(event.get("duration", 0) / recorder.replay_speedup)
+
+    return event
+
+
+def load_traces(path: str) -> List[Dict[str, Any]]:
+    open_file = gzip.open if path.endswith(".gz") else open
+
+    with open_file(path, "rt", encoding="utf8") as file:  # type: ignore
+        return [json.loads(line) for line in file if line.strip()]
@@ -0,0 +1,149 @@
+import threading
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence
+
+from language_models.helpers.trace_recorder import REPLAY_HEADER
+
+# Sends a request to an endpoint of the server and returns the JSON response
+PostFunction = Callable[[str, Dict[str, Any], Dict[str, str]], Dict[str, Any]]
+
+PERCENTILES = [50, 90, 99]
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    """Returns the percentile of the values, interpolating between the closest
+    ranks."""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * percent / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class TraceReplayer:
+    """
+    Replays recorded traces against the server. Each recorded conversation is
+    replayed in a new conversation, requests within a conversation are sent in
+    order and conversations are replayed concurrently. The recorded time between
+    requests is divided by the speed-up.
+    """
+
+    def __init__(
+        self,
+        traces: List[Dict[str, Any]],
+        post: PostFunction,
+        concurrency: int = 1,
+        speedup: float = 1.0,
+    ):
+        self.traces = traces
+        self.post = post
+        self.concurrency = concurrency
+        self.speedup = speedup
+
+        self.endpoint_latencies: Dict[str, List[float]] = defaultdict(list)
+        self.stage_latencies: Dict[str, List[float]] = defaultdict(list)
+        self.error_count = 0
+        self.lock = threading.Lock()
+
+    def replay(self) -> None:
+        conversations: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for trace in sorted(self.traces, key=lambda trace: trace["timestamp"]):
+            conversations[trace["request"].get("conversation_id", "")].append(trace)
+
+        if not conversations:
+            return
+
+        first_timestamp = min(trace["timestamp"] for trace in self.traces)
+        start_time = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [
+                executor.submit(
+                    self.replay_conversation,
+                    conversation_traces,
+                    start_time,
+                    first_timestamp,
+                )
+                for conversation_traces in conversations.values()
+            ]
+
+            for future in futures:
+                future.result()
+
+    def replay_conversation(
+        self,
+        traces: List[Dict[str, Any]],
+        start_time: float,
+        first_timestamp: float,
+    ) -> None:
+        try:
+            conversation_id = self.post("/start_new_conversation", {}, {})[
+                "conversation_id"
+            ]
+        except Exception:
+            traceback.print_exc()
+            self.add_errors(len(traces))
+            return
+
+        for trace in traces:
+            delay = (trace["timestamp"] - first_timestamp) / self.speedup
+            wait_time = start_time + delay - time.time()
+            if wait_time > 0:
+                time.sleep(wait_time)
+
+            data = {**trace["request"], "conversation_id": conversation_id}
+
+            request_start_time = time.time()
+            try:
+                response = self.post(
+                    trace["endpoint"], data, {REPLAY_HEADER: trace["id"]}
+                )
+            except Exception:
+                traceback.print_exc()
+                self.add_errors(1)
+                continue
+
+            latency = time.time() - request_start_time
+
+            with self.lock:
+                self.endpoint_latencies[trace["endpoint"]].append(latency)
+
+                for stage in response.get("stages", []):
+                    self.stage_latencies[stage["name"]].append(stage["duration"])
+
+            if not response.get("result"):
+                self.add_errors(1)
+
+    def add_errors(self, count: int) -> None:
+        with self.lock:
+            self.error_count += count
+
+    def get_report(self) -> str:
+        lines = [
+            f"{'':<24} {'count':>6} "
+            + " ".join(f"{f'p{p} ms':>10}" for p in PERCENTILES)
+        ]
+
+        for title, latencies in (
+            ("ENDPOINT", self.endpoint_latencies),
+            ("STAGE", self.stage_latencies),
+        ):
+            lines.append(title)
+            for name, values in sorted(latencies.items()):
+                lines.append(
+                    f"{name:<24} {len(values):>6} "
+                    + " ".join(
+                        f"{percentile(values, p) * 1000:>10.1f}" for p in PERCENTILES
+                    )
+                )
+
+        lines.append(f"ERRORS {self.error_count}")
+
+        return "\n".join(lines)
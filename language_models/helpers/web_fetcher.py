@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from language_models.helpers.content_extractor import extract_main_content
+
+USER_AGENT = "Mozilla/5.0 (compatible; AC/1.0)"
+
+# Shared by all fetches, pages of a search are downloaded concurrently
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fetch")
+
+
+class WebPage:
+    def __init__(
+        self,
+        url: str,
+        text: str,
+        content_type: str = "",
+        truncated: bool = False,
+        from_cache: bool = False,
+    ):
+        self.url = url
+        self.text = text
+        self.content_type = content_type
+        self.truncated = truncated
+        self.from_cache = from_cache
+
+    def is_html(self) -> bool:
+        return not self.content_type or "html" in self.content_type
+
+    def get_content(self) -> str:
+        """Returns the readable text of the page."""
+        if self.is_html():
+            return extract_main_content(self.text)
+        return self.text
+
+
+class WebFetcher:
+    """
+    Downloads webpages through a shared session with timeouts and a size cap.
+    Pages are stored in a disk cache together with their ETag and Last-Modified
+    headers, and revalidated with a conditional GET, so an unchanged page costs
+    a 304 response instead of a full download.
+
+    Configured through BROWSE.CACHE_PATH, BROWSE.TIMEOUT and BROWSE.MAX_PAGE_BYTES.
+    """
+
+    _instance: Optional["WebFetcher"] = None
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        if cache_path is None:
+            cache_path = os.getenv("BROWSE.CACHE_PATH", "cache/web")
+        if timeout is None:
+            timeout = float(os.getenv("BROWSE.TIMEOUT", 10))
+        if max_bytes is None:
+            max_bytes = int(os.getenv("BROWSE.MAX_PAGE_BYTES", 2_000_000))
+
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+
+        # Sized for the fetch executor, so concurrent fetches reuse connections
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def get_instance(cls) -> "WebFetcher":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def fetch(self, url: str) -> WebPage:
+        """
+        Downloads the page, reading at most max_bytes bytes.
+
+        Raises:
+            requests.RequestException: If the page can't be downloaded.
+        """
+        cached = self._read_cache(url)
+
+        headers: Dict[str, str] = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        with self.session.get(
+            url, headers=headers, timeout=self.timeout, stream=True
+        ) as response:
+            if response.status_code == 304 and cached:
+                return WebPage(
+                    url,
+                    cached["text"],
+                    cached.get("content_type", ""),
+                    cached.get("truncated", False),
+                    from_cache=True,
+                )
+
+            response.raise_for_status()
+
+            content = bytearray()
+            truncated = False
+            for chunk in response.iter_content(chunk_size=65536):
+                content.extend(chunk)
+                if len(content) >= self.max_bytes:
+                    del content[self.max_bytes :]
+                    truncated = True
+                    break
+
+            encoding = response.encoding or "utf-8"
+            text = content.decode(encoding, errors="replace")
+
+            page = WebPage(
+                url, text, response.headers.get("Content-Type", ""), truncated
+            )
+
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self._write_cache(url, page, etag, last_modified)
+
+            return page
+
+    def fetch_many(self, urls: Sequence[str]) -> List[Optional[WebPage]]:
+        """Downloads the pages concurrently, pages that fail to download are None."""
+
+        def fetch_or_none(url: str) -> Optional[WebPage]:
+            try:
+                return self.fetch(url)
+            except Exception as e:
+                print(f"Failed to fetch {url}: {e}")
+                return None
+
+        return list(FETCH_EXECUTOR.map(fetch_or_none, urls))
+
+    def _get_cache_file(self, url: str) -> str:
+        return os.path.join(
+            self.cache_path, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json"
+        )
+
+    def _read_cache(self, url: str) -> Optional[Dict]:
+        if not self.cache_path:
+            return None
+
+        try:
+            with open(self._get_cache_file(url), "r", encoding="utf8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(
+        self,
+        url: str,
+        page: WebPage,
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> None:
+        if not self.cache_path:
+            return
+
+        entry = {
+            "url": url,
+            "text": page.text,
+            "content_type": page.content_type,
+            "truncated": page.truncated,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+
+            # Written to a temporary file first, so concurrent readers never see
+            # a partial entry
+            cache_file = self._get_cache_file(url)
+            temporary_file = f"{cache_file}.{threading.get_ident()}.tmp"
+            with open(temporary_file, "w", encoding="utf8") as file:
+                json.dump(entry, file)
+            os.replace(temporary_file, cache_file)
+        except OSError as e:
+            print(f"Failed to cache {url}: {e}")
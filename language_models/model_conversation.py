@@ -1,14 +1,31 @@
 import datetime
-from typing import List, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from language_models.api.base import ApiModel
 from language_models.constants import JSON_ERROR_MESSAGE, JSON_PARSE_RETRY_COUNT
+from language_models.helpers.content_extractor import CHARACTERS_PER_TOKEN
+from language_models.helpers.context_packer import pack_selected_files
 from language_models.helpers.json_fixer import fix_json_errors
 from language_models.helpers.json_parser import parse_json
+from language_models.helpers.trace_recorder import record_stage
 from language_models.memory_manager import MemoryManager
-from language_models.model_message import MessageMetadata, ModelMessage, Role
+from language_models.model_message import (
+    MessageHistory,
+    MessageMetadata,
+    ModelMessage,
+    Role,
+)
 from language_models.tool_manager import ToolManager
 
+# Runs the stages that overlap with tool selection when overlap_stages is enabled
+PIPELINE_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pipeline")
+
+# Tokens added by the prompt format around every message
+MESSAGE_TOKEN_OVERHEAD = 8
+
+SUMMARY_MAX_TOKENS = 200
+
 
 class ModelConversation:
     def __init__(
@@ -23,13 +40,25 @@ class ModelConversation:
         self.memory_manager: MemoryManager = memory_manager
         self.model_path: str = model_path
 
+        # Summary of the oldest messages that no longer fit the context window,
+        # and the number of (non-system) messages it covers
+        self.summary: str = ""
+        self.summarized_count: int = 0
+
+        # Token usage of the latest generated message
+        self.last_usage: Dict[str, Any] = {}
+
+        # Increased on every change, so the conversation store knows what to save
+        self.version: int = 0
+
     def get_model_path(self) -> str:
         return self.model_path
 
     def set_model_path(self, new_model_path: str):
         self.model_path = new_model_path
+        self.version += 1
 
-    def get_messages(self, single_message_mode: bool = False) -> List[ModelMessage]:
+    def get_messages(self, single_message_mode: bool = False) -> Sequence[ModelMessage]:
         if not self.messages:
             return []
 
@@ -48,19 +77,22 @@ class ModelConversation:
 
             return messages
 
-        return self.messages[::]
+        return MessageHistory(self.messages)
 
     def add_user_message(self, content: str, metadata: MessageMetadata) -> None:
         self.messages.append(ModelMessage(Role.USER, content, metadata))
+        self.version += 1
 
     def add_assistant_message(self, content: str, metadata: MessageMetadata) -> None:
         self.messages.append(ModelMessage(Role.ASSISTANT, content, metadata))
+        self.version += 1
 
     def add_system_message(self, content: str, metadata: MessageMetadata) -> None:
         full_content = (
             "Unless required, answer briefly in a sentence or two.\n" + content
         )
         self.messages.append(ModelMessage(Role.SYSTEM, full_content, metadata))
+        self.version += 1
 
     def generate_message(
         self,
@@ -73,13 +105,195 @@ class ModelConversation:
         use_knowledge: bool = False,
         ask_permission_to_run_tools: bool = False,
         response_prefix: str = "",
+        overlap_stages: bool = False,
+        selected_files_token_budget: int = 0,
+        context_window: int = 0,
     ) -> str:
         messages = self.get_messages(single_message_mode)
 
         metadata = generate_metadata(ask_permission_to_run_tools)
 
+        self.last_usage = {}
+
         self.write_to_history("HISTORY", model, self.messages, use_metadata)
 
+        if overlap_stages:
+            prepare_context = self.prepare_context_overlapped
+        else:
+            prepare_context = self.prepare_context
+
+        prepare_context(
+            model,
+            max_tokens,
+            messages,
+            single_message_mode,
+            use_metadata=use_metadata,
+            use_tools=use_tools,
+            use_reflections=use_reflections,
+            use_knowledge=use_knowledge,
+            selected_files_token_budget=selected_files_token_budget,
+        )
+
+        if context_window > 0:
+            messages = self.fit_messages_to_context(
+                model,
+                messages,
+                context_window - max_tokens,
+                use_metadata=use_metadata,
+                single_message_mode=single_message_mode,
+            )
+
+        with record_stage("generation"):
+            response = model.generate_text(
+                messages,
+                max_tokens,
+                use_metadata=use_metadata,
+                response_prefix=response_prefix,
+            )
+
+        self.add_assistant_message(response.get_text(), metadata)
+
+        if self.last_usage:
+            print("TOKEN USAGE:", self.last_usage)
+
+        self.write_to_history("RESPONSE", model, self.messages[-1:], use_metadata)
+
+        return response.get_text()
+
+    def fit_messages_to_context(
+        self,
+        model: ApiModel,
+        messages: Sequence[ModelMessage],
+        token_budget: int,
+        use_metadata: bool = False,
+        single_message_mode: bool = False,
+    ) -> List[ModelMessage]:
+        """
+        Keeps the system message and as many of the latest messages as fit into
+        token_budget tokens. The older messages are replaced with a summary in the
+        system message, which is extended with only the messages that newly fall
+        out of the window instead of being rewritten every turn. The token usage
+        is stored in last_usage.
+        """
+        system_messages = [
+            message for message in messages if message.is_system_message()
+        ]
+        history = [message for message in messages if not message.is_system_message()]
+
+        costs = [
+            model.count_tokens(message.get_message(use_metadata))
+            + MESSAGE_TOKEN_OVERHEAD
+            for message in history
+        ]
+        system_cost = sum(
+            model.count_tokens(message.get_message(use_metadata))
+            + MESSAGE_TOKEN_OVERHEAD
+            for message in system_messages
+        )
+
+        usage: Dict[str, Any] = {
+            "token_budget": token_budget,
+            "prompt_tokens": system_cost + sum(costs),
+            "dropped_messages": 0,
+            "summarized_messages": 0,
+            "summarization_prompt_tokens": 0,
+        }
+        self.last_usage = usage
+
+        # Single message mode never sends the older messages, so they aren't summarized
+        if single_message_mode or (
+            usage["prompt_tokens"] <= token_budget and self.summarized_count == 0
+        ):
+            return messages
+
+        available = token_budget - system_cost - SUMMARY_MAX_TOKENS
+
+        # The latest message is always kept, and summarized messages never return
+        kept_start = len(history) - 1
+        kept_cost = costs[-1] if costs else 0
+        while (
+            kept_start > self.summarized_count
+            and kept_cost + costs[kept_start - 1] <= available
+        ):
+            kept_start -= 1
+            kept_cost += costs[kept_start]
+
+        if kept_start > self.summarized_count:
+            newly_dropped = history[self.summarized_count : kept_start]
+
+            with record_stage("summarization"):
+                self.summary, usage["summarization_prompt_tokens"] = (
+                    self.summarize_messages(model, newly_dropped, token_budget)
+                )
+
+            self.summarized_count = kept_start
+            self.version += 1
+            usage["summarized_messages"] = len(newly_dropped)
+
+        summary_text = f"Summary of the earlier conversation: {self.summary}"
+
+        if system_messages:
+            last_system_message = system_messages[-1]
+            system_messages[-1] = ModelMessage(
+                Role.SYSTEM,
+                f"{last_system_message.get_content()}\n\n{summary_text}",
+                last_system_message.get_metadata(),
+            )
+        else:
+            system_messages = [
+                ModelMessage(Role.SYSTEM, summary_text, generate_metadata())
+            ]
+            system_cost += MESSAGE_TOKEN_OVERHEAD
+
+        usage["dropped_messages"] = kept_start
+        usage["prompt_tokens"] = (
+            system_cost + model.count_tokens(summary_text) + kept_cost
+        )
+
+        return system_messages + history[kept_start:]
+
+    def summarize_messages(
+        self, model: ApiModel, messages: Sequence[ModelMessage], token_budget: int
+    ) -> Tuple[str, int]:
+        """Extends the current summary with the messages, returns the new summary
+        and the number of prompt tokens used for it."""
+        conversation = "\n".join(
+            f"{message.get_role().upper()}: {message.get_content()}"
+            for message in messages
+        )
+
+        # Keeps the end of messages that wouldn't fit the summarization prompt
+        max_characters = (
+            max(token_budget - SUMMARY_MAX_TOKENS, 0) * CHARACTERS_PER_TOKEN
+        )
+        conversation = conversation[-max_characters:] if max_characters else ""
+
+        prompt = "Summarize the conversation below in a few sentences, keeping the names, facts and decisions needed to continue it. Only write the summary."
+        if self.summary:
+            prompt += f"\nSUMMARY OF THE CONVERSATION BEFORE IT: {self.summary}"
+        prompt += f"\nCONVERSATION:\n{conversation}"
+
+        summary_messages = [ModelMessage(Role.USER, prompt, generate_metadata())]
+
+        response = model.generate_text(summary_messages, SUMMARY_MAX_TOKENS)
+
+        return response.get_text().strip(), model.count_prompt_tokens(summary_messages)
+
+    def prepare_context(
+        self,
+        model: ApiModel,
+        max_tokens: int,
+        messages: Sequence[ModelMessage],
+        single_message_mode: bool,
+        use_metadata: bool = False,
+        use_tools: bool = False,
+        use_reflections: bool = False,
+        use_knowledge: bool = False,
+        selected_files_token_budget: int = 0,
+    ) -> None:
+        """Runs reflections, tool use, knowledge retrieval and the packing of the
+        selected files one after another, storing their results in the metadata
+        of the last message."""
         if use_reflections and messages and messages[-1].is_user_message():
             self.handle_reflections(
                 model, max_tokens, messages, use_metadata=use_metadata
@@ -91,6 +305,7 @@ class ModelConversation:
                 200,
                 messages,
                 use_metadata=use_metadata,
+                single_message_mode=single_message_mode,
             )
 
             self.write_to_history("RESPONSE AFTER TOOLS", model, messages, use_metadata)
@@ -105,23 +320,100 @@ class ModelConversation:
             except Exception as e:
                 print(e)
 
-        response = model.generate_text(
-            messages,
-            max_tokens,
-            use_metadata=use_metadata,
-            response_prefix=response_prefix,
-        )
+        if selected_files_token_budget > 0 and messages:
+            self.handle_selected_files(messages[-1], selected_files_token_budget)
 
-        self.add_assistant_message(response.get_text(), metadata)
+    def prepare_context_overlapped(
+        self,
+        model: ApiModel,
+        max_tokens: int,
+        messages: Sequence[ModelMessage],
+        single_message_mode: bool,
+        use_metadata: bool = False,
+        use_tools: bool = False,
+        use_reflections: bool = False,
+        use_knowledge: bool = False,
+        selected_files_token_budget: int = 0,
+    ) -> None:
+        """
+        Same as prepare_context, but the knowledge retrieval and the reflections run
+        concurrently with tool selection and are joined before the final prompt is
+        built. Reflections need a second llama.cpp slot (MODEL.PARALLEL_SLOTS) to
+        actually overlap, and are run first when tool use may swap out the model.
+        Unlike the sequential mode, tool selection doesn't see the reflections.
+        """
+        selected_files_future = None
+        if selected_files_token_budget > 0 and messages:
+            selected_files_future = PIPELINE_EXECUTOR.submit(
+                self.pack_selected_files, messages[-1], selected_files_token_budget
+            )
 
-        self.write_to_history("RESPONSE", model, self.messages[-1:], use_metadata)
+        knowledge_future = None
+        if use_knowledge and messages:
+            knowledge_future = PIPELINE_EXECUTOR.submit(
+                self.retrieve_knowledge, messages[-1]
+            )
 
-        return response.get_text()
+        reflection_future = None
+        if use_reflections and messages and messages[-1].is_user_message():
+            if use_tools and self.tool_manager.may_swap_models():
+                self.handle_reflections(
+                    model, max_tokens, messages, use_metadata=use_metadata
+                )
+            else:
+                reflection_future = PIPELINE_EXECUTOR.submit(
+                    self.generate_reflection,
+                    model,
+                    max_tokens,
+                    messages,
+                    use_metadata,
+                )
+
+        if use_tools and messages:
+            self.handle_tool_use(
+                model,
+                200,
+                messages,
+                use_metadata=use_metadata,
+                single_message_mode=single_message_mode,
+            )
+
+            self.write_to_history("RESPONSE AFTER TOOLS", model, messages, use_metadata)
 
-    def generate_suggestions(self, model: ApiModel) -> List[str]:
-        messages = self.get_messages(single_message_mode=False)
+        if reflection_future:
+            try:
+                reflection_text = reflection_future.result()
 
-        messages.append(
+                if reflection_text:
+                    messages[-1].get_metadata().set_reflection_text(reflection_text)
+            except Exception as e:
+                print(e)
+
+        if knowledge_future:
+            try:
+                self.apply_knowledge(model, messages[-1], knowledge_future.result())
+
+                self.write_to_history(
+                    "RESPONSE AFTER KNOWLEDGE", model, messages, use_metadata
+                )
+            except Exception as e:
+                print(e)
+
+        if selected_files_future:
+            messages[-1].get_metadata().set_selected_files_content(
+                selected_files_future.result()
+            )
+
+    def generate_suggestions(
+        self, model: ApiModel, messages: Optional[Sequence[ModelMessage]] = None
+    ) -> List[str]:
+        """Suggests follow ups to the messages, by default the whole conversation.
+        Suggestions generated in the background get a snapshot of the messages,
+        as the conversation may continue meanwhile."""
+        if messages is None:
+            messages = self.get_messages(single_message_mode=False)
+
+        messages = list(messages) + [
             ModelMessage(
                 Role.USER,
                 (
@@ -130,7 +422,7 @@ class ModelConversation:
                 ),
                 generate_metadata(),
             )
-        )
+        ]
 
         response = model.generate_text(messages, max_tokens=200)
 
@@ -151,10 +443,24 @@ class ModelConversation:
         self,
         model: ApiModel,
         max_tokens: int,
-        messages: List[ModelMessage],
+        messages: Sequence[ModelMessage],
         use_metadata: bool = False,
     ) -> None:
-        last_message = messages.pop(-1)
+        reflection_text = self.generate_reflection(
+            model, max_tokens, messages, use_metadata
+        )
+
+        if reflection_text:
+            messages[-1].get_metadata().set_reflection_text(reflection_text)
+
+    def generate_reflection(
+        self,
+        model: ApiModel,
+        max_tokens: int,
+        messages: Sequence[ModelMessage],
+        use_metadata: bool = False,
+    ) -> str:
+        last_message = messages[-1]
 
         reflection_prompt_message = ModelMessage(
             Role.USER,
@@ -163,32 +469,33 @@ class ModelConversation:
             last_message.get_metadata(),
         )
 
-        messages.append(reflection_prompt_message)
-
-        response = model.generate_text(messages, max_tokens, use_metadata=use_metadata)
+        reflection_messages = list(messages[:-1]) + [reflection_prompt_message]
 
-        messages[-1] = last_message  # Restore the old user message
-
-        reflection_text = response.get_text()
+        with record_stage("reflections"):
+            response = model.generate_text(
+                reflection_messages, max_tokens, use_metadata=use_metadata
+            )
 
-        if reflection_text:
-            messages[-1].get_metadata().set_reflection_text(reflection_text)
+        return response.get_text()
 
     def handle_tool_use(
         self,
         model: ApiModel,
         max_tokens: int,
-        messages: list[ModelMessage],
+        messages: Sequence[ModelMessage],
         use_metadata: bool = False,
+        single_message_mode: bool = False,
     ) -> None:
 
         try:
-            output = self.tool_manager.retrieve_tool_output(
-                model,
-                max_tokens,
-                messages,
-                use_metadata,
-            )
+            with record_stage("tools"):
+                output = self.tool_manager.retrieve_tool_output(
+                    model,
+                    max_tokens,
+                    messages,
+                    use_metadata,
+                    single_message_mode,
+                )
 
             if output and output != JSON_ERROR_MESSAGE:
                 messages[-1].get_metadata().set_tool_output(output)
@@ -196,16 +503,45 @@ class ModelConversation:
         except Exception as e:
             print(e)
 
+    def handle_selected_files(self, message: ModelMessage, token_budget: int) -> None:
+        message.get_metadata().set_selected_files_content(
+            self.pack_selected_files(message, token_budget)
+        )
+
+    def pack_selected_files(self, message: ModelMessage, token_budget: int) -> str:
+        """Packs the parts of the selected files that are most relevant to the
+        message into token_budget tokens."""
+        selected_files = message.get_metadata().selected_files
+
+        if not selected_files:
+            return ""
+
+        try:
+            with record_stage("selected_files"):
+                return pack_selected_files(
+                    selected_files,
+                    message.get_content(),
+                    token_budget * CHARACTERS_PER_TOKEN,
+                )
+        except Exception as e:
+            print(e)
+            return ""
+
     def handle_knowledge(self, model: ApiModel, message: ModelMessage) -> None:
-        formatted_documents: List[str] = []
+        self.apply_knowledge(model, message, self.retrieve_knowledge(message))
 
-        self.memory_manager.refresh_memory()
+    def retrieve_knowledge(self, message: ModelMessage) -> List[str]:
+        with record_stage("knowledge"):
+            self.memory_manager.refresh_memory()
 
-        retrieved_documents = (
-            self.memory_manager.get_most_relevant_documents_with_rerank(
+            return self.memory_manager.get_most_relevant_documents_with_rerank(
                 message.get_message(), 3
             )
-        )
+
+    def apply_knowledge(
+        self, model: ApiModel, message: ModelMessage, retrieved_documents: List[str]
+    ) -> None:
+        formatted_documents: List[str] = []
 
         relevant_documents = self.get_relevant_documents(
             model, retrieved_documents, message
@@ -273,10 +609,12 @@ class ModelConversation:
             ModelMessage(Role.USER, user_message, message.get_metadata()),
         ]
 
-        for _ in range(JSON_PARSE_RETRY_COUNT):
+        for attempt in range(JSON_PARSE_RETRY_COUNT):
+            # Deterministic at first, the retries sample other answers
             response = model.generate_text(
                 messages,
                 40,
+                temperature=0 if attempt == 0 else 0.2,
                 use_metadata=True,
             )
             response_text = response.get_text().replace("\\", "")
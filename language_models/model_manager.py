@@ -1,17 +1,21 @@
 import os
 import subprocess
 import dotenv
-from typing import List
+from typing import Dict, List, Optional
 from language_models.api.base import ApiModel
 
 from language_models.api.llamacpp import LlamaCppModel
+from language_models.api.mock import MockModel
 from language_models.formatters.alpaca import AlpacaFormatter
 from language_models.formatters.cerebrum import CerebrumFormatter
+from language_models.formatters.chat_template import ChatTemplateFormatter
 from language_models.formatters.deepseek_coder import DeepseekCoderFormatter
 from language_models.formatters.llama3 import Llama3Formatter
 from language_models.formatters.mistral import MistralFormatter
 from language_models.formatters.base import PromptFormatter
 from language_models.formatters.orca_hashes import OrcaHashesFormatter
+from language_models.helpers.gguf_metadata import read_chat_template
+from language_models.helpers.launch_profiles import LaunchProfile, get_launch_profile
 from language_models.api.openai import OpenAIModel
 
 
@@ -21,8 +25,17 @@ class ModelManager:
         self.start_port = start_port
         self.popen = None
         self.context_window = 2048
+
+        # Number of requests llama.cpp can process concurrently, each slot gets
+        # its own context window
+        self.parallel_slots = int(os.getenv("MODEL.PARALLEL_SLOTS", 1))
         self.active_models: List[ApiModel] = []
 
+        # Side models (e.g. the tool selector) stay resident on their own ports next
+        # to the chat model, instead of being swapped in and out
+        self.side_models: Dict[str, ApiModel] = {}
+        self.side_popens: Dict[str, subprocess.Popen[str]] = {}
+
     def model_is_loaded(self) -> bool:
         return self.popen != None
 
@@ -59,50 +72,23 @@ class ModelManager:
         else:
             # Load a local model
             model_path = os.path.join("models", model_identifier)
-            print("PROMPT FORMAT:", self.read_prompt_format(model_path))
 
             print(self.llama_cpp_path)
 
-            if gpu_layers == -1:
-                gpu_layers = int(os.getenv("MODEL.GPU_LAYERS", 9001))
-
-            # Start a new child process with the llama cpp path and the model path as arguments
-            self.popen = subprocess.Popen(
-                [
-                    self.llama_cpp_path,
-                    "--n-gpu-layers",
-                    str(gpu_layers),
-                    "--ctx-size",
-                    str(self.context_window),
-                    "--port",
-                    str(self.start_port),
-                    "-m",
-                    model_path,
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-            )
+            # Launch settings of the model, see MODEL.PROFILES_PATH
+            profile = get_launch_profile(model_identifier)
 
-            while True:
-                if self.popen.stdout:
-                    try:
-                        line = self.popen.stdout.readline()
-                        print(line, end="")
-                        if "llama_new_context_with_model: graph splits" in line:
-                            break
-                    except Exception as e:
-                        print(e)
-                        break
+            if gpu_layers == -1:
+                gpu_layers = int(
+                    profile.get("gpu_layers", os.getenv("MODEL.GPU_LAYERS", 9001))
+                )
 
-                else:
-                    return
+            self.context_window = profile.get_context_window()
+            self.parallel_slots = profile.get_parallel_slots()
 
-            # Close the stdout pipe after the while loop to allow normal process output
-            if self.popen.stdout:
-                self.popen.stdout.close()
+            self.popen = self.start_server(
+                model_path, self.start_port, gpu_layers, profile=profile
+            )
 
             prompt_formatter = self.get_prompt_formatter(model_identifier)
             self.active_models.append(
@@ -119,22 +105,146 @@ class ModelManager:
         if dotenv_file:
             dotenv.set_key(dotenv_file, "MODEL.LAST_USED", model_identifier)
 
-    def read_prompt_format(self, model_path: str) -> str:
-        from gguf import GGUFReader
+    def start_server(
+        self,
+        model_path: str,
+        port: int,
+        gpu_layers: int,
+        threads: int = -1,
+        profile: Optional[LaunchProfile] = None,
+    ) -> subprocess.Popen[str]:
+        if profile is None:
+            profile = LaunchProfile(
+                {"ctx_size": self.context_window, "parallel": self.parallel_slots}
+            )
+
+        overrides = {"gpu_layers": gpu_layers}
+        if threads > 0:
+            overrides["threads"] = threads
+
+        arguments = [
+            self.llama_cpp_path,
+            "--port",
+            str(port),
+            "-m",
+            model_path,
+        ] + profile.merged(LaunchProfile(overrides)).to_arguments()
+
+        # Start a new child process with the llama cpp path and the model path as arguments
+        popen = subprocess.Popen(
+            arguments,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            universal_newlines=True,
+        )
+
+        while popen.stdout:
+            try:
+                line = popen.stdout.readline()
+                print(line, end="")
+                if "llama_new_context_with_model: graph splits" in line or not line:
+                    break
+            except Exception as e:
+                print(e)
+                break
+
+        # Close the stdout pipe after the while loop to allow normal process output
+        if popen.stdout:
+            popen.stdout.close()
+
+        return popen
+
+    def get_side_model(self, role: str) -> Optional[ApiModel]:
+        """
+        Returns the resident model configured for a role such as TOOL_SELECTOR or
+        CODE_GENERATOR, starting it on its own port the first time it is requested.
+        Returns None if the role has no resident model, in which case the caller
+        falls back to swapping the active model.
+
+        Configured through MODEL.<ROLE>, MODEL.<ROLE>.RESIDENT, MODEL.<ROLE>.PORT,
+        MODEL.<ROLE>.GPU_LAYERS and MODEL.<ROLE>.THREADS, which override the launch
+        profile of the model.
+        """
+        model_identifier = os.getenv(f"MODEL.{role}")
+
+        if not model_identifier:
+            return None
+
+        if os.getenv(f"MODEL.{role}.RESIDENT", "false").lower() != "true":
+            return None
+
+        for model in self.active_models:
+            if model.get_model_path() == model_identifier:
+                return model
+
+        if role in self.side_models:
+            if self.side_models[role].get_model_path() == model_identifier:
+                return self.side_models[role]
+            self.unload_side_model(role)
 
-        reader = GGUFReader(model_path, "r+")
+        if model_identifier not in self.get_available_models():
+            print(f"Error: Model {model_identifier} not found.")
+            return None
 
-        if "tokenizer.chat_template" in reader.fields:
-            jinja_template = "".join(
-                [chr(c) for c in reader.fields["tokenizer.chat_template"].parts[4]]
+        try:
+            port = int(os.getenv(f"MODEL.{role}.PORT", ""))
+        except ValueError:
+            port = self.start_port + 1 + len(self.side_popens)
+
+        try:
+            gpu_layers = int(os.getenv(f"MODEL.{role}.GPU_LAYERS", "-1"))
+        except ValueError:
+            gpu_layers = -1
+
+        profile = get_launch_profile(model_identifier)
+
+        if gpu_layers == -1:
+            gpu_layers = int(
+                profile.get("gpu_layers", os.getenv("MODEL.GPU_LAYERS", 9001))
             )
-            return jinja_template
-        else:
-            print("No chat template found.")
-            return ""
+
+        try:
+            threads = int(os.getenv(f"MODEL.{role}.THREADS", "-1"))
+        except ValueError:
+            threads = -1
+
+        model_path = os.path.join("models", model_identifier)
+
+        self.side_popens[role] = self.start_server(
+            model_path, port, gpu_layers, threads, profile=profile
+        )
+        self.side_models[role] = LlamaCppModel(
+            "127.0.0.1",
+            str(port),
+            self.get_prompt_formatter(model_identifier),
+            model_identifier,
+        )
+
+        return self.side_models[role]
+
+    def unload_side_model(self, role: str) -> None:
+        popen = self.side_popens.pop(role, None)
+        if popen:
+            popen.terminate()
+        self.side_models.pop(role, None)
 
     def get_prompt_formatter(self, model_path: str) -> PromptFormatter:
-        # TODO: Read model type through metadata rather than name
+        # The chat template of the model is used when it has one, see MODEL.USE_CHAT_TEMPLATE
+        if os.getenv("MODEL.USE_CHAT_TEMPLATE", "true").lower() == "true":
+            metadata_path = os.path.join("models", model_path)
+            metadata = (
+                read_chat_template(metadata_path)
+                if os.path.isfile(metadata_path)
+                else None
+            )
+            if metadata:
+                print(f"Using the chat template of {model_path}")
+                return ChatTemplateFormatter(
+                    metadata["chat_template"], metadata["eos_token"]
+                )
+
         if "mistral" in model_path or "mixtral" in model_path:
             return MistralFormatter()
         elif "neural" in model_path or "solar" in model_path:
@@ -173,3 +283,28 @@ class ModelManager:
         if self.popen:
             self.popen.kill()
             self.popen = None
+
+        for popen in self.side_popens.values():
+            popen.kill()
+        self.side_popens = {}
+
+
+class MockModelManager(ModelManager):
+    """Serves a single MockModel without starting llama.cpp, used to run the server
+    and replay recorded traces without models."""
+
+    def __init__(self):
+        super().__init__("", 0)
+
+    def load_model(self, model_index: int = -1, gpu_layers: int = -1) -> None:
+        if not self.active_models:
+            self.active_models.append(MockModel())
+
+    def change_model(self, model_path: str, gpu_layers: int = -1) -> None:
+        self.load_model()
+
+    def get_side_model(self, role: str) -> Optional[ApiModel]:
+        return None
+
+    def get_available_models(self) -> List[str]:
+        return ["mock"]
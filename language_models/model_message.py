@@ -1,6 +1,26 @@
+import itertools
+import sys
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional, Sequence
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+# Texts that repeat across messages, like the clipboard content that is sent with
+# every message or the same tool output, share one string. Bounded by the total
+# number of characters, so texts that stop recurring are released.
+SHARED_TEXTS_MAX_CHARACTERS = 4_000_000
 
 
 class Role(Enum):
@@ -9,7 +29,51 @@ class Role(Enum):
     ASSISTANT = 3
 
 
+class SharedTexts:
+    def __init__(self, max_characters: int):
+        self.max_characters = max_characters
+        self.texts: OrderedDict[str, str] = OrderedDict()
+        self.character_count = 0
+        self.lock = threading.Lock()
+
+    def share(self, text: str) -> str:
+        """Returns the stored string equal to text, storing text if there is none."""
+        if not text or len(text) > self.max_characters:
+            return text
+
+        with self.lock:
+            shared = self.texts.get(text)
+            if shared is not None:
+                self.texts.move_to_end(text)
+                return shared
+
+            self.texts[text] = text
+            self.character_count += len(text)
+            while self.character_count > self.max_characters:
+                evicted, _ = self.texts.popitem(last=False)
+                self.character_count -= len(evicted)
+
+            return text
+
+
+shared_texts = SharedTexts(SHARED_TEXTS_MAX_CHARACTERS)
+
+
 class MessageMetadata:
+    __slots__ = (
+        "timestamp",
+        "selected_files",
+        "ask_permission_to_run_tools",
+        "clipboard_content",
+        "tool_output",
+        "knowledge_information",
+        "reflection_text",
+        "selected_files_content",
+        "allowed_tools",
+        "output_callback",
+        "version",
+    )
+
     def __init__(
         self,
         timestamp: datetime,
@@ -19,25 +83,50 @@ class MessageMetadata:
         allowed_tools: Optional[List[str]] = None,
     ):
         self.timestamp = timestamp
-        self.selected_files = selected_files
+        # Paths are few and repeat in every message, so they are interned
+        self.selected_files: Sequence[str] = (
+            tuple(sys.intern(path) for path in selected_files) if selected_files else ()
+        )
         self.ask_permission_to_run_tools = ask_permission_to_run_tools
-        self.clipboard_content = clipboard_content
+        self.clipboard_content = shared_texts.share(clipboard_content or "")
         self.tool_output = ""
         self.knowledge_information = ""
         self.reflection_text = ""
+        self.selected_files_content = ""
         self.allowed_tools = allowed_tools
 
+        # Receives the stream name and a chunk of output while a tool runs code
+        self.output_callback: Optional[Callable[[str, str], None]] = None
+
+        # Increased when a value shown in the prompt changes, so rendered messages
+        # know they are outdated
+        self.version = 0
+
     def set_knowledge_information(self, knowledge_information: str) -> None:
-        self.knowledge_information = knowledge_information
+        self.knowledge_information = shared_texts.share(knowledge_information)
+        self.version += 1
 
     def set_reflection_text(self, reflection_text: str) -> None:
-        self.reflection_text = reflection_text
+        self.reflection_text = shared_texts.share(reflection_text)
+        self.version += 1
+
+    def set_selected_files_content(self, selected_files_content: str) -> None:
+        self.selected_files_content = shared_texts.share(selected_files_content)
+        self.version += 1
 
     def set_tool_output(self, tool_output: str) -> None:
-        self.tool_output = tool_output
+        self.tool_output = shared_texts.share(tool_output)
+        self.version += 1
+
+    def set_output_callback(
+        self, output_callback: Optional[Callable[[str, str], None]]
+    ) -> None:
+        self.output_callback = output_callback
 
 
 class ModelMessage:
+    __slots__ = ("role", "content", "metadata", "actor_name", "rendered")
+
     def __init__(
         self,
         role: Role,
@@ -48,7 +137,28 @@ class ModelMessage:
         self.role = role
         self.content = content
         self.metadata = metadata
-        self.actor_name = actor_name
+        self.actor_name = sys.intern(actor_name)
+
+        # Render key -> (content, metadata version, rendered text), see get_rendered
+        self.rendered: Optional[Dict[Hashable, Tuple[str, int, str]]] = None
+
+    def get_rendered(self, key: Hashable, render: Callable[[], str]) -> str:
+        """
+        Returns the text render produces for this message, e.g. its segment of a
+        prompt, rendering it again only when the content or metadata changed since
+        it was rendered with the same key. Lets a formatter only format the new
+        messages of a conversation every turn.
+        """
+        if self.rendered is None:
+            self.rendered = {}
+
+        cached = self.rendered.get(key)
+        if cached and cached[0] is self.content and cached[1] == self.metadata.version:
+            return cached[2]
+
+        text = render()
+        self.rendered[key] = (self.content, self.metadata.version, text)
+        return text
 
     def append_content(self, appended_content: str) -> None:
         self.content += f"\n\n{appended_content}"
@@ -72,6 +182,13 @@ class ModelMessage:
                 + ")\n\n"
             )
 
+        if self.metadata.selected_files_content:
+            info += (
+                "(The selected files contain the following relevant content:\n"
+                + self.metadata.selected_files_content
+                + ")\n\n"
+            )
+
         combined_info = ""
 
         if self.metadata.clipboard_content:
@@ -124,3 +241,55 @@ class ModelMessage:
 
     def is_assistant_message(self) -> bool:
         return self.role == Role.ASSISTANT
+
+
+class MessageHistory(Sequence[ModelMessage]):
+    """
+    Read-only view of a range of a message list, used to pass the history of a
+    conversation around without copying it. Messages appended to the list after
+    the view was created are not part of the view, and slicing returns a view.
+    """
+
+    __slots__ = ("messages", "start", "stop")
+
+    def __init__(
+        self, messages: List[ModelMessage], start: int = 0, stop: Optional[int] = None
+    ):
+        self.messages = messages
+        self.start = start
+        self.stop = len(messages) if stop is None else stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    @overload
+    def __getitem__(self, index: int) -> ModelMessage: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[ModelMessage]: ...
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[ModelMessage, Sequence[ModelMessage]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return MessageHistory(
+                self.messages, self.start + start, self.start + max(start, stop)
+            )
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        return self.messages[self.start + index]
+
+    def __iter__(self) -> Iterator[ModelMessage]:
+        return itertools.islice(self.messages, self.start, self.stop)
+
+    def __add__(self, other: Sequence[ModelMessage]) -> List[ModelMessage]:
+        return [*self, *other]
+
+    def __repr__(self) -> str:
+        return f"MessageHistory({list(self)})"
@@ -1,9 +1,10 @@
 import json
 import os
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
 from typing import Any, Dict, Optional, Sequence, Tuple, List
 from language_models.api.base import ApiModel
 from language_models.helpers.json_fixer import fix_json_errors
-from language_models.helpers.json_parser import handle_json
+from language_models.helpers.json_parser import handle_json, repair_backslashes
 from language_models.helpers.tool_helper import load_available_tools
 from language_models.model_message import MessageMetadata, ModelMessage, Role
 from language_models.model_response import ModelResponse
@@ -12,13 +13,28 @@ from language_models.tools.base_tool import BaseTool
 
 SELF_CONTAINED_MODE = True
 
+# When enabled, the self-contained rewrite and the tool choice are produced by a
+# single model call instead of two sequential ones. Can be overridden through the
+# TOOLS.COMBINED_SELECTION environment variable.
+COMBINED_SELECTION_MODE = False
+
+# Maximum number of tool calls that are executed from a single selection response
+MAX_TOOL_CALLS = 3
+
+# Shared between all conversations, a tool that exceeds its timeout keeps its worker
+# thread until it finishes, so the pool is sized with some headroom.
+TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tool")
+
 
 class ToolManager:
     def __init__(self):
         self.tools: Sequence[BaseTool] = load_available_tools()
 
     def get_tool_conversation(
-        self, message: ModelMessage, tools: Sequence[BaseTool]
+        self,
+        message: ModelMessage,
+        tools: Sequence[BaseTool],
+        history: Optional[Sequence[ModelMessage]] = None,
     ) -> Sequence[ModelMessage]:
         content = "You are an expert at determining which tool is the best to use in order to solve the problem. Using the user message and the available tools, reply with what tool and arguments you want to use."
 
@@ -37,6 +53,11 @@ class ToolManager:
 
         content += "\n\nAnswer with the optimal tool and arguments to solve the provided problem. It is very important to me that you use the best tool and arguments to solve the problem."
 
+        content += f'\nIf the problem can only be solved by combining several tools, answer with a plan of at most {MAX_TOOL_CALLS} tool calls in the following format: {{"tools": [{{"tool": "tool_name", "arguments": {{}}}}, {{"tool": "other_tool_name", "arguments": {{}}}}]}}'
+
+        if history:
+            content += "\n\nThe last user message may refer to the earlier conversation. Add a \"query\" field to the JSON object where you rewrite the last user message in a self-contained manner, for example by replacing 'run it' with 'run (what it is, based on the context of the conversation)'. Start the query with 'The user...'"
+
         tool_system_message = ModelMessage(Role.SYSTEM, content, message.get_metadata())
 
         messages = [tool_system_message]
@@ -45,9 +66,31 @@ class ToolManager:
             for example_message in tool.get_example_messages():
                 messages.append(example_message)
 
-        messages.append(message)
+        if history:
+            messages.append(self.get_history_message(history, message))
+        else:
+            messages.append(message)
         return messages
 
+    def get_history_message(
+        self, history: Sequence[ModelMessage], message: ModelMessage
+    ) -> ModelMessage:
+        conversation_lines: List[str] = []
+
+        for history_message in history:
+            if not history_message.is_system_message():
+                conversation_lines.append(
+                    f"{history_message.get_role().upper()}: {history_message.get_content()}"
+                )
+
+        content = (
+            "EARLIER CONVERSATION:\n"
+            + "\n".join(conversation_lines)
+            + f"\n\nLAST USER MESSAGE: {message.get_content()}"
+        )
+
+        return ModelMessage(Role.USER, content, message.get_metadata())
+
     def get_target_tool(
         self, command: Dict[str, str], tools: Sequence[BaseTool]
     ) -> Optional[BaseTool]:
@@ -58,38 +101,11 @@ class ToolManager:
 
         return None
 
-    def add_backslashes(self, response: str) -> str:
-        """Not so pretty hack to inject backslashes into string
-        since json.loads requires 4 backslashes to indicate paths
-        and the llm usually only outputs one or two.
-        """
-        new_response = ""
-
-        i = 0
-
-        while i < len(response):
-            c = response[i]
-            if c == "\\":
-                for j in range(3):
-                    new_response += "\\"
-
-                for j in range(1, 4):
-                    if len(response) > j + i and response[j + i] == "\\":
-                        i += 1
-                    else:
-                        break
-
-            new_response += c
-            i += 1
-
-        return new_response
-
     def parse_json(
         self, model: ApiModel, response: ModelResponse, metadata: MessageMetadata
     ) -> Tuple[Dict[str, Any], str]:
         response_text = response.get_text().strip()
-        handled_text = handle_json(response_text).replace("\\_", "_")
-        handled_text = self.add_backslashes(handled_text)
+        handled_text = repair_backslashes(handle_json(response_text))
 
         try:
             return json.loads(handled_text), handled_text
@@ -100,35 +116,128 @@ class ToolManager:
             else:
                 raise Exception(f"Failed to fix JSON: {handled_text}")
 
-    def parse_tool(
+    def parse_tools(
         self,
         model: ApiModel,
         response: ModelResponse,
         metadata: MessageMetadata,
         tools: Sequence[BaseTool],
-    ) -> Tuple[Optional[BaseTool], Dict[str, Any]]:
+    ) -> List[Tuple[BaseTool, Dict[str, Any]]]:
+        """Parses a selection response into a plan of tool calls, the response is either
+        a single {"tool": ..., "arguments": ...} object or a {"tools": [...]} plan."""
         response_text = response.get_text()
         try:
             command, _ = self.parse_json(model, response, metadata)
             print("COMMAND", command)
 
-            if not "tool" in command:
-                print(f"MISSING tool in: {response_text}")
+            if "query" in command:
+                print("SELF_CONTAINED: " + str(command["query"]))
+
+            if isinstance(command.get("tools"), list):
+                commands = [c for c in command["tools"] if isinstance(c, dict)]
+            else:
+                commands = [command]
+
+            plan: List[Tuple[BaseTool, Dict[str, Any]]] = []
+
+            for command in commands[:MAX_TOOL_CALLS]:
+                if not "tool" in command:
+                    print(f"MISSING tool in: {response_text}")
+                    continue
+
+                if not "arguments" in command:
+                    command["arguments"] = {}
+
+                if not isinstance(command["arguments"], dict):
+                    command["arguments"] = {}
 
-            if not "arguments" in command:
-                command["arguments"] = {}
+                target_tool = self.get_target_tool(command, tools)
 
-            if not isinstance(command["arguments"], dict):
-                command["arguments"] = {}
+                if target_tool and (target_tool, command) not in plan:
+                    plan.append((target_tool, command))
 
-            target_tool = self.get_target_tool(command, tools)
+            if len(plan) > 1:
+                plan = [
+                    (tool, command) for tool, command in plan if tool.name != "nothing"
+                ]
 
-            return target_tool, command
+            return plan
 
         except Exception as e:
             print(f"FAILED TO PARSE: {response_text}")
             print(f"Exception message: {str(e)}")
-            return None, {}
+            return []
+
+    def parse_tool(
+        self,
+        model: ApiModel,
+        response: ModelResponse,
+        metadata: MessageMetadata,
+        tools: Sequence[BaseTool],
+    ) -> Tuple[Optional[BaseTool], Dict[str, Any]]:
+        plan = self.parse_tools(model, response, metadata, tools)
+
+        if plan:
+            return plan[0]
+
+        return None, {}
+
+    def has_permission_to_run(
+        self, tool: BaseTool, command: Dict[str, Any], metadata: MessageMetadata
+    ) -> bool:
+        if metadata.ask_permission_to_run_tools and tool.ask_permission_to_run:
+            permission_message = tool.ask_permission_message(
+                command["arguments"], metadata
+            )
+
+            if not permission_message:
+                permission_message = "UNKNOWN PERMISSION MESSAGE"
+
+            if not tool.get_user_permission(permission_message):
+                print(f"User denied permission to run {tool.name}")
+                return False
+        return True
+
+    def run_tools(
+        self,
+        plan: Sequence[Tuple[BaseTool, Dict[str, Any]]],
+        model: ApiModel,
+        messages: Sequence[ModelMessage],
+        metadata: MessageMetadata,
+    ) -> str:
+        """Runs the planned tool calls, independent tools are executed concurrently
+        while the rest run one after another. The outputs are merged in plan order."""
+        outputs: List[str] = [""] * len(plan)
+        futures: List[Tuple[int, BaseTool, Future[str]]] = []
+
+        if len(plan) > 1:
+            for i, (tool, command) in enumerate(plan):
+                if tool.run_concurrently:
+                    future = TOOL_EXECUTOR.submit(
+                        tool.run, command["arguments"], model, messages, metadata
+                    )
+                    futures.append((i, tool, future))
+
+        concurrent_indices = {i for i, _, _ in futures}
+
+        for i, (tool, command) in enumerate(plan):
+            if i not in concurrent_indices:
+                try:
+                    outputs[i] = tool.run(
+                        command["arguments"], model, messages, metadata
+                    )
+                except Exception as e:
+                    print(f"Tool {tool.name} failed: {e}")
+
+        for i, tool, future in futures:
+            try:
+                outputs[i] = future.result(timeout=tool.timeout)
+            except TimeoutError:
+                print(f"Tool {tool.name} timed out after {tool.timeout} seconds")
+            except Exception as e:
+                print(f"Tool {tool.name} failed: {e}")
+
+        return "\n\n".join(output for output in outputs if output)
 
     def change_to_tool_model(self, model: ApiModel):
 
@@ -144,20 +253,55 @@ class ToolManager:
         model_manager = ModelState.get_instance().get_model_manager()
 
         if tool_selector_model and model_manager:
+            side_model = model_manager.get_side_model("TOOL_SELECTOR")
+            if side_model:
+                return side_model, model_manager
+
             model_manager.change_model(tool_selector_model, tool_selector_gpu_layers)
             model = model_manager.active_models[0]
 
         return model, model_manager
 
+    def may_swap_models(self) -> bool:
+        """Returns True if tool use may replace the active model, which happens when
+        the tool selector or code generator is configured without being resident."""
+        model_manager = ModelState.get_model_manager()
+
+        if not model_manager:
+            return False
+
+        for role in ("TOOL_SELECTOR", "CODE_GENERATOR"):
+            if os.getenv(f"MODEL.{role}") and not model_manager.get_side_model(role):
+                return True
+
+        return False
+
+    def use_combined_selection(self) -> bool:
+        combined_selection = os.getenv("TOOLS.COMBINED_SELECTION")
+        if combined_selection is None:
+            return COMBINED_SELECTION_MODE
+        return combined_selection.lower() in ("1", "true", "yes")
+
+    def needs_self_contained_query(
+        self, messages: Sequence[ModelMessage], single_message_mode: bool
+    ) -> bool:
+        """The rewrite only adds information when there is earlier conversation
+        that the last message could refer to."""
+        if not SELF_CONTAINED_MODE or single_message_mode:
+            return False
+
+        user_message_count = sum(1 for message in messages if message.is_user_message())
+        return user_message_count > 1
+
     def create_self_contained_query(
         self,
         model: ApiModel,
         max_tokens: int,
-        messages: List[ModelMessage],
+        messages: Sequence[ModelMessage],
         use_metadata: bool = False,
     ) -> ModelMessage:
         metadata = messages[-1].get_metadata()
-        self_referential_conversation = messages[::] + [
+        self_referential_conversation = list(messages) + [
             ModelMessage(
                 Role.USER,
                 "Rewrite the last message in a self-contained manner, for example by replacing 'run it' with 'run (what it is, based on the context of the conversation)'. Write your response as short as needed to convey the message of the user. Start your response with 'The user...'",
@@ -168,6 +312,7 @@ class ToolManager:
         response = model.generate_text(
             self_referential_conversation,
             max_tokens=max_tokens,
+            temperature=0,
             use_metadata=use_metadata,
         )
 
@@ -178,8 +323,9 @@ class ToolManager:
         self,
         model: ApiModel,
         max_tokens: int,
-        messages: List[ModelMessage],
+        messages: Sequence[ModelMessage],
         use_metadata: bool = False,
+        single_message_mode: bool = False,
     ) -> str:
         if messages:
             metadata = messages[-1].get_metadata()
@@ -198,43 +344,38 @@ class ToolManager:
                 filtered_tools = self.tools
 
             query_message: ModelMessage = messages[-1]
+            history: Optional[List[ModelMessage]] = None
 
-            if SELF_CONTAINED_MODE:
-                query_message: ModelMessage = self.create_self_contained_query(
-                    model, max_tokens, messages, use_metadata
-                )
+            if self.needs_self_contained_query(messages, single_message_mode):
+                if self.use_combined_selection():
+                    history = messages[:-1]
+                else:
+                    query_message = self.create_self_contained_query(
+                        model, max_tokens, messages, use_metadata
+                    )
 
             tool_conversation = self.get_tool_conversation(
-                query_message, filtered_tools
+                query_message, filtered_tools, history
             )
 
             tool_model, model_manager = self.change_to_tool_model(model)
 
-            response = tool_model.generate_text(
-                tool_conversation, max_tokens=max_tokens, use_metadata=use_metadata
-            )
-
-            tool, command = self.parse_tool(model, response, metadata, filtered_tools)
-
-            if tool:
-                if metadata.ask_permission_to_run_tools:
-                    if tool.ask_permission_to_run:
-                        permission_message = tool.ask_permission_message(
-                            command["arguments"], metadata
-                        )
-
-                        if not permission_message:
-                            permission_message = "UNKNOWN PERMISSION MESSAGE"
+            try:
+                response = tool_model.generate_text(
+                    tool_conversation, max_tokens=max_tokens, use_metadata=use_metadata
+                )
 
-                        if not tool.get_user_permission(permission_message):
-                            print(f"User denied permission to run {tool.name}")
-                            return ""
-                result = tool.action(command["arguments"], model, messages, metadata)
-            else:
-                result = ""
+                plan = self.parse_tools(model, response, metadata, filtered_tools)
 
-            if tool_model != model and model_manager:
-                model_manager.change_model(model.model_path)
+                plan = [
+                    (tool, command)
+                    for tool, command in plan
+                    if self.has_permission_to_run(tool, command, metadata)
+                ]
 
-            return result
+                return self.run_tools(plan, model, messages, metadata)
+            finally:
+                # The conversation model must be active again even if tool use failed
+                if tool_model != model and model_manager:
+                    model_manager.change_model(model.model_path)
         return ""
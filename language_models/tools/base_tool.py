@@ -3,18 +3,26 @@ import os
 import subprocess
 import sys
 import tempfile
-from typing import Any, Dict, List, Optional, Tuple
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from language_models.api.base import ApiModel
+from language_models.helpers.tool_result_cache import ToolResultCache
+from language_models.helpers.trace_recorder import record_event, replay_event
 from language_models.model_message import MessageMetadata, ModelMessage, Role
 
 
 class BaseTool:
+    result_cache: ToolResultCache = ToolResultCache()
+
     def __init__(
         self,
         name: Optional[str] = None,
         description: Optional[str] = None,
         available_arguments: Optional[List[Tuple[str, str]]] = None,
         ask_permission_to_run: bool = False,
+        run_concurrently: bool = False,
+        timeout: Optional[float] = None,
+        cache_ttl: Optional[float] = None,
     ):
         if name is None:
             raise ValueError("name must be provided")
@@ -30,15 +38,85 @@ class BaseTool:
         self.example_path = "C:\\test.txt"
         self.ask_permission_to_run = ask_permission_to_run
 
+        # Tools that don't depend on the loaded model or on other tools can be run
+        # concurrently when several tools are selected in the same turn
+        self.run_concurrently = run_concurrently
+        self.timeout = timeout
+
+        # Time to live in seconds for cached results, None keeps them until evicted
+        self.cache_ttl = cache_ttl
+
     def action(
         self,
         arguments: Dict[str, Any],
         model: ApiModel,
-        messages: List[ModelMessage],
+        messages: Sequence[ModelMessage],
         metadata: MessageMetadata,
     ) -> str:
         raise NotImplementedError("Subclasses must implement this method")
 
+    def run(
+        self,
+        arguments: Dict[str, Any],
+        model: ApiModel,
+        messages: Sequence[ModelMessage],
+        metadata: MessageMetadata,
+    ) -> str:
+        """Runs the tool action, reusing a cached result when the tool declares
+        a cache key for the arguments. The output is recorded when traces are
+        recorded, and replayed instead of running the action during a replay."""
+        start_time = time.time()
+
+        replayed_event = replay_event("tool", self.name)
+
+        if replayed_event:
+            result = replayed_event["output"]
+        else:
+            result = self.run_action(arguments, model, messages, metadata)
+
+        record_event(
+            "tool",
+            name=self.name,
+            arguments=arguments,
+            output=result,
+            duration=time.time() - start_time,
+        )
+
+        return result
+
+    def run_action(
+        self,
+        arguments: Dict[str, Any],
+        model: ApiModel,
+        messages: Sequence[ModelMessage],
+        metadata: MessageMetadata,
+    ) -> str:
+        cache_key = self.get_cache_key(arguments, metadata)
+
+        if cache_key is None:
+            return self.action(arguments, model, messages, metadata)
+
+        cache_key = f"{self.name}:{cache_key}"
+
+        cached_result = BaseTool.result_cache.get(cache_key)
+        if cached_result is not None:
+            print(f"CACHED RESULT for {self.name}")
+            return cached_result
+
+        result = self.action(arguments, model, messages, metadata)
+
+        if result:
+            BaseTool.result_cache.set(cache_key, result, self.cache_ttl)
+
+        return result
+
+    def get_cache_key(
+        self, arguments: Dict[str, Any], metadata: MessageMetadata
+    ) -> Optional[str]:
+        """Returns a key identifying the result of the action for the given arguments,
+        or None if the result can't be reused."""
+        return None
+
     def ask_permission_message(
         self, arguments: Dict[str, Any], metadata: MessageMetadata
     ) -> Optional[str]:
@@ -1,7 +1,8 @@
-from typing import Any, Dict, List
-import requests
-import bs4
+import os
+from typing import Any, Dict, List, Optional, Sequence
 from language_models.api.base import ApiModel
+from language_models.helpers.content_extractor import select_relevant_content
+from language_models.helpers.web_fetcher import WebFetcher
 from language_models.model_message import MessageMetadata, ModelMessage
 from language_models.tools.base_tool import BaseTool
 
@@ -18,13 +19,15 @@ class BrowseInternetTool(BaseTool):
                 )
             ],
             True,
+            run_concurrently=True,
+            timeout=30,
         )
 
     def action(
         self,
         arguments: Dict[str, Any],
         model: ApiModel,
-        messages: List[ModelMessage],
+        messages: Sequence[ModelMessage],
         metadata: MessageMetadata,
     ) -> str:
         url = self.get_url_argument(arguments)
@@ -35,13 +38,32 @@ class BrowseInternetTool(BaseTool):
 
         print(f"BROWSE INTERNET with url {url}!")
 
-        web_response = requests.get(url)
-        web_response.raise_for_status()
-        soup = bs4.BeautifulSoup(web_response.text, "html.parser")
+        page = WebFetcher.get_instance().fetch(url)
 
-        text_content = soup.get_text()
+        text_content = self.get_relevant_content(
+            page.get_content(), self.get_query(messages)
+        )
         return f"WEBPAGE CONTENT OF URL {url}: {text_content}"
 
+    def get_relevant_content(self, text: str, query: Optional[str]) -> str:
+        """Returns the chunks of the page that are most relevant to the query,
+        within BROWSE.MAX_CONTENT_CHARACTERS."""
+        max_characters = int(os.getenv("BROWSE.MAX_CONTENT_CHARACTERS", 4000))
+        return select_relevant_content(text, query, max_characters)
+
+    def get_query(self, messages: Sequence[ModelMessage]) -> Optional[str]:
+        for message in reversed(messages):
+            if message.is_user_message():
+                return message.get_content()
+        return None
+
+    def get_cache_key(
+        self, arguments: Dict[str, Any], metadata: MessageMetadata
+    ) -> Optional[str]:
+        # The selected content depends on the query, unchanged pages are served
+        # from the disk cache of the fetcher instead
+        return None
+
     def ask_permission_message(
         self, arguments: Dict[str, Any], metadata: MessageMetadata
     ) -> str:
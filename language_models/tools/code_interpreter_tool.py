@@ -1,16 +1,34 @@
+import atexit
+import hashlib
+import re
 import subprocess
 import sys
-from typing import Any, Dict, List, Tuple
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from language_models.api.base import ApiModel
 from language_models.helpers.dangerous_code_detector import DangerousCodeDetector
+from language_models.helpers.output_capture import (
+    OutputCallback,
+    OutputCapture,
+    summarize_output,
+)
+from language_models.helpers.python_worker_pool import (
+    PythonWorkerPool,
+    get_code_environment,
+)
 from language_models.model_message import MessageMetadata, ModelMessage, Role
 from language_models.model_state import ModelState
 from language_models.tools.base_tool import BaseTool
 import tempfile
 import os
 
+EXECUTION_TIMEOUT = 20
+
 
 class CodeInterpreterTool(BaseTool):
+    worker_pool: Optional[PythonWorkerPool] = None
+    worker_pool_lock = threading.Lock()
+
     def __init__(self):
         super().__init__(
             name="code_interpreter",
@@ -49,7 +67,9 @@ class CodeInterpreterTool(BaseTool):
                     ):
                         return "User denied permission to run code_interpreter."
 
-                result, result_code = self.execute_python_code(code)
+                result, result_code = self.execute_python_code_cached(
+                    code, metadata.output_callback
+                )
                 if result_code == 0:
                     return result
                 else:
@@ -64,7 +84,7 @@ class CodeInterpreterTool(BaseTool):
         self,
         arguments: Dict[str, Any],
         model: ApiModel,
-        messages: List[ModelMessage],
+        messages: Sequence[ModelMessage],
         metadata: MessageMetadata,
     ) -> str:
         coding_conversation = messages + [
@@ -92,7 +112,13 @@ class CodeInterpreterTool(BaseTool):
 
         model_manager = ModelState.get_instance().get_model_manager()
 
+        side_model = None
         if code_generator_model and model_manager:
+            side_model = model_manager.get_side_model("CODE_GENERATOR")
+
+        if side_model:
+            model = side_model
+        elif code_generator_model and model_manager:
             model_manager.change_model(code_generator_model, code_generator_gpu_layers)
             model = model_manager.active_models[0]
 
@@ -102,7 +128,7 @@ class CodeInterpreterTool(BaseTool):
         except:
             pass
 
-        if code_generator_model and model_manager:
+        if code_generator_model and model_manager and not side_model:
             model_manager.change_model(original_model.model_path)
 
         if result:
@@ -110,39 +136,171 @@ class CodeInterpreterTool(BaseTool):
 
         return "No code to execute."
 
-    def execute_python_code(self, code: str) -> Tuple[str, int]:
+    def execute_python_code_cached(
+        self, code: str, output_callback: Optional[OutputCallback] = None
+    ) -> Tuple[str, int]:
+        """
+        Executes the code, reusing the output of an earlier run of identical code
+        when the code is pure (no potentially dangerous calls and no sources of
+        randomness or time).
         """
-        Executes the given Python code in a temporary file and captures the output.
-        If the execution takes longer than 20 seconds, it is aborted.
+        if not self.is_pure_code(code):
+            return self.execute_python_code(code, output_callback)
+
+        cache_key = f"{self.name}:{hashlib.sha256(code.encode('utf-8')).hexdigest()}"
+
+        cached_result = BaseTool.result_cache.get(cache_key)
+        if cached_result is not None:
+            print("CACHED RESULT for code_interpreter")
+            return cached_result, 0
+
+        result, result_code = self.execute_python_code(code, output_callback)
+
+        if result_code == 0:
+            BaseTool.result_cache.set(cache_key, result)
+
+        return result, result_code
+
+    def is_pure_code(self, code: str) -> bool:
+        if re.search(r"\b(random|datetime)\b", code):
+            return False
+        return not self.dangerous_code_detector.detect_potentially_dangerous_code(code)
+
+    @classmethod
+    def get_worker_pool(cls) -> Optional[PythonWorkerPool]:
+        """Returns the shared worker pool, or None if it is disabled through
+        CODE_INTERPRETER.USE_WORKER_POOL=false."""
+        if os.getenv("CODE_INTERPRETER.USE_WORKER_POOL", "true").lower() != "true":
+            return None
+
+        with cls.worker_pool_lock:
+            if cls.worker_pool is None:
+                cls.worker_pool = PythonWorkerPool(
+                    size=int(os.getenv("CODE_INTERPRETER.WORKER_POOL_SIZE", 2)),
+                    max_runs_per_worker=int(
+                        os.getenv("CODE_INTERPRETER.WORKER_MAX_RUNS", 20)
+                    ),
+                )
+                atexit.register(cls.worker_pool.shutdown)
+
+        return cls.worker_pool
+
+    def execute_python_code(
+        self, code: str, output_callback: Optional[OutputCallback] = None
+    ) -> Tuple[str, int]:
+        """
+        Executes the given Python code and captures the output, in a worker of the
+        shared worker pool if it is enabled and otherwise in a new process.
+        If the execution takes longer than 20 seconds or writes more than
+        CODE_INTERPRETER.MAX_OUTPUT_BYTES, it is aborted. Output longer than
+        CODE_INTERPRETER.MAX_OUTPUT_CHARACTERS is shortened to its head and tail
+        before it is passed to the model.
 
         Args:
             code (str): The Python code to execute.
+            output_callback (OutputCallback, optional): Receives the output in
+                chunks while the code runs.
 
         Returns:
             str: The output of the executed code or an error message.
             int: The result code, 0 for success, -1 for failure or timeout.
         """
+        max_output_bytes = int(os.getenv("CODE_INTERPRETER.MAX_OUTPUT_BYTES", 100_000))
+        max_output_characters = int(
+            os.getenv("CODE_INTERPRETER.MAX_OUTPUT_CHARACTERS", 4000)
+        )
+
+        worker_pool = self.get_worker_pool()
+
+        try:
+            if worker_pool:
+                stdout, stderr, return_code = worker_pool.execute(
+                    code,
+                    timeout=EXECUTION_TIMEOUT,
+                    max_output_bytes=max_output_bytes,
+                    output_callback=output_callback,
+                )
+            else:
+                stdout, stderr, return_code = self.execute_python_code_in_subprocess(
+                    code, max_output_bytes, output_callback
+                )
+        except TimeoutError:
+            return (
+                f"Error executing code: Execution time exceeded {EXECUTION_TIMEOUT} seconds.",
+                -1,
+            )
+
+        if return_code != 0:
+            return (
+                f"Error executing code: {summarize_output(stderr, max_output_characters)}",
+                -1,
+            )
+
+        return (
+            f'When answering the user, pretend that you have executed Python code and received the following output: "{summarize_output(stdout, max_output_characters)}"',
+            0,
+        )
+
+    def execute_python_code_in_subprocess(
+        self,
+        code: str,
+        max_output_bytes: int,
+        output_callback: Optional[OutputCallback] = None,
+    ) -> Tuple[str, str, int]:
+        """
+        Executes the code in a new process, reading its output while it runs.
+
+        Raises:
+            TimeoutError: If the execution takes longer than EXECUTION_TIMEOUT.
+        """
         with tempfile.NamedTemporaryFile(suffix=".py", delete=False) as tmp_file:
             tmp_file_name = tmp_file.name
             tmp_file.write(code.encode("utf-8"))
             tmp_file.flush()
 
+        environment = get_code_environment()
+
         try:
-            output = subprocess.run(
+            process = subprocess.Popen(
                 [sys.executable, tmp_file_name],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=20,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=environment,
             )
-            return (
-                f'When answering the user, pretend that you have executed Python code and received the following output: "{output.stdout}"',
-                0,
+            stopped_at_limit = threading.Event()
+
+            def stop() -> None:
+                stopped_at_limit.set()
+                process.kill()
+
+            stdout = OutputCapture(
+                process.stdout, "stdout", max_output_bytes, output_callback, stop  # type: ignore
+            )
+            stderr = OutputCapture(
+                process.stderr, "stderr", max_output_bytes, output_callback, stop  # type: ignore
             )
-        except subprocess.TimeoutExpired:
-            return "Error executing code: Execution time exceeded 20 seconds.", -1
-        except subprocess.CalledProcessError as e:
-            return f"Error executing code: {e.stderr}", -1
+
+            try:
+                return_code = process.wait(timeout=EXECUTION_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                raise TimeoutError(
+                    f"Execution time exceeded {EXECUTION_TIMEOUT} seconds."
+                )
+            finally:
+                stdout.join(5)
+                stderr.join(5)
+
+            if stopped_at_limit.is_set():
+                return (
+                    stdout.getvalue(),
+                    stderr.getvalue()
+                    + f"OutputLimitExceeded: The code was stopped after writing more than {max_output_bytes} bytes of output.\n",
+                    1,
+                )
+
+            return stdout.getvalue(), stderr.getvalue(), return_code
         finally:
             os.remove(tmp_file_name)
 
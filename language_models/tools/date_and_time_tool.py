@@ -1,5 +1,5 @@
 import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Sequence
 from language_models.api.base import ApiModel
 
 from language_models.model_message import MessageMetadata, ModelMessage
@@ -12,13 +12,15 @@ class DateAndTimeTool(BaseTool):
             "get_date_and_time",
             "retrieve the current date and time",
             [],
+            run_concurrently=True,
+            timeout=5,
         )
 
     def action(
         self,
         arguments: Dict[str, Any],
         model: ApiModel,
-        messages: List[ModelMessage],
+        messages: Sequence[ModelMessage],
         metadata: MessageMetadata,
     ) -> str:
         return (
@@ -1,6 +1,6 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Sequence
 from language_models.api.base import ApiModel
-from language_models.helpers.tool_helper import load_available_tools
+from language_models.helpers.tool_helper import ToolRegistry
 
 from language_models.model_message import MessageMetadata, ModelMessage
 from language_models.tools.base_tool import BaseTool
@@ -14,28 +14,26 @@ class ListerTool(BaseTool):
             [],
         )
 
-        self.tools = load_available_tools(self.__class__.__name__)
-        self.tools.append(self)
-        self.tools = sorted(self.tools, key=lambda tool: tool.name)
-
     def action(
         self,
         arguments: Dict[str, Any],
         model: ApiModel,
-        messages: List[ModelMessage],
+        messages: Sequence[ModelMessage],
         metadata: MessageMetadata,
     ) -> str:
+        tools = sorted(ToolRegistry.get_tools(), key=lambda tool: tool.name)
+
         allowed_tools = metadata.allowed_tools
         if allowed_tools is not None:
             filtered_tools = [
                 tool
-                for tool in self.tools
+                for tool in tools
                 if tool.name in allowed_tools
                 or tool.name == "nothing"
                 or tool.name == "get_available_tools"
             ]
         else:
-            filtered_tools = self.tools
+            filtered_tools = tools
         return "The following tools are available:\n" + "\n".join(
             [f"{tool.name} - {tool.description}" for tool in filtered_tools]
         )
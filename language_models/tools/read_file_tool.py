@@ -1,6 +1,8 @@
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from language_models.api.base import ApiModel
+from language_models.helpers.content_extractor import CHARACTERS_PER_TOKEN
+from language_models.helpers.file_reader import read_file_excerpt
 from language_models.model_message import MessageMetadata, ModelMessage
 from language_models.tools.base_tool import BaseTool
 
@@ -14,9 +16,19 @@ class ReadFileTool(BaseTool):
                 (
                     "FILEINDEX",
                     "(MANDATORY) specifies the index (from 1) of the file to read, only one file is allowed",
-                )
+                ),
+                (
+                    "START_LINE",
+                    "(OPTIONAL) the first line (from 1) to read, use it to read a part of a large file",
+                ),
+                (
+                    "END_LINE",
+                    "(OPTIONAL) the last line to read, use it to read a part of a large file",
+                ),
             ],
             True,
+            run_concurrently=True,
+            timeout=10,
         )
 
     def ask_permission_message(
@@ -29,11 +41,24 @@ class ReadFileTool(BaseTool):
         else:
             return ""
 
+    def get_cache_key(
+        self, arguments: Dict[str, Any], metadata: MessageMetadata
+    ) -> Optional[str]:
+        fpath = self._get_file_argument(arguments, metadata)
+
+        if not fpath or not os.path.isfile(fpath):
+            return None
+
+        # The modification time and size invalidate the entry when the file changes
+        stat = os.stat(fpath)
+        start_line, end_line = self._get_line_range_arguments(arguments)
+        return f"{os.path.abspath(fpath)}:{stat.st_mtime_ns}:{stat.st_size}:{start_line}:{end_line}"
+
     def action(
         self,
         arguments: Dict[str, Any],
         model: ApiModel,
-        messages: List[ModelMessage],
+        messages: Sequence[ModelMessage],
         metadata: MessageMetadata,
     ) -> str:
         fpath = self._get_file_argument(arguments, metadata)
@@ -41,8 +66,26 @@ class ReadFileTool(BaseTool):
         if fpath:
             print(f"READ FILE with filepath {fpath}!")
             if os.path.isfile(fpath):
-                with open(fpath, "r", encoding="utf8") as f:
-                    return f"FILE CONTENT OF {fpath}:\n{f.read()}"
+                start_line, end_line = self._get_line_range_arguments(arguments)
+                token_budget = int(os.getenv("READ_FILE.TOKEN_BUDGET", 2000))
+
+                excerpt = read_file_excerpt(
+                    fpath, token_budget * CHARACTERS_PER_TOKEN, start_line, end_line
+                )
+
+                if excerpt.binary:
+                    return f"FILE {fpath} IS BINARY AND CAN'T BE READ: {excerpt.text}"
+
+                if excerpt.first_line > excerpt.total_lines:
+                    return f"FILE {fpath} HAS ONLY {excerpt.total_lines} LINES, START_LINE {excerpt.first_line} IS PAST THE END OF THE FILE."
+
+                if excerpt.first_line > excerpt.last_line:
+                    return f"END_LINE {excerpt.last_line} IS BEFORE START_LINE {excerpt.first_line}, NOTHING WAS READ FROM {fpath}."
+
+                if start_line or end_line or excerpt.truncated:
+                    return f"FILE CONTENT OF {fpath} (LINES {excerpt.first_line}-{excerpt.last_line} OF {excerpt.total_lines}):\n{excerpt.text}"
+
+                return f"FILE CONTENT OF {fpath}:\n{excerpt.text}"
             else:
                 print("FILE WAS NOT FOUND!")
         else:
@@ -67,6 +110,17 @@ class ReadFileTool(BaseTool):
 
         return ""
 
+    def _get_line_range_arguments(
+        self, arguments: Dict[str, Any]
+    ) -> Tuple[Optional[int], Optional[int]]:
+        line_range: List[Optional[int]] = []
+        for name in ("START_LINE", "END_LINE"):
+            try:
+                line_range.append(int(str(arguments[name]).replace('"', "")))
+            except (KeyError, ValueError):
+                line_range.append(None)
+        return line_range[0], line_range[1]
+
     def get_example_messages(self) -> List[ModelMessage]:
         return self.get_example_dialogue(
             "Read the content of the selected file for me please.",
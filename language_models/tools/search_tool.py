@@ -1,13 +1,26 @@
-from typing import Any, Dict, List
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence
 
-from duckduckgo_search import DDGS  # type: ignore
 from language_models.api.base import ApiModel  # type: ignore
+from language_models.helpers.content_extractor import (
+    CHARACTERS_PER_TOKEN,
+    PASSAGE_SEPARATOR,
+    select_relevant_passages,
+)
+from language_models.helpers.search_backends import (
+    SearchBackend,
+    SearchResult,
+    create_search_backend,
+    normalize_query,
+)
+from language_models.helpers.web_fetcher import WebFetcher
 from language_models.model_message import MessageMetadata, ModelMessage
 from language_models.tools.base_tool import BaseTool
 
 
 class SearchTool(BaseTool):
-    def __init__(self):
+    def __init__(self, search_backend: Optional[SearchBackend] = None):
         super().__init__(
             "search_the_web",
             "search the web for a specific query",
@@ -18,33 +31,84 @@ class SearchTool(BaseTool):
                 )
             ],
             True,
+            run_concurrently=True,
+            timeout=30,
+            cache_ttl=600,
         )
 
+        # Created on first use, so that loading the tool doesn't connect anywhere
+        self.search_backend = search_backend
+        self.search_backend_lock = threading.Lock()
+
     def action(
         self,
         arguments: Dict[str, Any],
         model: ApiModel,
-        messages: List[ModelMessage],
+        messages: Sequence[ModelMessage],
         metadata: MessageMetadata,
     ) -> str:
         search_query = self.get_search_query_argument(arguments)
 
         if search_query:
+            results = self.get_search_backend().search(search_query, max_results=5)
+
+            contents = self.fetch_result_contents(search_query, results)
 
-            with DDGS() as search_engine:
-                results = ["SEARCH RESULTS FOR QUERY: " + search_query + "\n\n"]
-                for r in search_engine.text(search_query, max_results=5):  # type: ignore
-                    results.append(
-                        f"<ENTRY><TITLE>{r['title']}</TITLE>\n<URL>{r['href']}</URL>\n<DESCRIPTION>{r['body']}</DESCRIPTION></ENTRY>\n"
-                    )
+            entries = ["SEARCH RESULTS FOR QUERY: " + search_query + "\n\n"]
+            for result, content in zip(results, contents):
+                entry = f"<ENTRY><TITLE>{result.title}</TITLE>\n<URL>{result.url}</URL>\n<DESCRIPTION>{result.snippet}</DESCRIPTION>"
+                if content:
+                    entry += f"\n<CONTENT>{content}</CONTENT>"
+                entries.append(entry + "</ENTRY>\n")
 
-                return "\n".join(results)
+            return "\n".join(entries)
 
         else:
             print("TRIED TO SEARCH WITHOUT QUERY ARGUMENTS")
 
         return ""
 
+    def fetch_result_contents(
+        self, search_query: str, results: List[SearchResult]
+    ) -> List[str]:
+        """
+        Downloads the pages of the top SEARCH.FETCH_RESULTS results concurrently
+        and keeps the passages that are most relevant to the query, within
+        SEARCH.CONTENT_TOKEN_BUDGET tokens for all pages together.
+        """
+        fetch_count = int(os.getenv("SEARCH.FETCH_RESULTS", 3))
+        token_budget = int(os.getenv("SEARCH.CONTENT_TOKEN_BUDGET", 1500))
+
+        contents = [""] * len(results)
+
+        if fetch_count <= 0 or not results:
+            return contents
+
+        pages = WebFetcher.get_instance().fetch_many(
+            [result.url for result in results[:fetch_count]]
+        )
+        page_contents = [page.get_content() if page else "" for page in pages]
+
+        passages = select_relevant_passages(
+            page_contents, search_query, token_budget * CHARACTERS_PER_TOKEN
+        )
+
+        for i, page_passages in enumerate(passages):
+            contents[i] = PASSAGE_SEPARATOR.join(page_passages)
+
+        return contents
+
+    def get_search_backend(self) -> SearchBackend:
+        with self.search_backend_lock:
+            if self.search_backend is None:
+                self.search_backend = create_search_backend()
+            return self.search_backend
+
+    def get_cache_key(
+        self, arguments: Dict[str, Any], metadata: MessageMetadata
+    ) -> Optional[str]:
+        return normalize_query(self.get_search_query_argument(arguments)) or None
+
     def ask_permission_message(
         self, arguments: Dict[str, Any], metadata: MessageMetadata
     ) -> str:
@@ -1,28 +1,39 @@
 import datetime
+import json
 import os
+import queue
 import sys
 import shutil
+import threading
 import traceback
 import struct
-from typing import Dict, List, Optional
-from flask import Flask, Response, jsonify, request, send_file  # type: ignore
+from typing import Any, Dict, List, Optional
+from flask import Flask, Response, g, jsonify, request, send_file  # type: ignore
 import uuid
 import hashlib
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 from faster_whisper import WhisperModel  # type: ignore
 
+from language_models.api.base import ApiModel
+from language_models.helpers.batch_generation import generate_batch
+from language_models.helpers.generation_cache import GenerationCache
+from language_models.helpers.suggestion_queue import SuggestionQueue
+from language_models.helpers.tool_helper import ToolRegistry
+from language_models.helpers.trace_recorder import REPLAY_HEADER, TraceRecorder
+from language_models.conversation_store import ConversationStore
 from language_models.memory_manager import MemoryManager
-from language_models.tool_manager import ToolManager
 
 from language_models.model_conversation import ModelConversation
-from language_models.model_manager import ModelManager
-from language_models.model_message import MessageMetadata
+from language_models.model_manager import MockModelManager, ModelManager
+from language_models.model_message import MessageMetadata, ModelMessage
 from language_models.audio.text_to_speech_engine import TextToSpeechEngine
 
 from language_models.model_state import ModelState
 
 from dotenv import load_dotenv
 
+from language_models.tools.base_tool import BaseTool
 from language_models.tools.code_interpreter_tool import CodeInterpreterTool
 
 if not os.path.exists(".env"):
@@ -32,7 +43,27 @@ load_dotenv()
 
 app = Flask(__name__)
 
-conversations: Dict[str, ModelConversation] = {}
+conversations = ConversationStore()
+
+suggestion_queue = SuggestionQueue()
+
+
+def acquire_conversation(conversation_id: str) -> ModelConversation:
+    """Returns the conversation, which stays in memory until the request ends."""
+    conversation = conversations.acquire(conversation_id)
+
+    if conversation is None:
+        raise ValueError(f"Conversation with id {conversation_id} not found.")
+
+    g.setdefault("conversation_ids", []).append(conversation_id)
+    return conversation
+
+
+@app.teardown_request
+def release_conversations(_) -> None:
+    for conversation_id in g.pop("conversation_ids", []):
+        conversations.release(conversation_id)
+
 
 text_to_speech_engine: Optional[TextToSpeechEngine] = None
 
@@ -69,15 +100,14 @@ def add_system_message() -> Response:
         if not conversation_id or not message:
             raise ValueError("Missing conversation_id or message in the request.")
 
-        if conversation_id not in conversations:
-            raise ValueError(f"Conversation with id {conversation_id} not found.")
+        conversation = acquire_conversation(conversation_id)
 
         timestamp = datetime.datetime.now()
         selected_files = data.get("selected_files")
 
         metadata = MessageMetadata(timestamp, selected_files)
 
-        conversations[conversation_id].add_system_message(message, metadata)
+        conversation.add_system_message(message, metadata)
 
         return jsonify({"result": True})
 
@@ -96,15 +126,14 @@ def add_user_message() -> Response:
         if not conversation_id or not message:
             raise ValueError("Missing conversation_id or message in the request.")
 
-        if conversation_id not in conversations:
-            raise ValueError(f"Conversation with id {conversation_id} not found.")
+        conversation = acquire_conversation(conversation_id)
 
         timestamp = datetime.datetime.now()
         selected_files = data.get("selected_files")
 
         metadata = MessageMetadata(timestamp, selected_files)
 
-        conversations[conversation_id].add_user_message(message, metadata)
+        conversation.add_user_message(message, metadata)
 
         return jsonify({"result": True})
 
@@ -123,15 +152,14 @@ def add_assistant_message() -> Response:
         if not conversation_id or not message:
             raise ValueError("Missing conversation_id or message in the request.")
 
-        if conversation_id not in conversations:
-            raise ValueError(f"Conversation with id {conversation_id} not found.")
+        conversation = acquire_conversation(conversation_id)
 
         timestamp = datetime.datetime.now()
         selected_files = data.get("selected_files")
 
         metadata = MessageMetadata(timestamp, selected_files)
 
-        conversations[conversation_id].add_assistant_message(message, metadata)
+        conversation.add_assistant_message(message, metadata)
 
         return jsonify({"result": True})
 
@@ -148,12 +176,11 @@ def get_conversation() -> Response:
         if not conversation_id:
             raise ValueError("Missing conversation_id parameter in the request.")
 
-        if conversation_id not in conversations:
-            raise ValueError(f"Conversation with id {conversation_id} not found.")
+        conversation = acquire_conversation(conversation_id)
 
         conversation_data: List[Dict[str, str]] = [
             {"role": message.get_role(), "message": message.get_content()}
-            for message in conversations[conversation_id].get_messages()
+            for message in conversation.get_messages()
         ]
 
         return jsonify({"result": True, "conversation": conversation_data})
@@ -171,10 +198,9 @@ def get_model_info() -> Response:
         if not conversation_id:
             raise ValueError("Missing conversation_id parameter in the request.")
 
-        if conversation_id not in conversations:
-            raise ValueError(f"Conversation with id {conversation_id} not found.")
+        conversation = acquire_conversation(conversation_id)
 
-        model_path = conversations[conversation_id].get_model_path()
+        model_path = conversation.get_model_path()
 
         return jsonify({"result": True, "info": {"path": model_path}})
 
@@ -193,8 +219,7 @@ def change_model() -> Response:
         if not conversation_id:
             raise ValueError("Missing conversation_id parameter in the request.")
 
-        if conversation_id not in conversations:
-            raise ValueError(f"Conversation with id {conversation_id} not found.")
+        conversation = acquire_conversation(conversation_id)
 
         if not model_name:
             raise ValueError("Missing model_name in the request.")
@@ -209,7 +234,6 @@ def change_model() -> Response:
             if model_name not in available_models:
                 raise ValueError(f"Model {model_name} not found.")
 
-            conversation = conversations[conversation_id]
             conversation.set_model_path(model_name)
         return jsonify({"result": True})
     except Exception as e:
@@ -252,6 +276,16 @@ def generate_response() -> Response:
         clipboard_content = data.get("clipboard_content")
         allowed_tools = data.get("allowed_tools", None)
         response_prefix = data.get("response_prefix", "")
+        # Reading the selected files into the prompt needs the same permission as
+        # the read file tool, so it must be requested explicitly when the user
+        # wants to be asked before tools run
+        include_selected_files = data.get(
+            "include_selected_files", not ask_permission_to_run_tools
+        )
+        overlap_stages = data.get(
+            "overlap_stages",
+            os.getenv("SERVER.OVERLAP_STAGES", "false").lower() == "true",
+        )
 
         timestamp = datetime.datetime.now()
         selected_files = data.get("selected_files")
@@ -267,10 +301,173 @@ def generate_response() -> Response:
         if not conversation_id or not user_message:
             raise ValueError("Missing conversation_id or message in the request.")
 
-        if conversation_id not in conversations:
-            raise ValueError(f"Conversation with id {conversation_id} not found.")
+        conversation = acquire_conversation(conversation_id)
+
+        conversation.add_user_message(user_message, metadata)
+
+        with ModelState.get_lock():
+            model_manager = ModelState.get_model_manager()
+
+            if not model_manager:
+                raise ValueError("No model manager found.")
+
+            recorder = TraceRecorder.get_instance()
+            trace = None
+            if recorder:
+                trace = recorder.start_trace(
+                    "/generate_response", data, request.headers.get(REPLAY_HEADER)
+                )
+
+            result = {}
+            try:
+                model_path = conversation.get_model_path()
+                model_manager.change_model(model_path)
+
+                response = conversation.generate_message(
+                    model_manager.active_models[0],
+                    max_tokens,
+                    single_message_mode,
+                    use_metadata=True,
+                    use_tools=use_tools,
+                    use_reflections=use_reflections,
+                    use_knowledge=use_knowledge,
+                    ask_permission_to_run_tools=ask_permission_to_run_tools,
+                    response_prefix=response_prefix,
+                    overlap_stages=overlap_stages,
+                    selected_files_token_budget=(
+                        int(
+                            model_manager.context_window
+                            * float(os.getenv("CONTEXT.SELECTED_FILES_SHARE", 0.25))
+                        )
+                        if include_selected_files
+                        else 0
+                    ),
+                    context_window=model_manager.context_window,
+                )
+
+                result = {"result": True, "response": response}
+
+                if use_suggestions:
+                    # Generated after the response is returned, see /get_suggestions
+                    result["suggestions_turn"] = queue_suggestions(
+                        conversation_id, conversation, model_manager
+                    )
+
+                if conversation.last_usage:
+                    result["usage"] = conversation.last_usage
+            finally:
+                if recorder and trace:
+                    recorder.finish_trace(trace, result)
+
+            if trace and "replay_of" in trace:
+                # Lets the replayer report latencies per stage
+                result["stages"] = [
+                    event for event in trace["events"] if event["type"] == "stage"
+                ]
+
+            return jsonify(result)
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"result": False, "error": str(e)})
+
+
+def queue_suggestions(
+    conversation_id: str,
+    conversation: ModelConversation,
+    model_manager: ModelManager,
+) -> int:
+    """
+    Queues the suggestions for the current turn of the conversation. Called with
+    the model lock held, the suggestions are generated once it is released: on a
+    spare slot of the model without the lock, or with the lock if the model only
+    has a single slot.
+
+    Returns:
+        The turn of the suggestions, the version of the conversation.
+    """
+    turn = conversation.version
+    messages = list(conversation.get_messages())
+    model = model_manager.active_models[0]
+    use_spare_slot = model_manager.parallel_slots > 1
+
+    def generate() -> List[str]:
+        if use_spare_slot:
+            return generate_suggestions(conversation, model, messages)
+
+        with ModelState.get_lock():
+            if model not in model_manager.active_models:
+                # Another request changed the model meanwhile
+                return []
+            return generate_suggestions(conversation, model, messages)
+
+    suggestion_queue.submit(conversation_id, turn, generate)
+    return turn
+
+
+def generate_suggestions(
+    conversation: ModelConversation,
+    model: ApiModel,
+    messages: List[ModelMessage],
+) -> List[str]:
+    for _ in range(2):
+        try:
+            return conversation.generate_suggestions(model, messages)
+        except Exception as e:
+            print(e)
+
+    return []
+
+
+@app.route("/get_suggestions", methods=["GET"])
+def get_suggestions() -> Response:
+    """Returns the suggestions of the latest turn of the conversation (or of the
+    turn parameter), waiting up to timeout seconds for them to be generated."""
+    try:
+        conversation_id = request.args.get("conversation_id")
+        turn = request.args.get("turn", type=int)
+        timeout = request.args.get("timeout", 0, type=float)
+
+        if not conversation_id:
+            raise ValueError("Missing conversation_id parameter in the request.")
+
+        entry = suggestion_queue.get(conversation_id, turn)
+        if entry is None:
+            raise ValueError("No suggestions were requested for the conversation turn.")
+
+        suggestions_turn, suggestions = entry
+        try:
+            result = suggestions.result(timeout=timeout)
+        except FutureTimeoutError:
+            return jsonify({"result": True, "ready": False, "turn": suggestions_turn})
+
+        return jsonify(
+            {
+                "result": True,
+                "ready": True,
+                "turn": suggestions_turn,
+                "suggestions": result,
+            }
+        )
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"result": False, "error_message": str(e)})
+
+
+@app.route("/generate_batch", methods=["POST"])
+def generate_batch_response() -> Response:
+    """Generates responses to independent prompts without conversations, spread
+    over the parallel slots of llama.cpp (MODEL.PARALLEL_SLOTS)."""
+    try:
+        data = request.get_json()
+        prompts = data.get("prompts")
+        max_tokens = data.get("max_tokens", 200)
+        temperature = data.get("temperature", 0.2)
+        model_path = data.get("model")
 
-        conversations[conversation_id].add_user_message(user_message, metadata)
+        if not isinstance(prompts, list):
+            raise ValueError("Missing prompts in the request.")
 
         with ModelState.get_lock():
             model_manager = ModelState.get_model_manager()
@@ -278,42 +475,25 @@ def generate_response() -> Response:
             if not model_manager:
                 raise ValueError("No model manager found.")
 
-            model_path = conversations[conversation_id].get_model_path()
-            model_manager.change_model(model_path)
+            if model_path:
+                model_manager.change_model(model_path)
+
+            if not model_manager.active_models:
+                raise ValueError("No model is loaded.")
 
-            response = conversations[conversation_id].generate_message(
+            results = generate_batch(
                 model_manager.active_models[0],
+                prompts,
                 max_tokens,
-                single_message_mode,
-                use_metadata=True,
-                use_tools=use_tools,
-                use_reflections=use_reflections,
-                use_knowledge=use_knowledge,
-                ask_permission_to_run_tools=ask_permission_to_run_tools,
-                response_prefix=response_prefix,
+                temperature,
+                model_manager.parallel_slots,
             )
 
-            if use_suggestions:
-                suggestions = []
-                for _ in range(2):
-                    try:
-                        suggestions = conversations[
-                            conversation_id
-                        ].generate_suggestions(model_manager.active_models[0])
-                        break
-                    except Exception as e:
-                        print(e)
-                        suggestions = []
-
-                return jsonify(
-                    {"result": True, "response": response, "suggestions": suggestions}
-                )
-            else:
-                return jsonify({"result": True, "response": response})
+        return jsonify({"result": True, "results": results})
 
     except Exception as e:
         traceback.print_exc()
-        return jsonify({"result": False, "error": str(e)})
+        return jsonify({"result": False, "error_message": str(e)})
 
 
 @app.route("/tts", methods=["POST"])
@@ -407,42 +587,107 @@ def code_interpreter() -> Response:
         conversation_id = data.get("conversation_id")
         user_message = data.get("message")
         ask_permission_to_run_tools = data.get("ask_permission_to_run_tools")
+        stream = data.get("stream", False)
 
         if not conversation_id or not user_message:
             raise ValueError("Missing conversation_id or message in the request.")
 
-        if conversation_id not in conversations:
-            raise ValueError(f"Conversation with id {conversation_id} not found.")
+        conversation = acquire_conversation(conversation_id)
+
+        code_interpreter = ToolRegistry.get_tool("code_interpreter")
+
+        if not isinstance(code_interpreter, CodeInterpreterTool):
+            return jsonify({"result": True, "response": ""})
 
-        code_interpreter: Optional[CodeInterpreterTool] = ToolManager().get_target_tool(
-            {"tool": "code_interpreter"}
+        metadata = MessageMetadata(
+            datetime.datetime.now(), [], ask_permission_to_run_tools, ""
         )
 
-        response: str = ""
+        if not stream:
+            response = run_code_interpreter(code_interpreter, conversation, metadata)
+            return jsonify({"result": True, "response": response})
+
+        # Streams the output of the code as JSON lines while it runs, followed by
+        # a line with the final response
+        output_queue: queue.Queue[Optional[Dict[str, Any]]] = queue.Queue()
 
-        if code_interpreter:
-            metadata = MessageMetadata(
-                datetime.datetime.now(), [], ask_permission_to_run_tools, ""
+        metadata.set_output_callback(
+            lambda stream_name, text: output_queue.put(
+                {"stream": stream_name, "output": text}
             )
+        )
 
-            with ModelState.get_lock():
-                model_manager = ModelState.get_model_manager()
+        # Kept in memory until the thread is done, which outlives the request
+        conversations.acquire(conversation_id)
 
-                if not model_manager:
-                    raise ValueError("No model manager found.")
+        def run() -> None:
+            try:
+                response = run_code_interpreter(
+                    code_interpreter, conversation, metadata
+                )
+                output_queue.put({"result": True, "response": response})
+            except Exception as e:
+                traceback.print_exc()
+                output_queue.put({"result": False, "error_message": str(e)})
+            finally:
+                conversations.release(conversation_id)
+                output_queue.put(None)
 
-                model_path = conversations[conversation_id].get_model_path()
-                model_manager.change_model(model_path)
+        threading.Thread(target=run, daemon=True).start()
 
-                response = code_interpreter.action(
-                    {},
-                    model_manager.active_models[0],
-                    conversations[conversation_id].get_messages(),
-                    metadata,
-                )
-                print(response)  # type: ignore
+        def generate():
+            while True:
+                line = output_queue.get()
+                if line is None:
+                    break
+                yield json.dumps(line) + "\n"
 
-        return jsonify({"result": True, "response": response})
+        return Response(generate(), mimetype="application/x-ndjson")
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"result": False, "error_message": str(e)})
+
+
+def run_code_interpreter(
+    code_interpreter: CodeInterpreterTool,
+    conversation: ModelConversation,
+    metadata: MessageMetadata,
+) -> str:
+    with ModelState.get_lock():
+        model_manager = ModelState.get_model_manager()
+
+        if not model_manager:
+            raise ValueError("No model manager found.")
+
+        model_path = conversation.get_model_path()
+        model_manager.change_model(model_path)
+
+        response = code_interpreter.action(
+            {},
+            model_manager.active_models[0],
+            conversation.get_messages(),
+            metadata,
+        )
+        print(response)  # type: ignore
+
+    return response
+
+
+@app.route("/get_tool_cache_stats", methods=["GET"])
+def get_tool_cache_stats() -> Response:
+    try:
+        return jsonify({"result": True, "stats": BaseTool.result_cache.get_stats()})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"result": False, "error_message": str(e)})
+
+
+@app.route("/get_generation_cache_stats", methods=["GET"])
+def get_generation_cache_stats() -> Response:
+    try:
+        return jsonify(
+            {"result": True, "stats": GenerationCache.get_instance().get_stats()}
+        )
     except Exception as e:
         traceback.print_exc()
         return jsonify({"result": False, "error_message": str(e)})
@@ -476,13 +721,20 @@ def _get_model_manager(llama_cpp_path: str, mock_llama: bool = False):
         return model_manager
 
 
-mock_llama = False
+# Serves a mock model instead of llama.cpp, e.g. to replay recorded traces
+mock_llama = os.getenv("SERVER.MOCK_MODEL", "false").lower() == "true"
 
 if __name__ == "__main__":
+    import atexit
+
     # load_model_manager(mock_llama)
 
     if mock_llama:
         print("WARNING: Mock Mode")
+        ModelState.initialize(MockModelManager())
+
+        with ModelState.get_lock():
+            ModelState.get_model_manager().load_model()  # type: ignore
     else:
         llama_cpp_path = os.getenv("LLAMA_CPP_PATH", "bin")
         model_manager = _get_model_manager(llama_cpp_path, mock_llama)
@@ -496,9 +748,13 @@ if __name__ == "__main__":
         with ModelState.get_lock():
             model_manager.load_model()
 
-        import atexit
+        # Import and construct the tools once before the first conversation starts
+        ToolRegistry.get_tools()
 
         # Increase the likelihood that the model manager is cleaned up properly
         atexit.register(model_manager.__del__)
 
+    # Saves the conversations that haven't been written yet
+    atexit.register(conversations.close)
+
     app.run(host="0.0.0.0", debug=False, port=17173)
@@ -0,0 +1,72 @@
+import datetime
+import unittest
+
+from language_models.formatters.base import PromptFormatter
+from language_models.formatters.llama3 import Llama3Formatter
+from language_models.model_message import MessageMetadata, ModelMessage, Role
+
+
+class CountingFormatter(PromptFormatter):
+    def __init__(self):
+        super().__init__()
+        self.formatted_count = 0
+
+    def format_message(self, message: ModelMessage, use_metadata: bool = False) -> str:
+        self.formatted_count += 1
+        return super().format_message(message, use_metadata)
+
+
+def create_messages(count: int):
+    return [
+        ModelMessage(
+            Role.USER if i % 2 == 0 else Role.ASSISTANT,
+            f"message {i}",
+            MessageMetadata(datetime.datetime.now(), []),
+        )
+        for i in range(count)
+    ]
+
+
+class TestPromptFormatter(unittest.TestCase):
+    def test_only_new_messages_are_formatted(self):
+        formatter = CountingFormatter()
+        messages = create_messages(10)
+
+        first_prompt = formatter.generate_prompt(messages)
+        messages += create_messages(2)
+        formatter.generate_prompt(messages)
+
+        self.assertEqual(formatter.formatted_count, 12)
+        self.assertEqual(formatter.generate_prompt(messages[:10]), first_prompt)
+        self.assertEqual(formatter.formatted_count, 12)
+
+    def test_changed_messages_are_formatted_again(self):
+        formatter = CountingFormatter()
+        messages = create_messages(2)
+        formatter.generate_prompt(messages, use_metadata=True)
+
+        messages[0].get_metadata().set_tool_output("The time is 12:00.")
+        messages[1].append_content("More content.")
+        prompt = formatter.generate_prompt(messages, use_metadata=True)
+
+        self.assertEqual(formatter.formatted_count, 4)
+        self.assertIn("The time is 12:00.", prompt)
+        self.assertIn("More content.", prompt)
+
+    def test_formatters_and_options_are_cached_separately(self):
+        messages = create_messages(1)
+        messages[0].get_metadata().set_tool_output("The time is 12:00.")
+
+        self.assertNotIn("12:00", PromptFormatter().generate_prompt(messages))
+        self.assertIn(
+            "12:00", PromptFormatter().generate_prompt(messages, use_metadata=True)
+        )
+        self.assertTrue(
+            Llama3Formatter()
+            .generate_prompt(messages)
+            .startswith("<|begin_of_text|><|start_header_id|>user")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
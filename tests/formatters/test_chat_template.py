@@ -0,0 +1,56 @@
+import datetime
+import unittest
+
+from language_models.formatters.chat_template import (
+    ChatTemplateFormatter,
+    compile_chat_template,
+)
+from language_models.model_message import MessageMetadata, ModelMessage, Role
+
+CHATML_TEMPLATE = "{% for message in messages %}<|im_start|>{{ message.role }}\n{{ message.content }}<|im_end|>\n{% endfor %}{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+
+ALTERNATING_TEMPLATE = "{{ bos_token }}{% for message in messages %}{% if message.role == 'system' %}{{ raise_exception('System messages are not supported') }}{% elif message.role == 'user' %}[INST] {{ message.content }} [/INST]{% else %}{{ message.content }}{{ eos_token }}{% endif %}{% endfor %}"
+
+
+def create_message(role: Role, content: str) -> ModelMessage:
+    return ModelMessage(role, content, MessageMetadata(datetime.datetime.now(), []))
+
+
+class TestChatTemplateFormatter(unittest.TestCase):
+    def test_renders_template(self):
+        formatter = ChatTemplateFormatter(CHATML_TEMPLATE)
+
+        prompt = formatter.generate_prompt(
+            [create_message(Role.SYSTEM, "Be brief."), create_message(Role.USER, "Hi")]
+        )
+
+        self.assertEqual(
+            prompt,
+            "<|im_start|>system\nBe brief.<|im_end|>\n<|im_start|>user\nHi<|im_end|>\n<|im_start|>assistant\n",
+        )
+
+    def test_system_message_is_merged_when_template_rejects_it(self):
+        formatter = ChatTemplateFormatter(ALTERNATING_TEMPLATE, "</s>")
+
+        prompt = formatter.generate_prompt(
+            [
+                create_message(Role.SYSTEM, "Be brief."),
+                create_message(Role.USER, "Hi"),
+                create_message(Role.ASSISTANT, "Hello"),
+                create_message(Role.USER, "Bye"),
+            ]
+        )
+
+        self.assertEqual(
+            prompt, "[INST] Be brief.\n\nHi [/INST]Hello</s>[INST] Bye [/INST]"
+        )
+
+    def test_template_is_compiled_once(self):
+        self.assertIs(
+            compile_chat_template(CHATML_TEMPLATE),
+            compile_chat_template(CHATML_TEMPLATE),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import threading
+import time
+import unittest
+
+from language_models.api.base import ApiModel
+from language_models.formatters.base import PromptFormatter
+from language_models.helpers.batch_generation import generate_batch
+from language_models.model_response import ModelResponse
+
+
+class EchoModel(ApiModel):
+    def __init__(self):
+        super().__init__("echo.gguf", PromptFormatter())
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def generate_text(
+        self,
+        messages,
+        max_tokens=200,
+        temperature=0.2,
+        use_metadata=False,
+        response_prefix="",
+    ):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        try:
+            content = messages[-1].get_content()
+            if content == "fail":
+                raise RuntimeError("generation failed")
+
+            # Later prompts finish first
+            time.sleep(0.2 / (int(content) + 1))
+            system = messages[0].get_content() if len(messages) > 1 else ""
+            return ModelResponse(f"{system}{content}", self.model_path)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class TestBatchGeneration(unittest.TestCase):
+    def test_results_are_in_prompt_order(self):
+        model = EchoModel()
+        prompts = [{"system": "S", "user": str(i)} for i in range(6)]
+
+        start = time.time()
+        results = generate_batch(model, prompts, concurrency=3)
+
+        self.assertEqual(
+            [result["response"] for result in results], [f"S{i}" for i in range(6)]
+        )
+        self.assertEqual(model.max_running, 3)
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_errors_are_reported_per_prompt(self):
+        results = generate_batch(
+            EchoModel(), [{"user": "1"}, {"user": "fail"}, {"system": "S"}]
+        )
+
+        self.assertEqual(results[0], {"result": True, "response": "1"})
+        self.assertEqual(
+            results[1], {"result": False, "error_message": "generation failed"}
+        )
+        self.assertFalse(results[2]["result"])
+        self.assertIn("user message", results[2]["error_message"])
+
+    def test_empty_batch(self):
+        self.assertEqual(generate_batch(EchoModel(), []), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
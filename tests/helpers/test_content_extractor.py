@@ -0,0 +1,62 @@
+import unittest
+
+from language_models.helpers.content_extractor import (
+    chunk_text,
+    extract_main_content,
+    select_relevant_content,
+)
+
+
+class TestContentExtractor(unittest.TestCase):
+    def test_extracts_main_content(self):
+        html = """<html><head><title>Cats</title><script>var tracking = 1;</script></head>
+        <body><nav>Home | About</nav>
+        <main><h1>Cats</h1><p>Cats are <b>small</b> animals.<br>They purr.</p></main>
+        <footer>Copyright</footer></body></html>"""
+
+        self.assertEqual(
+            extract_main_content(html), "Cats\nCats are small animals.\nThey purr."
+        )
+
+    def test_extracts_body_without_main(self):
+        html = "<html><body><div>First</div><div>Second</div></body></html>"
+        self.assertEqual(extract_main_content(html), "First\nSecond")
+
+    def test_keeps_content_inside_form(self):
+        # Some frameworks wrap the whole page in a form
+        html = "<html><head><title>Title</title></head><body><form><p>text</p></form></body></html>"
+        self.assertEqual(extract_main_content(html), "Title\ntext")
+
+    def test_empty_document(self):
+        self.assertEqual(extract_main_content(""), "")
+
+    def test_chunk_text(self):
+        text = "\n".join(["a" * 50] * 10) + "\n" + "b " * 100
+
+        chunks = chunk_text(text, 120)
+
+        self.assertTrue(all(len(chunk) <= 120 for chunk in chunks))
+        self.assertEqual(
+            "".join(chunks).replace("\n", "").replace(" ", ""),
+            text.replace("\n", "").replace(" ", ""),
+        )
+
+    def test_selects_relevant_content(self):
+        filler = [f"Unrelated filler sentence number {i}." for i in range(300)]
+        text = "\n".join(
+            filler[:150] + ["The capital of France is Paris."] + filler[150:]
+        )
+
+        content = select_relevant_content(text, "What is the capital of France?", 500)
+
+        self.assertIn("The capital of France is Paris.", content)
+        self.assertLessEqual(len(content), 600)
+
+    def test_short_content_is_unchanged(self):
+        self.assertEqual(
+            select_relevant_content("Short page", "query", 100), "Short page"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
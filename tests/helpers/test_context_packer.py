@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from language_models.helpers.context_packer import pack_selected_files
+
+
+class TestContextPacker(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_file(self, name: str, content: str) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf8") as file:
+            file.write(content)
+        return path
+
+    def test_small_files_are_included_completely(self):
+        paths = [
+            self.write_file("a.txt", "first file"),
+            self.write_file("b.txt", "second file"),
+        ]
+        packed = pack_selected_files(paths, "anything", 1000)
+
+        self.assertIn(f'<FILE path="{paths[0]}">\nfirst file\n</FILE>', packed)
+        self.assertIn("second file", packed)
+
+    def test_relevant_chunks_are_selected_across_files(self):
+        filler = "".join(f"unrelated filler line number {i}\n" for i in range(500))
+        paths = [
+            self.write_file(
+                "a.txt", filler + "the reactor temperature is 350 kelvin\n"
+            ),
+            self.write_file("b.txt", filler),
+            self.write_file("c.txt", "the reactor pressure is 2 bar\n" + filler),
+        ]
+        packed = pack_selected_files(paths, "reactor temperature", 1500)
+
+        self.assertLessEqual(len(packed), 1500)
+        self.assertIn("350 kelvin", packed)
+        self.assertIn("2 bar", packed)
+        self.assertNotIn(paths[1], packed)
+
+    def test_without_matches_the_starts_are_kept(self):
+        paths = [
+            self.write_file("a.txt", "alpha " * 1000),
+            self.write_file("b.txt", "beta " * 1000),
+        ]
+        packed = pack_selected_files(paths, "gamma", 1000)
+
+        self.assertLessEqual(len(packed), 1000)
+        self.assertIn("alpha", packed)
+        self.assertIn("beta", packed)
+
+    def test_missing_and_binary_files_are_skipped(self):
+        binary_path = os.path.join(self.directory.name, "image.png")
+        with open(binary_path, "wb") as file:
+            file.write(b"\x89PNG\x00\x00")
+
+        paths = [
+            binary_path,
+            os.path.join(self.directory.name, "missing.txt"),
+            self.write_file("a.txt", "text"),
+        ]
+        packed = pack_selected_files(paths, "text", 1000)
+
+        self.assertNotIn("image.png", packed)
+        self.assertNotIn("missing.txt", packed)
+        self.assertIn("text", packed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -59,3 +59,58 @@ class TestDangerousCodeDetector(unittest.TestCase):
                 """
             )
         )
+
+    def test_unapproved_import_in_multi_import(self):
+        dangerous_code_detector = DangerousCodeDetector()
+        self.assertTrue(
+            dangerous_code_detector.detect_potentially_dangerous_code(
+                "import math, os\nprint(math.pi)"
+            )
+        )
+
+    def test_approved_submodule_import(self):
+        dangerous_code_detector = DangerousCodeDetector()
+        self.assertFalse(
+            dangerous_code_detector.detect_potentially_dangerous_code(
+                "from collections.abc import Iterable\nimport math as m\nprint(m.pi)"
+            )
+        )
+
+    def test_function_names_in_strings_and_comments(self):
+        dangerous_code_detector = DangerousCodeDetector()
+        self.assertFalse(
+            dangerous_code_detector.detect_potentially_dangerous_code(
+                '"""Don\'t open files."""\n# exec is not used\nprint("import os; open(x)")'
+            )
+        )
+
+    def test_potentially_unsafe_attribute(self):
+        dangerous_code_detector = DangerousCodeDetector()
+        self.assertTrue(
+            dangerous_code_detector.detect_potentially_dangerous_code(
+                "print(().__class__.__base__.__subclasses__())"
+            )
+        )
+
+    def test_potentially_unsafe_code_in_eval(self):
+        dangerous_code_detector = DangerousCodeDetector()
+        self.assertTrue(
+            dangerous_code_detector.detect_potentially_dangerous_code(
+                "eval(\"__import__('os').system('ls')\")"
+            )
+        )
+        self.assertFalse(
+            dangerous_code_detector.detect_potentially_dangerous_code(
+                "print(eval('1 + 2'))"
+            )
+        )
+
+    def test_verdict_is_cached(self):
+        dangerous_code_detector = DangerousCodeDetector(cache_size=1)
+        code = "import os"
+
+        self.assertTrue(dangerous_code_detector.detect_potentially_dangerous_code(code))
+        self.assertEqual(list(dangerous_code_detector.verdict_cache.values()), [True])
+
+        dangerous_code_detector.detect_potentially_dangerous_code("print(1)")
+        self.assertEqual(list(dangerous_code_detector.verdict_cache.values()), [False])
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+from language_models.helpers.file_reader import is_binary, read_file_excerpt
+
+
+class TestFileReader(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_file(self, content: bytes) -> str:
+        path = os.path.join(self.directory.name, "file")
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def test_small_file_is_read_completely(self):
+        path = self.write_file(b"first\nsecond\n")
+        excerpt = read_file_excerpt(path, 1000)
+
+        self.assertEqual(excerpt.text, "first\nsecond\n")
+        self.assertEqual(excerpt.total_lines, 2)
+        self.assertFalse(excerpt.truncated)
+
+    def test_empty_file(self):
+        self.assertEqual(read_file_excerpt(self.write_file(b""), 1000).text, "")
+
+    def test_large_file_keeps_head_and_tail(self):
+        path = self.write_file(
+            "".join(f"line {i}\n" for i in range(1, 100001)).encode("utf8")
+        )
+        excerpt = read_file_excerpt(path, 1000)
+
+        self.assertTrue(excerpt.truncated)
+        self.assertLessEqual(len(excerpt.text), 1200)
+        self.assertTrue(excerpt.text.startswith("line 1\n"))
+        self.assertTrue(excerpt.text.endswith("line 100000\n"))
+        self.assertEqual(excerpt.total_lines, 100000)
+
+        # The omitted range continues exactly where the head stops
+        head = excerpt.text.split("\n[... lines ")[0]
+        last_head_line = int(head.rsplit("line ", 1)[1])
+        self.assertIn(f"[... lines {last_head_line + 1}-", excerpt.text)
+
+    def test_long_line_is_shortened(self):
+        path = self.write_file(b"x" * 10000)
+        excerpt = read_file_excerpt(path, 1000)
+
+        self.assertTrue(excerpt.truncated)
+        self.assertIn("[... line 1 shortened, 9000 bytes omitted ...]", excerpt.text)
+        self.assertLessEqual(len(excerpt.text), 1100)
+
+    def test_single_omitted_line(self):
+        path = self.write_file(b"short\n" + b"x" * 10000 + b"\nend\n")
+        excerpt = read_file_excerpt(path, 1000)
+
+        self.assertEqual(
+            excerpt.text,
+            "short\n\n[... line 2 omitted (10001 bytes), use START_LINE and END_LINE to read it ...]\nend\n",
+        )
+
+    def test_line_range(self):
+        path = self.write_file(
+            "".join(f"line {i}\n" for i in range(1, 101)).encode("utf8")
+        )
+        excerpt = read_file_excerpt(path, 1000, 10, 12)
+
+        self.assertEqual(excerpt.text, "line 10\nline 11\nline 12\n")
+        self.assertEqual((excerpt.first_line, excerpt.last_line), (10, 12))
+
+    def test_line_range_past_end(self):
+        path = self.write_file(b"a\nb\nc")
+        excerpt = read_file_excerpt(path, 1000, 2, 50)
+
+        self.assertEqual(excerpt.text, "b\nc")
+        self.assertEqual(excerpt.last_line, 3)
+
+    def test_start_line_past_end(self):
+        path = self.write_file(b"a\nb\nc\n")
+        excerpt = read_file_excerpt(path, 1000, 10)
+
+        self.assertEqual(excerpt.text, "")
+        self.assertEqual((excerpt.first_line, excerpt.total_lines), (10, 3))
+
+    def test_binary_file_is_not_read(self):
+        path = self.write_file(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR")
+        excerpt = read_file_excerpt(path, 1000)
+
+        self.assertTrue(excerpt.binary)
+        self.assertIn("Binary file", excerpt.text)
+
+    def test_is_binary(self):
+        self.assertFalse(is_binary("tab\tseparated\r\nüñí".encode("utf8")))
+        self.assertTrue(is_binary(b"abc\x00def"))
+
+
+if __name__ == "__main__":
+    unittest.main()
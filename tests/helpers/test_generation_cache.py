@@ -0,0 +1,142 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from language_models.api.base import ApiModel
+from language_models.formatters.base import PromptFormatter
+from language_models.helpers.generation_cache import GenerationCache
+from language_models.model_response import ModelResponse
+
+
+class TestGenerationCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.directory.name, "generations")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_memory_and_disk_hits(self):
+        cache = GenerationCache(self.cache_path)
+        key = cache.create_key("model.gguf", {"prompt": "Hi", "temperature": 0})
+
+        self.assertIsNone(cache.get(key))
+        cache.set(key, "Hello", "model.gguf")
+        self.assertEqual(cache.get(key), {"text": "Hello", "model": "model.gguf"})
+
+        # A new process only has the files on disk
+        reloaded = GenerationCache(self.cache_path)
+        self.assertEqual(reloaded.get(key), {"text": "Hello", "model": "model.gguf"})
+        self.assertEqual(reloaded.get(key), {"text": "Hello", "model": "model.gguf"})
+
+        stats = reloaded.get_stats()
+        self.assertEqual(stats["disk_hits"], 1)
+        self.assertEqual(stats["memory_hits"], 1)
+        self.assertEqual(stats["hit_rate"], 1.0)
+        self.assertEqual(cache.get_stats()["misses"], 1)
+
+    def test_key_depends_on_request(self):
+        request = {"prompt": "Hi", "temperature": 0, "n_predict": 40}
+        key = GenerationCache.create_key("model.gguf", request)
+
+        self.assertEqual(
+            key,
+            GenerationCache.create_key("model.gguf", dict(reversed(request.items()))),
+        )
+        self.assertNotEqual(key, GenerationCache.create_key("other.gguf", request))
+        self.assertNotEqual(
+            key,
+            GenerationCache.create_key("model.gguf", {**request, "n_predict": 41}),
+        )
+        self.assertNotEqual(
+            key,
+            GenerationCache.create_key("model.gguf", {**request, "grammar": "root"}),
+        )
+
+    def test_disk_budget_evicts_least_recently_used_files(self):
+        entry_size = len('{"text": "0", "model": "m"}')
+        cache = GenerationCache(self.cache_path, max_disk_bytes=entry_size * 2)
+
+        cache.set("a", "0", "m")
+        cache.set("b", "0", "m")
+        cache.memory.clear()
+        cache.get("a")
+        cache.set("c", "0", "m")
+
+        self.assertEqual(sorted(os.listdir(self.cache_path)), ["a.json", "c.json"])
+        self.assertEqual(cache.get_stats()["disk_evictions"], 1)
+        self.assertEqual(cache.get_stats()["disk_bytes"], entry_size * 2)
+
+    def test_memory_only(self):
+        cache = GenerationCache("")
+        cache.set("a", "text", "m")
+
+        self.assertEqual(cache.get("a"), {"text": "text", "model": "m"})
+        cache.memory.clear()
+        self.assertIsNone(cache.get("a"))
+
+
+class CountingModel(ApiModel):
+    def __init__(self, text="response"):
+        super().__init__("model.gguf", PromptFormatter())
+        self.text = text
+        self.calls = 0
+
+    def generate(self):
+        self.calls += 1
+        return ModelResponse(self.text, "model.gguf")
+
+
+class TestApiModelGenerationCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        GenerationCache._instance = GenerationCache(self.directory.name)
+
+        patcher = patch.dict(os.environ, {"GENERATION_CACHE.ENABLED": "true"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        GenerationCache._instance = None
+        self.directory.cleanup()
+
+    def test_caches_deterministic_requests(self):
+        model = CountingModel()
+
+        for request in [{"prompt": "a", "temperature": 0}, {"prompt": "b", "seed": 42}]:
+            first = model.generate_cached(request, model.generate)
+            second = model.generate_cached(request, model.generate)
+            self.assertEqual(first.get_text(), second.get_text())
+
+        self.assertEqual(model.calls, 2)
+
+    def test_sampled_requests_are_not_cached(self):
+        model = CountingModel()
+        for request in [
+            {"prompt": "a", "temperature": 0.2},
+            {"prompt": "a", "temperature": 0.2, "seed": -1},
+        ]:
+            model.generate_cached(request, model.generate)
+            model.generate_cached(request, model.generate)
+
+        self.assertEqual(model.calls, 4)
+
+    def test_disabled_by_default(self):
+        model = CountingModel()
+        with patch.dict(os.environ, {"GENERATION_CACHE.ENABLED": "false"}):
+            model.generate_cached({"prompt": "a", "temperature": 0}, model.generate)
+            model.generate_cached({"prompt": "a", "temperature": 0}, model.generate)
+
+        self.assertEqual(model.calls, 2)
+
+    def test_empty_responses_are_not_cached(self):
+        model = CountingModel(text="")
+        model.generate_cached({"prompt": "a", "temperature": 0}, model.generate)
+        model.generate_cached({"prompt": "a", "temperature": 0}, model.generate)
+
+        self.assertEqual(model.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
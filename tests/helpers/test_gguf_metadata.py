@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import gguf
+
+from language_models.helpers import gguf_metadata
+from language_models.helpers.gguf_metadata import read_chat_template, read_gguf_metadata
+
+CHAT_TEMPLATE = "{% for message in messages %}<|{{ message.role }}|>{{ message.content }}{{ eos_token }}{% endfor %}{% if add_generation_prompt %}<|assistant|>{% endif %}"
+
+
+def write_model(path: str, chat_template: str) -> None:
+    writer = gguf.GGUFWriter(path, "llama")
+    if chat_template:
+        writer.add_chat_template(chat_template)
+    writer.add_token_list(["<unk>", "<s>", "</s>"])
+    writer.add_bos_token_id(1)
+    writer.add_eos_token_id(2)
+    writer.write_header_to_file()
+    writer.write_kv_data_to_file()
+    writer.write_tensors_to_file()
+    writer.close()
+
+
+class TestGGUFMetadata(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.directory.name, "chat.gguf")
+        write_model(self.model_path, CHAT_TEMPLATE)
+
+        self.environment = mock.patch.dict(
+            os.environ,
+            {
+                "MODEL.METADATA_CACHE_PATH": os.path.join(
+                    self.directory.name, "metadata_cache.json"
+                )
+            },
+        )
+        self.environment.start()
+        gguf_metadata.metadata_cache.clear()
+
+    def tearDown(self):
+        self.environment.stop()
+        gguf_metadata.metadata_cache.clear()
+        self.directory.cleanup()
+
+    def test_reads_chat_template_and_tokens(self):
+        metadata = read_gguf_metadata(self.model_path)
+
+        self.assertEqual(metadata["chat_template"], CHAT_TEMPLATE)
+        self.assertEqual(metadata["bos_token"], "<s>")
+        self.assertEqual(metadata["eos_token"], "</s>")
+
+    def test_metadata_is_cached_in_memory_and_on_disk(self):
+        read_gguf_metadata(self.model_path)
+
+        with mock.patch.object(
+            gguf_metadata, "read_gguf_fields", side_effect=AssertionError
+        ):
+            read_gguf_metadata(self.model_path)
+
+            # A restarted server reads the metadata from the disk cache
+            gguf_metadata.metadata_cache.clear()
+            self.assertEqual(
+                read_gguf_metadata(self.model_path)["chat_template"], CHAT_TEMPLATE
+            )
+
+    def test_changed_file_is_read_again(self):
+        read_gguf_metadata(self.model_path)
+
+        write_model(self.model_path, "{{ messages[0].content }}")
+        os.utime(self.model_path, ns=(0, 0))
+
+        self.assertEqual(
+            read_gguf_metadata(self.model_path)["chat_template"],
+            "{{ messages[0].content }}",
+        )
+
+    def test_model_without_chat_template(self):
+        write_model(self.model_path, "")
+        self.assertIsNone(read_chat_template(self.model_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from language_models.helpers.json_parser import (
+    extract_json,
+    find_json_span,
+    handle_json,
+    parse_json,
+    repair_backslashes,
+)
+
+
+class TestJsonParser(unittest.TestCase):
+    def test_extract_json_with_surrounding_text(self):
+        text = 'Sure! {"tool": "read_file", "arguments": {"FILEINDEX": "1"}} Done.'
+        json_object, span = extract_json(text)
+
+        self.assertEqual(json_object["arguments"], {"FILEINDEX": "1"})
+        self.assertEqual(text[span[0] : span[1]][-2:], "}}")
+        self.assertEqual(span[0], 6)
+
+    def test_braces_inside_strings_are_ignored(self):
+        text = '{"code": "print({1: 2})", "note": "a \\\\"}\\\\" b"} trailing }'
+        self.assertEqual(parse_json(text)["code"], "print({1: 2})")
+
+    def test_no_json_object(self):
+        self.assertEqual(find_json_span("no json here"), (-1, -1))
+        self.assertEqual(handle_json("no json here"), "")
+
+    def test_unclosed_object_keeps_the_rest_of_the_text(self):
+        self.assertEqual(
+            handle_json("x {'name': 'John', 'age': 30"), "{'name': 'John', 'age': 30"
+        )
+
+    def test_unbalanced_quotes_fall_back_to_braces(self):
+        self.assertEqual(handle_json('{"tool": "nothing} text'), '{"tool": "nothing}')
+
+    def test_repair_backslashes(self):
+        self.assertEqual(repair_backslashes("C:\\test.txt"), "C:\\\\\\\\test.txt")
+        self.assertEqual(repair_backslashes("C:\\\\test.txt"), "C:\\\\\\\\test.txt")
+        self.assertEqual(repair_backslashes("get\\_date"), "get_date")
+        self.assertEqual(repair_backslashes("no backslashes"), "no backslashes")
+
+    def test_large_output(self):
+        code_output = "print('x')\n" * 20000
+        text = code_output + '{"tool": "nothing", "arguments": {}}' + code_output
+
+        json_object, span = extract_json(text)
+
+        self.assertEqual(json_object["tool"], "nothing")
+        self.assertEqual(span[0], len(code_output))
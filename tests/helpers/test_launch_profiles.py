@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+from language_models.helpers.launch_profiles import (
+    LaunchProfile,
+    get_launch_profile,
+    tune_launch_profiles,
+    write_launch_profile,
+)
+
+PROFILES = """
+[default]
+threads = 4
+ctx_size = 4096
+
+["mistral-7b.gguf"]
+threads = 8
+cache_type_k = "q8_0"
+mlock = true
+no_mmap = false
+"""
+
+
+class TestLaunchProfiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "profiles.toml")
+        with open(self.path, "w", encoding="utf8") as file:
+            file.write(PROFILES)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_model_profile_overrides_default(self):
+        profile = get_launch_profile("mistral-7b.gguf", self.path)
+
+        self.assertEqual(profile.get("threads"), 8)
+        self.assertEqual(profile.get_context_window(), 4096)
+
+    def test_unknown_model_uses_default(self):
+        self.assertEqual(get_launch_profile("other.gguf", self.path).get("threads"), 4)
+
+    def test_missing_file(self):
+        profile = get_launch_profile("other.gguf", self.path + ".missing")
+        self.assertEqual(profile.get_context_window(), 2048)
+
+    def test_arguments(self):
+        profile = get_launch_profile("mistral-7b.gguf", self.path).merged(
+            LaunchProfile({"parallel": 2})
+        )
+        arguments = profile.to_arguments()
+
+        self.assertEqual(arguments[:2], ["--ctx-size", "8192"])
+        self.assertIn("--cont-batching", arguments)
+        self.assertEqual(arguments[arguments.index("--cache-type-k") + 1], "q8_0")
+        self.assertIn("--mlock", arguments)
+        self.assertNotIn("--no-mmap", arguments)
+
+    def test_unknown_setting(self):
+        with self.assertRaises(ValueError):
+            LaunchProfile({"thread": 4})
+
+    def test_write_keeps_other_profiles(self):
+        write_launch_profile(
+            "llama-3.gguf", LaunchProfile({"threads": 6, "flash_attn": True}), self.path
+        )
+
+        self.assertEqual(
+            get_launch_profile("llama-3.gguf", self.path).get("threads"), 6
+        )
+        self.assertTrue(get_launch_profile("llama-3.gguf", self.path).get("flash_attn"))
+        self.assertEqual(
+            get_launch_profile("mistral-7b.gguf", self.path).get("cache_type_k"), "q8_0"
+        )
+
+    def test_tuning_selects_the_fastest_profile(self):
+        candidates = [LaunchProfile({"threads": threads}) for threads in [2, 4, 8]]
+        throughputs = {2: 10.0, 4: 25.0}
+
+        def measure(profile):
+            if profile.get("threads") not in throughputs:
+                raise ConnectionError("Failed to start")
+            return throughputs[profile.get("threads")]
+
+        best, results = tune_launch_profiles(candidates, measure)
+
+        self.assertIs(best, candidates[1])
+        self.assertEqual([result[1] for result in results], [10.0, 25.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
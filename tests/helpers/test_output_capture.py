@@ -0,0 +1,62 @@
+import subprocess
+import sys
+import unittest
+
+from language_models.helpers.output_capture import OutputCapture, summarize_output
+
+
+class TestSummarizeOutput(unittest.TestCase):
+    def test_short_output_is_unchanged(self):
+        self.assertEqual(summarize_output("result: 42", 100), "result: 42")
+
+    def test_keeps_head_and_tail(self):
+        output = "".join(f"line {i}\n" for i in range(1000))
+        summary = summarize_output(output, 300)
+
+        self.assertTrue(summary.startswith("line 0\n"))
+        self.assertTrue(summary.endswith("line 999\n"))
+        self.assertIn("characters omitted", summary)
+        self.assertLess(len(summary), 400)
+
+
+class TestOutputCapture(unittest.TestCase):
+    def run_process(self, code, max_bytes):
+        process = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE)
+        chunks = []
+        limit_hit = []
+
+        def on_limit():
+            limit_hit.append(True)
+            process.kill()
+
+        capture = OutputCapture(
+            process.stdout,
+            "stdout",
+            max_bytes,
+            lambda stream, text: chunks.append(text),
+            on_limit,
+        )
+        process.wait(timeout=10)
+        capture.join(5)
+        return capture, chunks, limit_hit
+
+    def test_captures_output(self):
+        capture, chunks, limit_hit = self.run_process("print('hello')", 1000)
+
+        self.assertEqual(capture.getvalue().strip(), "hello")
+        self.assertEqual("".join(chunks), capture.getvalue())
+        self.assertFalse(capture.truncated)
+        self.assertEqual(limit_hit, [])
+
+    def test_stops_at_limit(self):
+        capture, _, limit_hit = self.run_process(
+            "while True:\n    print('x' * 100)", 1000
+        )
+
+        self.assertTrue(capture.truncated)
+        self.assertEqual(len(capture.getvalue()), 1000)
+        self.assertEqual(limit_hit, [True])
+
+
+if __name__ == "__main__":
+    unittest.main()
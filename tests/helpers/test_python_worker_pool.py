@@ -0,0 +1,129 @@
+import os
+import time
+import unittest
+
+from language_models.helpers.python_worker_pool import PythonWorkerPool
+
+
+class TestPythonWorkerPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = PythonWorkerPool(
+            size=1, max_runs_per_worker=3, preloaded_modules=["json", "math"]
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_captures_output(self):
+        stdout, stderr, return_code = self.pool.execute("print(1 + 2)")
+        self.assertEqual(stdout, "3\n")
+        self.assertEqual(stderr, "")
+        self.assertEqual(return_code, 0)
+
+    def test_main_guard_runs(self):
+        stdout, _, _ = self.pool.execute(
+            'if __name__ == "__main__":\n    print("main")'
+        )
+        self.assertEqual(stdout, "main\n")
+
+    def test_error_is_reported(self):
+        _, stderr, return_code = self.pool.execute("raise ValueError('broken')")
+        self.assertEqual(return_code, 1)
+        self.assertIn("ValueError: broken", stderr)
+        self.assertNotIn("python_worker.py", stderr)
+
+    def test_exit_code(self):
+        _, _, return_code = self.pool.execute("import sys\nsys.exit(3)")
+        self.assertEqual(return_code, 3)
+
+    def test_runs_do_not_share_globals(self):
+        self.pool.execute("shared_value = 1")
+        _, stderr, return_code = self.pool.execute("print(shared_value)")
+        self.assertEqual(return_code, 1)
+        self.assertIn("NameError", stderr)
+
+    def test_output_limit_stops_code(self):
+        start = time.time()
+        stdout, stderr, return_code = self.pool.execute(
+            "while True:\n    print('x' * 100)", max_output_bytes=1000
+        )
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(return_code, 1)
+        self.assertEqual(len(stdout), 1000)
+        self.assertIn("OutputLimitExceeded", stderr)
+
+    def test_output_limit_is_not_caught_by_code(self):
+        code = "try:\n    print('x' * 1000)\nexcept Exception:\n    pass\nprint('done')"
+        _, stderr, return_code = self.pool.execute(code, max_output_bytes=100)
+        self.assertEqual(return_code, 1)
+        self.assertIn("OutputLimitExceeded", stderr)
+
+    def test_output_is_streamed(self):
+        chunks = []
+        code = "import sys, time\nprint('first', flush=True)\ntime.sleep(0.3)\nprint('second', file=sys.stderr)"
+
+        stdout, stderr, _ = self.pool.execute(
+            code, output_callback=lambda stream, text: chunks.append((stream, text))
+        )
+
+        self.assertEqual(chunks, [("stdout", "first\n"), ("stderr", "second\n")])
+        self.assertEqual(stdout, "first\n")
+        self.assertEqual(stderr, "second\n")
+
+    def test_timeout_replaces_worker(self):
+        with self.assertRaises(TimeoutError):
+            self.pool.execute("while True:\n    pass", timeout=0.5)
+
+        stdout, _, _ = self.pool.execute("print('still working')")
+        self.assertEqual(stdout, "still working\n")
+
+    def test_crash_replaces_worker(self):
+        _, stderr, return_code = self.pool.execute("import os\nos._exit(1)")
+        self.assertEqual(return_code, -1)
+        self.assertIn("exited unexpectedly", stderr)
+
+        stdout, _, _ = self.pool.execute("print('recovered')")
+        self.assertEqual(stdout, "recovered\n")
+
+    def test_warm_runs_are_fast(self):
+        self.pool.execute("pass")
+
+        start = time.time()
+        for _ in range(5):
+            self.pool.execute("import math\nprint(math.sqrt(4))")
+        self.assertLess((time.time() - start) / 5, 0.5)
+
+    def test_module_changes_do_not_leak(self):
+        self.pool.execute("import math\nmath.pi = 3")
+        stdout, _, _ = self.pool.execute("import math\nprint(math.pi)")
+        self.assertEqual(stdout, "3.141592653589793\n")
+
+    def test_builtin_changes_do_not_leak(self):
+        self.pool.execute("import builtins\nbuiltins.print = None\nlen = None")
+        stdout, _, return_code = self.pool.execute("print(len('abc'))")
+        self.assertEqual(return_code, 0)
+        self.assertEqual(stdout, "3\n")
+
+    def test_working_directory_is_restored(self):
+        first, _, _ = self.pool.execute("import os\nprint(os.getcwd())")
+        self.pool.execute("import os\nos.chdir('..')")
+        second, _, _ = self.pool.execute("import os\nprint(os.getcwd())")
+        self.assertEqual(first, second)
+
+    def test_secrets_are_not_passed(self):
+        os.environ["OPENAI.API_KEY"] = "sk-12345"
+        os.environ["SERVICE_TOKEN"] = "sk-12345"
+        try:
+            pool = PythonWorkerPool(size=1, preloaded_modules=[])
+            stdout, _, _ = pool.execute(
+                "import os\nprint(sorted(name for name in os.environ if os.environ[name] == 'sk-12345'))"
+            )
+            pool.shutdown()
+        finally:
+            del os.environ["OPENAI.API_KEY"]
+            del os.environ["SERVICE_TOKEN"]
+
+        self.assertEqual(stdout, "[]\n")
+        self.assertFalse(os.path.exists(pool.working_directory))
@@ -0,0 +1,36 @@
+import unittest
+
+from language_models.helpers.search_backends import (
+    SearchResult,
+    StubSearchBackend,
+    normalize_query,
+)
+
+
+class TestSearchBackends(unittest.TestCase):
+    def test_normalize_query(self):
+        self.assertEqual(
+            normalize_query("  Forever   and\tOne  song "), "forever and one song"
+        )
+
+    def test_stub_backend(self):
+        backend = StubSearchBackend(
+            {
+                "python": [
+                    SearchResult(f"Result {i}", f"http://example.com/{i}", "")
+                    for i in range(5)
+                ]
+            }
+        )
+
+        results = backend.search(" Python ", max_results=3)
+
+        self.assertEqual(
+            [r.title for r in results], ["Result 0", "Result 1", "Result 2"]
+        )
+        self.assertEqual(backend.search("unknown"), [])
+        self.assertEqual(backend.queries, [" Python ", "unknown"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import threading
+import unittest
+
+from language_models.helpers.suggestion_queue import SuggestionQueue
+
+
+class TestSuggestionQueue(unittest.TestCase):
+    def test_returns_suggestions_of_turn(self):
+        queue = SuggestionQueue()
+        queue.submit("conversation", 2, lambda: ["a", "b"])
+
+        entry = queue.get("conversation")
+        assert entry
+        self.assertEqual(entry[0], 2)
+        self.assertEqual(entry[1].result(timeout=5), ["a", "b"])
+
+        self.assertIsNotNone(queue.get("conversation", 2))
+        self.assertIsNone(queue.get("conversation", 1))
+        self.assertIsNone(queue.get("other"))
+
+    def test_newer_turn_cancels_pending_suggestions(self):
+        queue = SuggestionQueue()
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+            return ["blocking"]
+
+        queue.submit("busy", 1, blocking)
+        started.wait(5)
+
+        queue.submit("conversation", 1, lambda: ["old"])
+        old = queue.get("conversation", 1)
+        queue.submit("conversation", 2, lambda: ["new"])
+        release.set()
+
+        assert old
+        self.assertTrue(old[1].cancelled())
+        self.assertIsNone(queue.get("conversation", 1))
+
+        entry = queue.get("conversation", 2)
+        assert entry
+        self.assertEqual(entry[1].result(timeout=5), ["new"])
+
+    def test_failed_generation_returns_no_suggestions(self):
+        queue = SuggestionQueue()
+
+        def fail():
+            raise RuntimeError("model unavailable")
+
+        queue.submit("conversation", 1, fail)
+
+        entry = queue.get("conversation")
+        assert entry
+        self.assertEqual(entry[1].result(timeout=5), [])
+
+    def test_keeps_latest_conversations(self):
+        queue = SuggestionQueue(max_conversations=2)
+        for conversation_id in ["a", "b", "c"]:
+            queue.submit(conversation_id, 1, lambda: [])
+
+        self.assertIsNone(queue.get("a"))
+        self.assertIsNotNone(queue.get("b"))
+        self.assertIsNotNone(queue.get("c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from language_models.helpers.token_counter import TokenCounter, estimate_tokens
+
+
+class TestTokenCounter(unittest.TestCase):
+    def test_counts_are_cached(self):
+        calls = []
+
+        def tokenize(text: str) -> int:
+            calls.append(text)
+            return len(text.split())
+
+        counter = TokenCounter(tokenize)
+
+        self.assertEqual(counter.count("one two three"), 3)
+        self.assertEqual(counter.count("one two three"), 3)
+        self.assertEqual(calls, ["one two three"])
+
+    def test_cache_is_bounded(self):
+        counter = TokenCounter(lambda text: 1, cache_size=2)
+
+        for text in ["a", "b", "c"]:
+            counter.count(text)
+
+        self.assertEqual(len(counter.cache), 2)
+
+    def test_failures_fall_back_to_estimates(self):
+        def tokenize(text: str) -> int:
+            raise ConnectionError("llama.cpp is not running")
+
+        counter = TokenCounter(tokenize)
+
+        self.assertEqual(counter.count("x" * 40), estimate_tokens("x" * 40))
+        self.assertEqual(len(counter.cache), 0)
+
+    def test_special_tokens_in_prompts(self):
+        counter = TokenCounter(lambda text: len(text.split()))
+
+        self.assertEqual(counter.count_prompt([1, "[INST] hello [/INST]", 2]), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+
+from language_models.helpers.tool_helper import ToolRegistry, load_available_tools
+
+
+class TestToolRegistry(unittest.TestCase):
+    def test_tools_are_shared(self):
+        first_tools = load_available_tools()
+        second_tools = load_available_tools()
+
+        self.assertTrue(first_tools)
+        for first_tool, second_tool in zip(first_tools, second_tools):
+            self.assertIs(first_tool, second_tool)
+
+    def test_tool_names_are_unique(self):
+        names = [tool.name for tool in ToolRegistry.get_tools()]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn("get_available_tools", names)
+        self.assertIn("code_interpreter", names)
+
+    def test_discovery_does_not_depend_on_working_directory(self):
+        current_directory = os.getcwd()
+        ToolRegistry.reset()
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                os.chdir(temp_dir)
+                try:
+                    self.assertIsNotNone(ToolRegistry.get_tool("read_file"))
+                finally:
+                    os.chdir(current_directory)
+        finally:
+            ToolRegistry.reset()
+
+    def test_parent_tool_is_excluded(self):
+        tools = load_available_tools("ListerTool")
+        self.assertNotIn("get_available_tools", [tool.name for tool in tools])
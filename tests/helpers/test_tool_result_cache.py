@@ -0,0 +1,49 @@
+import time
+import unittest
+
+from language_models.helpers.tool_result_cache import ToolResultCache
+
+
+class TestToolResultCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = ToolResultCache()
+        self.assertIsNone(cache.get("search:python"))
+
+        cache.set("search:python", "Python is a programming language.")
+
+        self.assertEqual(
+            cache.get("search:python"), "Python is a programming language."
+        )
+        stats = cache.get_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_ttl_expiration(self):
+        cache = ToolResultCache()
+        cache.set("browse:url", "content", ttl=0.05)
+        time.sleep(0.1)
+
+        self.assertIsNone(cache.get("browse:url"))
+        self.assertEqual(cache.get_stats()["expirations"], 1)
+
+    def test_evicts_least_recently_used_entry(self):
+        cache = ToolResultCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get_stats()["evictions"], 1)
+
+    def test_size_bound(self):
+        cache = ToolResultCache(max_characters=10)
+        cache.set("a", "12345")
+        cache.set("b", "123456")
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), "123456")
+
+        cache.set("c", "12345678901")
+        self.assertIsNone(cache.get("c"))
@@ -0,0 +1,132 @@
+import os
+import tempfile
+import time
+import unittest
+
+from language_models.helpers.trace_recorder import (
+    TraceRecorder,
+    load_traces,
+    record_event,
+    record_stage,
+    replay_event,
+)
+from language_models.helpers.trace_replayer import TraceReplayer, percentile
+
+
+class TestTraceRecorder(unittest.TestCase):
+    def tearDown(self):
+        TraceRecorder.set_instance(None)
+
+    def record_trace(self, recorder):
+        TraceRecorder.set_instance(recorder)
+
+        trace = recorder.start_trace(
+            "/generate_response", {"conversation_id": "a", "message": "Hi"}
+        )
+        record_event("model", name="mock", text="Hello", duration=0.5)
+        with record_stage("generation"):
+            pass
+        recorder.finish_trace(trace, {"result": True, "response": "Hello"})
+
+        # Events outside of a trace are ignored
+        record_event("model", name="mock", text="Ignored", duration=0)
+
+        return trace
+
+    def test_records_in_memory(self):
+        recorder = TraceRecorder()
+        self.record_trace(recorder)
+
+        self.assertEqual(len(recorder.traces), 1)
+        trace = recorder.traces[0]
+        self.assertEqual(trace["request"]["message"], "Hi")
+        self.assertEqual(trace["response"]["response"], "Hello")
+        self.assertEqual(
+            [event["type"] for event in trace["events"]], ["model", "stage"]
+        )
+
+    def test_records_to_file(self):
+        for file_name in ("traces.jsonl", "traces.jsonl.gz"):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, file_name)
+                recorder = TraceRecorder(path)
+
+                self.record_trace(recorder)
+                self.record_trace(recorder)
+
+                traces = load_traces(path)
+                self.assertEqual(len(traces), 2)
+                self.assertEqual(traces[0]["events"][0]["text"], "Hello")
+
+    def test_replays_events_of_the_replayed_trace(self):
+        recorded = {
+            "id": "recorded",
+            "events": [
+                {"type": "tool", "name": "search", "output": "Result", "duration": 1},
+                {"type": "model", "name": "mock", "text": "First", "duration": 1},
+                {"type": "model", "name": "mock", "text": "Second", "duration": 1},
+            ],
+        }
+
+        recorder = TraceRecorder()
+        recorder.load_replay_source([recorded], speedup=100)
+        TraceRecorder.set_instance(recorder)
+
+        self.assertIsNone(replay_event("model"))
+
+        recorder.start_trace("/generate_response", {}, replay_of="recorded")
+
+        start_time = time.time()
+        self.assertEqual(replay_event("model")["text"], "First")  # type: ignore
+        self.assertGreaterEqual(time.time() - start_time, 0.01)
+
+        self.assertIsNone(replay_event("tool", "read_file"))
+        self.assertEqual(replay_event("tool", "search")["output"], "Result")  # type: ignore
+        self.assertEqual(replay_event("model")["text"], "Second")  # type: ignore
+        self.assertIsNone(replay_event("model"))
+
+
+class TestTraceReplayer(unittest.TestCase):
+    def test_percentile(self):
+        self.assertEqual(percentile([], 50), 0)
+        self.assertEqual(percentile([3, 1, 2], 50), 2)
+        self.assertAlmostEqual(percentile([1, 2, 3, 4], 90), 3.7)
+
+    def test_replays_conversations(self):
+        traces = [
+            {
+                "id": f"trace-{i}",
+                "endpoint": "/generate_response",
+                "timestamp": 1000 + i,
+                "request": {"conversation_id": f"conversation-{i % 2}"},
+                "events": [],
+            }
+            for i in range(4)
+        ]
+        requests = []
+
+        def post(endpoint, data, headers):
+            requests.append((endpoint, data, headers))
+            if endpoint == "/start_new_conversation":
+                return {"conversation_id": f"new-{len(requests)}"}
+            return {
+                "result": True,
+                "stages": [{"type": "stage", "name": "generation", "duration": 0.1}],
+            }
+
+        replayer = TraceReplayer(traces, post, concurrency=2, speedup=100)
+        replayer.replay()
+
+        generate_requests = [r for r in requests if r[0] == "/generate_response"]
+        self.assertEqual(len(generate_requests), 4)
+        self.assertTrue(
+            all(r[1]["conversation_id"].startswith("new-") for r in generate_requests)
+        )
+        self.assertEqual(len(replayer.endpoint_latencies["/generate_response"]), 4)
+        self.assertEqual(replayer.stage_latencies["generation"], [0.1] * 4)
+        self.assertEqual(replayer.error_count, 0)
+        self.assertIn("/generate_response", replayer.get_report())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import http.server
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+
+from language_models.helpers.web_fetcher import WebFetcher
+
+PAGE = b"<html><body><main><p>Hello from the fixture server.</p></main></body></html>"
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    request_count = 0
+    full_response_count = 0
+
+    def do_GET(self):
+        FixtureHandler.request_count += 1
+
+        if self.path == "/page":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            FixtureHandler.full_response_count += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            self.wfile.write(PAGE)
+        elif self.path == "/large":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            self.wfile.write(b"x" * 100_000)
+        elif self.path == "/slow":
+            time.sleep(1)
+            self.send_response(200)
+            self.end_headers()
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestWebFetcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.cache_directory = tempfile.TemporaryDirectory()
+        self.fetcher = WebFetcher(
+            cache_path=self.cache_directory.name, timeout=0.5, max_bytes=10_000
+        )
+
+    def tearDown(self):
+        self.cache_directory.cleanup()
+
+    def test_fetch(self):
+        page = self.fetcher.fetch(f"{self.base_url}/page")
+
+        self.assertEqual(page.text, PAGE.decode())
+        self.assertTrue(page.is_html())
+        self.assertFalse(page.from_cache)
+
+    def test_conditional_get(self):
+        FixtureHandler.full_response_count = 0
+
+        self.fetcher.fetch(f"{self.base_url}/page")
+        page = self.fetcher.fetch(f"{self.base_url}/page")
+
+        self.assertTrue(page.from_cache)
+        self.assertEqual(page.text, PAGE.decode())
+        self.assertEqual(FixtureHandler.full_response_count, 1)
+
+    def test_size_cap(self):
+        page = self.fetcher.fetch(f"{self.base_url}/large")
+
+        self.assertEqual(len(page.text), 10_000)
+        self.assertTrue(page.truncated)
+
+    def test_timeout(self):
+        with self.assertRaises(requests.RequestException):
+            self.fetcher.fetch(f"{self.base_url}/slow")
+
+    def test_fetch_many(self):
+        pages = self.fetcher.fetch_many(
+            [f"{self.base_url}/page", f"{self.base_url}/missing"]
+        )
+
+        self.assertEqual(pages[0].text, PAGE.decode())  # type: ignore
+        self.assertIsNone(pages[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
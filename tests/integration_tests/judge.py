@@ -0,0 +1,131 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from client import client_api
+
+JUDGE_SYSTEM_MESSAGE = "You are a response checker, answer with YES if the response fulfills the criteria or NO if it does not. Only answer with YES or NO."
+
+GenerateBatch = Callable[..., List[Dict[str, Any]]]
+
+
+class Judge:
+    """
+    Checks whether responses fulfill criteria with the test model. Checks that
+    tests request at about the same time are sent together through
+    /generate_batch, and verdicts are cached by (response, criteria), so repeated
+    runs of a test don't ask again for the same response.
+    """
+
+    def __init__(
+        self,
+        generate_batch: Optional[GenerateBatch] = None,
+        max_batch_size: int = 16,
+        max_wait: float = 0.05,
+    ):
+        self.generate_batch = generate_batch or client_api.generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        # Hash of (response, criteria) -> verdict, also shared by concurrent checks
+        self.verdicts: Dict[str, Future[str]] = {}
+        self.pending: List[Tuple[str, str, Future[str]]] = []
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+
+        self.check_count = 0
+        self.cache_hits = 0
+        self.llm_calls = 0
+        self.batch_count = 0
+
+    def judge(self, response: str, criteria: str) -> str:
+        """Returns the answer of the model, which starts with YES or NO, or an
+        empty string if the model couldn't be asked."""
+        key = hashlib.sha256(f"{response}\0{criteria}".encode("utf8")).hexdigest()
+
+        with self.condition:
+            self.check_count += 1
+
+            verdict = self.verdicts.get(key)
+            if verdict is not None:
+                self.cache_hits += 1
+            else:
+                verdict = Future()
+                self.verdicts[key] = verdict
+                self.pending.append(
+                    (key, create_judge_prompt(response, criteria), verdict)
+                )
+                self.condition.notify()
+
+                if not self.thread:
+                    self.thread = threading.Thread(
+                        target=self._send_batches, daemon=True
+                    )
+                    self.thread.start()
+
+        return verdict.result()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.condition:
+            return {
+                "checks": self.check_count,
+                "cache_hits": self.cache_hits,
+                "llm_calls": self.llm_calls,
+                "batches": self.batch_count,
+            }
+
+    def _send_batches(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+
+                # Gives concurrently running tests the chance to add their checks
+                deadline = time.monotonic() + self.max_wait
+                while len(self.pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                batch = self.pending[: self.max_batch_size]
+                self.pending = self.pending[self.max_batch_size :]
+                self.llm_calls += len(batch)
+                self.batch_count += 1
+
+            self._judge_batch(batch)
+
+    def _judge_batch(self, batch: Sequence[Tuple[str, str, Future[str]]]) -> None:
+        try:
+            results = self.generate_batch(
+                [(JUDGE_SYSTEM_MESSAGE, prompt) for _, prompt, _ in batch],
+                max_tokens=200,
+                temperature=0,
+                model_name=os.environ.get("MODEL.TEST_MODEL") or None,
+            )
+        except Exception as e:
+            results = [{"result": False, "error_message": str(e)} for _ in batch]
+
+        if len(results) != len(batch):
+            error_message = f"Expected {len(batch)} results, got {len(results)}"
+            results = [{"result": False, "error_message": error_message} for _ in batch]
+
+        for (key, _, verdict), result in zip(batch, results):
+            if not result.get("result"):
+                # Failed checks are asked again the next time
+                print(f"The judge failed: {result.get('error_message')}")
+                with self.condition:
+                    self.verdicts.pop(key, None)
+
+            verdict.set_result(result.get("response", ""))
+
+
+def create_judge_prompt(response: str, criteria: str) -> str:
+    return f"Response to evaluate: {response}\nBased on the following criteria: {criteria}.\nAnswer with YES if the criteria is fulfilled, otherwise answer with NO."
+
+
+# Shared by all tests of a run
+JUDGE = Judge()
@@ -0,0 +1,147 @@
+"""
+Runs the integration tests concurrently against a running server, every test
+TEST.RUN_COUNT times, and reports the pass rate of each test with the wall-clock
+time and the number of LLM calls. The checks of the judge are batched and cached
+(see judge.py), so statistical runs with several runs per test stay practical.
+
+Usage: python -m tests.integration_tests.runner [--runs 5] [--concurrency 4] [-k name]
+"""
+
+import argparse
+import os
+import threading
+import time
+import traceback
+import unittest
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from client import client_api
+from tests.integration_tests import test_base
+from tests.integration_tests.judge import JUDGE
+
+
+class GenerationCounter:
+    """Counts the responses the tests generate through the client."""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def wrap(self, function: Callable[..., Any]) -> Callable[..., Any]:
+        def counted(*args: Any, **kwargs: Any) -> Any:
+            with self.lock:
+                self.count += 1
+            return function(*args, **kwargs)
+
+        return counted
+
+
+def collect_tests(suite: Iterable[Any]) -> List[unittest.TestCase]:
+    tests: List[unittest.TestCase] = []
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            tests.extend(collect_tests(test))
+        else:
+            tests.append(test)
+    return tests
+
+
+def run_test(test: unittest.TestCase) -> Tuple[str, bool, str]:
+    """Runs a fresh instance of the test, so concurrent runs share no state."""
+    result = unittest.TestResult()
+
+    try:
+        type(test)(test._testMethodName).run(result)  # type: ignore
+    except Exception:
+        return test.id(), False, traceback.format_exc()
+
+    problems = result.errors + result.failures
+    if problems:
+        return test.id(), False, problems[0][1]
+    if result.skipped:
+        return test.id(), True, f"skipped: {result.skipped[0][1]}"
+    return test.id(), True, ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=int(os.getenv("TEST.RUN_COUNT", 1)))
+    parser.add_argument(
+        "--concurrency", type=int, default=int(os.getenv("TEST.CONCURRENCY", 4))
+    )
+    parser.add_argument("-k", dest="name_filter", default="")
+    args = parser.parse_args()
+
+    # Repetitions are scheduled by the runner instead of run_multiple_times
+    test_base.TEST_RUN_COUNT = 1
+
+    generation_counter = GenerationCounter()
+    client_api._base_generate_response = generation_counter.wrap(
+        client_api._base_generate_response
+    )
+
+    tests_directory = os.path.dirname(os.path.abspath(__file__))
+    tests = collect_tests(
+        unittest.defaultTestLoader.discover(
+            tests_directory,
+            pattern="test_*.py",
+            top_level_dir=os.path.dirname(os.path.dirname(tests_directory)),
+        )
+    )
+    tests = [test for test in tests if args.name_filter in test.id()]
+    runs = [test for test in tests for _ in range(args.runs)]
+
+    print(
+        f"Running {len(tests)} tests {args.runs} times with concurrency {args.concurrency}"
+    )
+
+    # Instances run outside of a suite, which would set up their classes
+    test_classes = list(dict.fromkeys(type(test) for test in tests))
+
+    start_time = time.time()
+    for test_class in test_classes:
+        test_class.setUpClass()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(run_test, runs))
+    finally:
+        for test_class in test_classes:
+            test_class.tearDownClass()
+    wall_clock = time.time() - start_time
+
+    passed_runs: Dict[str, int] = defaultdict(int)
+    failures: Dict[str, List[str]] = defaultdict(list)
+    for test_id, passed, details in results:
+        if passed:
+            passed_runs[test_id] += 1
+        else:
+            failures[test_id].append(details)
+
+    for test in tests:
+        test_id = test.id()
+        print(f"{passed_runs[test_id]:>3}/{args.runs} {test_id}")
+        for details in failures[test_id][:1]:
+            print("    " + details.strip().splitlines()[-1])
+
+    passed_count = sum(passed_runs.values())
+    judge_stats = JUDGE.get_stats()
+
+    print()
+    print(
+        f"Pass rate: {passed_count}/{len(runs)} ({passed_count / max(len(runs), 1):.0%})"
+    )
+    print(f"Wall-clock time: {wall_clock:.1f} s")
+    print(
+        f"LLM calls: {generation_counter.count + judge_stats['llm_calls']} "
+        f"({generation_counter.count} responses, {judge_stats['llm_calls']} judge checks "
+        f"in {judge_stats['batches']} batches, {judge_stats['cache_hits']} of "
+        f"{judge_stats['checks']} checks answered from the cache)"
+    )
+
+    raise SystemExit(0 if passed_count == len(runs) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from dotenv import load_dotenv
 
 from client.client_api import Model
 from language_models.model_message import MessageMetadata
+from tests.integration_tests.judge import JUDGE
 
 TEST_RUN_COUNT = 1
 
@@ -54,14 +55,8 @@ class TestBase(unittest.TestCase):
         return model
 
     def base_assert_response(self, response: str, criteria: str, expected: bool):
-        fact_checker = self.create_test_model(single_message_mode=True)
-        fact_checker.add_system_message(
-            "You are a response checker, answer with YES if the response fulfills the criteria or NO if it does not. Only answer with YES or NO."
-        )
-
-        fact_response = fact_checker.generate_response(
-            f"Response to evaluate: {response}\nBased on the following criteria: {criteria}.\nAnswer with YES if the criteria is fulfilled, otherwise answer with NO."
-        )
+        # Judged together with the checks of concurrently running tests
+        fact_response = JUDGE.judge(response, criteria)
 
         self.assertTrue(
             fact_response, msg="The fact checker did not return a response."
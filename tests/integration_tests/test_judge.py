@@ -0,0 +1,66 @@
+import threading
+import time
+import unittest
+
+from tests.integration_tests.judge import Judge
+
+
+class TestJudge(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+
+        def generate_batch(prompts, **kwargs):
+            self.batches.append(prompts)
+            time.sleep(0.05)
+            return [
+                {
+                    "result": True,
+                    "response": "YES" if "evaluate: good" in user else "NO",
+                }
+                for _, user in prompts
+            ]
+
+        self.judge = Judge(generate_batch, max_wait=0.1)
+
+    def test_concurrent_checks_are_batched(self):
+        verdicts = {}
+
+        def check(response):
+            verdicts[response] = self.judge.judge(response, "is positive")
+
+        threads = [
+            threading.Thread(target=check, args=(f"{quality} {i}",))
+            for i, quality in enumerate(["good", "bad", "good", "bad"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(verdicts["good 0"], "YES")
+        self.assertEqual(verdicts["bad 1"], "NO")
+
+    def test_verdicts_are_cached(self):
+        self.judge.judge("good answer", "criteria")
+        self.judge.judge("good answer", "criteria")
+        self.judge.judge("good answer", "other criteria")
+
+        self.assertEqual(
+            self.judge.get_stats(),
+            {"checks": 3, "cache_hits": 1, "llm_calls": 2, "batches": 2},
+        )
+
+    def test_failed_checks_are_not_cached(self):
+        judge = Judge(
+            lambda prompts, **kwargs: [{"result": False, "error_message": "down"}],
+            max_wait=0,
+        )
+
+        self.assertEqual(judge.judge("response", "criteria"), "")
+        self.assertEqual(judge.judge("response", "criteria"), "")
+        self.assertEqual(judge.get_stats()["llm_calls"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
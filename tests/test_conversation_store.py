@@ -0,0 +1,131 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from language_models.conversation_store import ConversationStore
+from language_models.memory_manager import MemoryManager
+from language_models.model_conversation import ModelConversation
+from language_models.model_message import MessageMetadata
+
+
+def create_metadata() -> MessageMetadata:
+    return MessageMetadata(datetime.datetime.now(), ["notes.txt"])
+
+
+class TestConversationStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "conversations.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_store(self, **kwargs) -> ConversationStore:
+        store = ConversationStore(self.path, flush_interval=60, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def create_conversation(self) -> ModelConversation:
+        conversation = ModelConversation(MemoryManager("knowledge_base"), "chat.gguf")
+        conversation.add_system_message("Be brief.", create_metadata())
+        conversation.add_user_message("Hello", create_metadata())
+        return conversation
+
+    def test_conversations_survive_a_restart(self):
+        store = self.create_store()
+        store["a"] = self.create_conversation()
+        store["a"].messages[-1].get_metadata().set_tool_output("TOOL OUTPUT")
+        store["a"].add_assistant_message("Hi!", create_metadata())
+        store.close()
+
+        conversation = self.create_store()["a"]
+
+        self.assertEqual(
+            [message.get_content() for message in conversation.messages],
+            [
+                "Unless required, answer briefly in a sentence or two.\nBe brief.",
+                "Hello",
+                "Hi!",
+            ],
+        )
+        self.assertEqual(conversation.get_model_path(), "chat.gguf")
+        self.assertEqual(
+            conversation.messages[1].get_metadata().tool_output, "TOOL OUTPUT"
+        )
+        self.assertEqual(
+            conversation.messages[1].get_metadata().selected_files, ("notes.txt",)
+        )
+
+    def test_unknown_conversation(self):
+        store = self.create_store()
+
+        self.assertNotIn("missing", store)
+        with self.assertRaises(KeyError):
+            store["missing"]
+
+    def test_least_recently_used_conversations_are_evicted(self):
+        store = self.create_store(max_in_memory=2)
+
+        for conversation_id in ["a", "b", "c"]:
+            store[conversation_id] = self.create_conversation()
+
+        self.assertEqual(len(store), 2)
+        self.assertNotIn("a", store.conversations)
+
+        # Loaded again on access, evicting the least recently used one
+        store["a"].add_user_message("Still there?", create_metadata())
+        self.assertEqual(len(store["a"].messages), 3)
+        self.assertNotIn("b", store.conversations)
+
+        store.flush()
+        self.assertEqual(len(self.create_store()["a"].messages), 3)
+
+    def test_conversations_in_use_are_not_evicted(self):
+        store = self.create_store(max_in_memory=1, idle_seconds=0)
+        conversation = self.create_conversation()
+        store["a"] = conversation
+        self.assertIs(store.acquire("a"), conversation)
+
+        store["b"] = self.create_conversation()
+        store.evict_idle()
+        conversation.add_assistant_message("Hi!", create_metadata())
+        store.release("a")
+
+        self.assertIs(store["a"], conversation)
+        store.close()
+        self.assertEqual(len(self.create_store()["a"].messages), 3)
+
+    def test_idle_conversations_are_evicted(self):
+        store = self.create_store(idle_seconds=0)
+        store["a"] = self.create_conversation()
+
+        store.evict_idle()
+
+        self.assertEqual(len(store), 0)
+        self.assertEqual(len(store["a"].messages), 2)
+
+    def test_replaced_conversation_drops_old_messages(self):
+        store = self.create_store()
+        store["a"] = self.create_conversation()
+        store["a"].add_user_message("More", create_metadata())
+        store.flush()
+
+        store["a"] = ModelConversation(MemoryManager("knowledge_base"), "other.gguf")
+        store.close()
+
+        conversation = self.create_store()["a"]
+        self.assertEqual(conversation.messages, [])
+        self.assertEqual(conversation.get_model_path(), "other.gguf")
+
+    def test_without_path_conversations_stay_in_memory(self):
+        store = ConversationStore("", max_in_memory=1)
+        store["a"] = self.create_conversation()
+        store["b"] = self.create_conversation()
+
+        self.assertIn("a", store)
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import datetime
+import os
+import tempfile
+import threading
+import time
+import unittest
+from typing import List, Sequence
+from unittest import mock
+
+from language_models.api.base import ApiModel
+from language_models.formatters.base import PromptFormatter
+from language_models.memory_manager import MemoryManager
+from language_models.model_conversation import ModelConversation, generate_metadata
+from language_models.model_message import MessageMetadata, ModelMessage
+from language_models.model_response import ModelResponse
+
+
+class SlowModel(ApiModel):
+    def __init__(self, delay: float):
+        super().__init__("slow.gguf", PromptFormatter())
+        self.delay = delay
+        self.prompts: List[str] = []
+        self.lock = threading.Lock()
+
+    def generate_text(
+        self,
+        messages: Sequence[ModelMessage],
+        max_tokens: int = 200,
+        temperature: float = 0.2,
+        use_metadata: bool = False,
+        response_prefix: str = "",
+    ) -> ModelResponse:
+        with self.lock:
+            self.prompts.append(messages[-1].get_content())
+        time.sleep(self.delay)
+        return ModelResponse("REFLECTION", "slow")
+
+
+@mock.patch.object(ModelConversation, "write_to_history")
+class TestModelConversation(unittest.TestCase):
+    def create_conversation(self) -> ModelConversation:
+        conversation = ModelConversation(MemoryManager("knowledge_base"), "slow.gguf")
+        conversation.add_user_message(
+            "What time is it?", MessageMetadata(datetime.datetime.now(), [])
+        )
+        return conversation
+
+    def slow_tool_output(self, *args, **kwargs) -> str:
+        time.sleep(0.3)
+        return "TOOL OUTPUT"
+
+    def test_reflections_do_not_modify_the_messages(self, _):
+        conversation = self.create_conversation()
+        model = SlowModel(0)
+
+        conversation.generate_message(model, 100, False, use_reflections=True)
+
+        self.assertEqual(len(conversation.messages), 2)
+        self.assertEqual(conversation.messages[0].get_content(), "What time is it?")
+        self.assertEqual(
+            conversation.messages[0].get_metadata().reflection_text, "REFLECTION"
+        )
+
+    def test_overlapped_stages_run_concurrently(self, _):
+        conversation = self.create_conversation()
+        model = SlowModel(0.3)
+
+        with mock.patch.object(
+            conversation.tool_manager,
+            "retrieve_tool_output",
+            side_effect=self.slow_tool_output,
+        ), mock.patch.object(
+            conversation.tool_manager, "may_swap_models", return_value=False
+        ):
+            start = time.time()
+            conversation.generate_message(
+                model,
+                100,
+                False,
+                use_tools=True,
+                use_reflections=True,
+                overlap_stages=True,
+            )
+            duration = time.time() - start
+
+        # Reflection and tool selection overlap, followed by the final response
+        self.assertLess(duration, 0.85)
+        metadata = conversation.messages[0].get_metadata()
+        self.assertEqual(metadata.reflection_text, "REFLECTION")
+        self.assertEqual(metadata.tool_output, "TOOL OUTPUT")
+
+    def test_selected_files_are_packed_into_the_prompt(self, _):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "notes.txt")
+            with open(path, "w", encoding="utf8") as file:
+                file.write("The meeting starts at 10.")
+
+            conversation = ModelConversation(
+                MemoryManager("knowledge_base"), "slow.gguf"
+            )
+            conversation.add_user_message(
+                "When does the meeting start?",
+                MessageMetadata(datetime.datetime.now(), [path]),
+            )
+
+            conversation.generate_message(
+                SlowModel(0), 100, False, selected_files_token_budget=100
+            )
+
+        message = conversation.messages[0]
+        self.assertIn("The meeting starts at 10.", message.get_message(True))
+
+    def test_old_messages_are_summarized_incrementally(self, _):
+        conversation = ModelConversation(MemoryManager("knowledge_base"), "slow.gguf")
+        conversation.add_system_message("You are helpful.", generate_metadata())
+        model = SlowModel(0)
+
+        for i in range(12):
+            conversation.add_user_message(
+                f"Message number {i} " + "padding " * 40,
+                MessageMetadata(datetime.datetime.now(), []),
+            )
+            conversation.generate_message(model, 50, False, context_window=600)
+
+            self.assertLessEqual(
+                conversation.last_usage["prompt_tokens"],
+                conversation.last_usage["token_budget"],
+            )
+
+        summary_prompts = [
+            prompt for prompt in model.prompts if prompt.startswith("Summarize")
+        ]
+
+        # Every summarization only covers the messages that newly fell out
+        self.assertGreater(len(summary_prompts), 1)
+        self.assertIn("Message number 0", summary_prompts[0])
+        self.assertNotIn("Message number 0", summary_prompts[-1])
+        self.assertIn("SUMMARY OF THE CONVERSATION BEFORE IT", summary_prompts[-1])
+        self.assertGreater(conversation.summarized_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
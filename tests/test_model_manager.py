@@ -0,0 +1,93 @@
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from language_models.api.base import ApiModel
+from language_models.formatters.base import PromptFormatter
+from language_models.model_manager import ModelManager
+
+FAKE_SERVER = """#!{python}
+import sys, time
+print("llama_new_context_with_model: graph splits = 1", flush=True)
+time.sleep(30)
+"""
+
+
+@unittest.skipIf(os.name == "nt", "The fake llama.cpp server is a shell script")
+class TestModelManagerSideModels(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server_path = os.path.join(self.temp_dir.name, "server")
+
+        with open(self.server_path, "w") as file:
+            file.write(FAKE_SERVER.format(python=sys.executable))
+        os.chmod(self.server_path, os.stat(self.server_path).st_mode | stat.S_IEXEC)
+
+        self.model_manager = ModelManager(self.server_path, 8000)
+        self.model_manager.active_models.append(
+            ApiModel("chat.gguf", PromptFormatter())
+        )
+
+    def tearDown(self):
+        self.model_manager.__del__()
+        self.temp_dir.cleanup()
+
+    def test_no_side_model_without_resident_flag(self):
+        with mock.patch.dict(os.environ, {"MODEL.TOOL_SELECTOR": "tool.gguf"}):
+            self.assertIsNone(self.model_manager.get_side_model("TOOL_SELECTOR"))
+
+    def test_side_model_same_as_chat_model(self):
+        environment = {
+            "MODEL.TOOL_SELECTOR": "chat.gguf",
+            "MODEL.TOOL_SELECTOR.RESIDENT": "true",
+        }
+        with mock.patch.dict(os.environ, environment):
+            side_model = self.model_manager.get_side_model("TOOL_SELECTOR")
+
+        self.assertIs(side_model, self.model_manager.active_models[0])
+        self.assertFalse(self.model_manager.side_popens)
+
+    def test_side_model_is_started_once_on_its_own_port(self):
+        environment = {
+            "MODEL.TOOL_SELECTOR": "tool.gguf",
+            "MODEL.TOOL_SELECTOR.RESIDENT": "true",
+            "MODEL.TOOL_SELECTOR.PORT": "8123",
+        }
+        with mock.patch.dict(os.environ, environment), mock.patch.object(
+            ModelManager, "get_available_models", return_value=["tool.gguf"]
+        ):
+            side_model = self.model_manager.get_side_model("TOOL_SELECTOR")
+            same_side_model = self.model_manager.get_side_model("TOOL_SELECTOR")
+
+        self.assertIsNotNone(side_model)
+        self.assertIs(side_model, same_side_model)
+        self.assertEqual(side_model.host_port, "8123")  # type: ignore
+        self.assertEqual(len(self.model_manager.side_popens), 1)
+        self.assertEqual(len(self.model_manager.active_models), 1)
+
+    def test_side_model_uses_its_launch_profile(self):
+        profiles_path = os.path.join(self.temp_dir.name, "profiles.toml")
+        with open(profiles_path, "w") as file:
+            file.write('["tool.gguf"]\nthreads = 3\nbatch_size = 128\n')
+
+        environment = {
+            "MODEL.TOOL_SELECTOR": "tool.gguf",
+            "MODEL.TOOL_SELECTOR.RESIDENT": "true",
+            "MODEL.PROFILES_PATH": profiles_path,
+        }
+        with mock.patch.dict(os.environ, environment), mock.patch.object(
+            ModelManager, "get_available_models", return_value=["tool.gguf"]
+        ), mock.patch("subprocess.Popen", wraps=subprocess.Popen) as popen:
+            self.model_manager.get_side_model("TOOL_SELECTOR")
+
+        arguments = popen.call_args[0][0]
+        self.assertEqual(arguments[arguments.index("--threads") + 1], "3")
+        self.assertEqual(arguments[arguments.index("--batch-size") + 1], "128")
+
+
+if __name__ == "__main__":
+    unittest.main()
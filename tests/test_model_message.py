@@ -0,0 +1,77 @@
+import datetime
+import unittest
+
+from language_models.model_message import (
+    MessageHistory,
+    MessageMetadata,
+    ModelMessage,
+    Role,
+)
+
+
+def create_message(content: str) -> ModelMessage:
+    return ModelMessage(
+        Role.USER, content, MessageMetadata(datetime.datetime.now(), [])
+    )
+
+
+class TestModelMessage(unittest.TestCase):
+    def test_equal_texts_are_shared(self):
+        first = MessageMetadata(
+            datetime.datetime.now(), ["a.txt"], clipboard_content="".join(["x"] * 100)
+        )
+        second = MessageMetadata(
+            datetime.datetime.now(), ["a.txt"], clipboard_content="".join(["x"] * 100)
+        )
+        first.set_tool_output("".join(["output"] * 10))
+        second.set_tool_output("".join(["output"] * 10))
+
+        self.assertIs(first.clipboard_content, second.clipboard_content)
+        self.assertIs(first.tool_output, second.tool_output)
+        self.assertIs(first.selected_files[0], second.selected_files[0])
+
+    def test_messages_have_no_instance_dictionary(self):
+        message = create_message("text")
+
+        self.assertFalse(hasattr(message, "__dict__"))
+        self.assertFalse(hasattr(message.get_metadata(), "__dict__"))
+
+
+class TestMessageHistory(unittest.TestCase):
+    def test_view_ignores_later_messages(self):
+        messages = [create_message("first"), create_message("second")]
+        history = MessageHistory(messages)
+
+        messages.append(create_message("third"))
+
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[-1].get_content(), "second")
+        self.assertEqual(
+            [message.get_content() for message in history], ["first", "second"]
+        )
+
+    def test_slices_are_views(self):
+        messages = [create_message(str(i)) for i in range(5)]
+        history = MessageHistory(messages)
+
+        tail = history[2:]
+        self.assertIsInstance(tail, MessageHistory)
+        self.assertEqual([message.get_content() for message in tail], ["2", "3", "4"])
+        self.assertEqual(tail[0].get_content(), "2")
+        self.assertEqual(len(history[:-1]), 4)
+        self.assertEqual(len(history[4:1]), 0)
+
+        with self.assertRaises(IndexError):
+            tail[3]
+
+    def test_add_returns_list(self):
+        history = MessageHistory([create_message("first")])
+        combined = history + [create_message("second")]
+
+        self.assertEqual(
+            [message.get_content() for message in combined], ["first", "second"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
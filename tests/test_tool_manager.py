@@ -0,0 +1,153 @@
+import datetime
+import time
+import unittest
+from typing import Any, Dict, List
+
+from language_models.api.base import ApiModel
+from language_models.formatters.base import PromptFormatter
+from language_models.model_message import MessageMetadata, ModelMessage, Role
+from language_models.model_response import ModelResponse
+from language_models.tool_manager import ToolManager
+from language_models.tools.base_tool import BaseTool
+
+
+class SleepingTool(BaseTool):
+    def __init__(self, name: str, delay: float, timeout: float = 5):
+        super().__init__(name, "sleeps", [], run_concurrently=True, timeout=timeout)
+        self.delay = delay
+
+    def action(
+        self,
+        arguments: Dict[str, Any],
+        model: ApiModel,
+        messages: List[ModelMessage],
+        metadata: MessageMetadata,
+    ) -> str:
+        time.sleep(self.delay)
+        return f"{self.name} done"
+
+
+class TestToolManager(unittest.TestCase):
+    def create_message(self, role: Role, content: str) -> ModelMessage:
+        return ModelMessage(role, content, MessageMetadata(datetime.datetime.now(), []))
+
+    def create_conversation(self) -> List[ModelMessage]:
+        return [
+            self.create_message(Role.SYSTEM, "You are AC."),
+            self.create_message(Role.USER, "Write a hello world program."),
+            self.create_message(Role.ASSISTANT, "print('Hello world')"),
+            self.create_message(Role.USER, "Run it."),
+        ]
+
+    def test_self_contained_query_skipped_for_single_user_message(self):
+        tool_manager = ToolManager()
+        messages = [
+            self.create_message(Role.SYSTEM, "You are AC."),
+            self.create_message(Role.USER, "What time is it?"),
+        ]
+        self.assertFalse(tool_manager.needs_self_contained_query(messages, False))
+
+    def test_self_contained_query_skipped_in_single_message_mode(self):
+        tool_manager = ToolManager()
+        messages = self.create_conversation()
+        self.assertFalse(tool_manager.needs_self_contained_query(messages, True))
+        self.assertTrue(tool_manager.needs_self_contained_query(messages, False))
+
+    def test_combined_tool_conversation_contains_history(self):
+        tool_manager = ToolManager()
+        messages = self.create_conversation()
+
+        tool_conversation = tool_manager.get_tool_conversation(
+            messages[-1], tool_manager.tools, messages[:-1]
+        )
+
+        self.assertIn('"query"', tool_conversation[0].get_content())
+        self.assertIn(
+            "Write a hello world program.", tool_conversation[-1].get_content()
+        )
+        self.assertIn("LAST USER MESSAGE: Run it.", tool_conversation[-1].get_content())
+
+    def test_parse_multiple_tools(self):
+        tool_manager = ToolManager()
+        model = ApiModel("test", PromptFormatter())
+        response = ModelResponse(
+            '{"tools": [{"tool": "get_date_and_time", "arguments": {}}, {"tool": "read_file", "arguments": {"FILEINDEX": "1"}}]}',
+            "test",
+        )
+
+        plan = tool_manager.parse_tools(
+            model,
+            response,
+            MessageMetadata(datetime.datetime.now(), []),
+            tool_manager.tools,
+        )
+
+        self.assertEqual(
+            [tool.name for tool, _ in plan], ["get_date_and_time", "read_file"]
+        )
+        self.assertEqual(plan[1][1]["arguments"], {"FILEINDEX": "1"})
+
+    def test_run_tools_concurrently(self):
+        tool_manager = ToolManager()
+        model = ApiModel("test", PromptFormatter())
+        plan = [
+            (SleepingTool("first", 0.3), {"arguments": {}}),
+            (SleepingTool("second", 0.3), {"arguments": {}}),
+            (SleepingTool("slow", 2, timeout=0.1), {"arguments": {}}),
+        ]
+
+        start = time.time()
+        output = tool_manager.run_tools(
+            plan, model, [], MessageMetadata(datetime.datetime.now(), [])
+        )
+
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(output, "first done\n\nsecond done")
+
+    def test_failing_tool_keeps_other_outputs(self):
+        class FailingTool(BaseTool):
+            def __init__(self):
+                super().__init__("failing", "fails", [])
+
+            def action(self, arguments, model, messages, metadata) -> str:
+                raise RuntimeError("broken")
+
+        tool_manager = ToolManager()
+        model = ApiModel("test", PromptFormatter())
+        plan = [
+            (FailingTool(), {"arguments": {}}),
+            (SleepingTool("first", 0), {"arguments": {}}),
+        ]
+
+        output = tool_manager.run_tools(
+            plan, model, [], MessageMetadata(datetime.datetime.now(), [])
+        )
+
+        self.assertEqual(output, "first done")
+
+    def test_run_reuses_cached_result(self):
+        class CountingTool(BaseTool):
+            def __init__(self):
+                super().__init__("counting", "counts calls", [])
+                self.calls = 0
+
+            def action(self, arguments, model, messages, metadata) -> str:
+                self.calls += 1
+                return f"call {self.calls}"
+
+            def get_cache_key(self, arguments, metadata):
+                return arguments.get("KEY")
+
+        tool = CountingTool()
+        model = ApiModel("test", PromptFormatter())
+        metadata = MessageMetadata(datetime.datetime.now(), [])
+
+        self.assertEqual(tool.run({"KEY": "a"}, model, [], metadata), "call 1")
+        self.assertEqual(tool.run({"KEY": "a"}, model, [], metadata), "call 1")
+        self.assertEqual(tool.run({"KEY": "b"}, model, [], metadata), "call 2")
+        self.assertEqual(tool.run({}, model, [], metadata), "call 3")
+        self.assertEqual(tool.run({}, model, [], metadata), "call 4")
+
+
+if __name__ == "__main__":
+    unittest.main()
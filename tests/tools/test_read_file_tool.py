@@ -0,0 +1,54 @@
+import datetime
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from language_models.model_message import MessageMetadata
+from language_models.tools.read_file_tool import ReadFileTool
+
+
+class TestReadFileTool(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "log.txt")
+        with open(self.path, "w", encoding="utf8") as file:
+            file.writelines(f"line {i}\n" for i in range(1, 50001))
+
+        self.metadata = MessageMetadata(datetime.datetime.now(), [self.path])
+        self.tool = ReadFileTool()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @patch.dict(os.environ, {"READ_FILE.TOKEN_BUDGET": "200"})
+    def test_large_file_is_bounded(self):
+        result = self.tool.action({"FILEINDEX": "1"}, None, [], self.metadata)
+
+        self.assertIn("(LINES 1-50000 OF 50000)", result)
+        self.assertIn("omitted", result)
+        self.assertLess(len(result), 1200)
+
+    def test_line_range(self):
+        arguments = {"FILEINDEX": "1", "START_LINE": "100", "END_LINE": 101}
+        result = self.tool.action(arguments, None, [], self.metadata)
+
+        self.assertTrue(result.endswith(":\nline 100\nline 101\n"))
+
+    def test_start_line_past_end(self):
+        arguments = {"FILEINDEX": "1", "START_LINE": "60000"}
+        result = self.tool.action(arguments, None, [], self.metadata)
+
+        self.assertIn("HAS ONLY 50000 LINES, START_LINE 60000 IS PAST THE END", result)
+
+    def test_cache_key_depends_on_range(self):
+        whole_file = self.tool.get_cache_key({"FILEINDEX": "1"}, self.metadata)
+        line_range = self.tool.get_cache_key(
+            {"FILEINDEX": "1", "START_LINE": "5"}, self.metadata
+        )
+
+        self.assertNotEqual(whole_file, line_range)
+
+
+if __name__ == "__main__":
+    unittest.main()
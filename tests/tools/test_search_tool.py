@@ -0,0 +1,99 @@
+import http.server
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from language_models.helpers.search_backends import SearchResult, StubSearchBackend
+from language_models.helpers.web_fetcher import WebFetcher
+from language_models.tools.search_tool import SearchTool
+
+FILLER = "".join(
+    f"<p>Unrelated paragraph number {i} about other things.</p>" for i in range(200)
+)
+
+PAGES = {
+    "/paris": f"<html><body><main>{FILLER}<p>Paris is the capital of France.</p>{FILLER}</main></body></html>",
+    "/berlin": "<html><body><main><p>Berlin is the capital of Germany.</p></main></body></html>",
+}
+
+
+class PageHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        page = PAGES.get(self.path)
+        self.send_response(200 if page else 404)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        if page:
+            self.wfile.write(page.encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestSearchTool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+        base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+        cls.results = [
+            SearchResult("Paris", f"{base_url}/paris", "About Paris"),
+            SearchResult("Berlin", f"{base_url}/berlin", "About Berlin"),
+            SearchResult("Missing", f"{base_url}/missing", "Gone"),
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.cache_directory = tempfile.TemporaryDirectory()
+        WebFetcher._instance = WebFetcher(cache_path=self.cache_directory.name)
+
+    def tearDown(self):
+        WebFetcher._instance = None
+        self.cache_directory.cleanup()
+
+    def create_tool(self):
+        return SearchTool(StubSearchBackend({"capital of france": self.results}))
+
+    def test_results_without_fetching(self):
+        with mock.patch.dict(os.environ, {"SEARCH.FETCH_RESULTS": "0"}):
+            output = self.create_tool().action(
+                {"QUERY": "capital of France"}, None, [], None  # type: ignore
+            )
+
+        self.assertIn("<TITLE>Paris</TITLE>", output)
+        self.assertIn("<DESCRIPTION>About Berlin</DESCRIPTION>", output)
+        self.assertNotIn("<CONTENT>", output)
+
+    def test_fetches_and_ranks_result_pages(self):
+        environment = {
+            "SEARCH.FETCH_RESULTS": "3",
+            "SEARCH.CONTENT_TOKEN_BUDGET": "100",
+        }
+        with mock.patch.dict(os.environ, environment):
+            output = self.create_tool().action(
+                {"QUERY": "capital of France"}, None, [], None  # type: ignore
+            )
+
+        self.assertIn("Paris is the capital of France.", output)
+        self.assertIn("Berlin is the capital of Germany.", output)
+        self.assertNotIn("Unrelated paragraph number 10 ", output)
+        self.assertLess(len(output), 2000)
+
+    def test_cache_key_is_normalized(self):
+        tool = self.create_tool()
+
+        self.assertEqual(
+            tool.get_cache_key({"QUERY": " Capital  of France"}, None),  # type: ignore
+            tool.get_cache_key({"QUERY": "capital of france"}, None),  # type: ignore
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()